@@ -1,25 +1,324 @@
 # app.py
-from flask import Flask, render_template, request, redirect, url_for, session, flash, redirect, send_file, abort
-import hashlib
-from sql_active import DatabaseManager
+from flask import Flask, render_template, request, redirect, url_for, session, flash, redirect, send_file, send_from_directory, abort, Response, jsonify, g, stream_with_context, stream_template, get_flashed_messages, make_response
+from sql_active import DatabaseManager, RowStream
+from passwords import PasswordHasher
+from jinja2 import FileSystemBytecodeCache
+from markupsafe import Markup
+from werkzeug.security import safe_join
+from fragment_cache import fragments
+from assets import AssetPipeline, print_report
+from notifications import NotificationDispatcher
+from live_events import ChangeFeed, event_stream
+from task_openings import OpenedTaskQueue, OPENED_STATUS
+import background
+import backup
+import cadet_import
+import compression
+import maintenance
 from datetime import datetime
 from functools import wraps
+import csv
+import hashlib
+import io
+import json
+import mimetypes
 import os
+import time
 
 app = Flask(__name__)
 app.secret_key = 'your-secret-key-here'
+app.config['DEADLINE_SWEEP_INTERVAL'] = 300  # секунд между обходами сроков
+app.config['DEADLINE_SOON_DAYS'] = 2  # за сколько дней срок считается "скоро"
+# Доставка уведомлений (по умолчанию - локальная SMTP-заглушка)
+app.config['SMTP_HOST'] = os.environ.get('SMTP_HOST', 'localhost')
+app.config['SMTP_PORT'] = int(os.environ.get('SMTP_PORT', 1025))
+app.config['SMTP_USERNAME'] = os.environ.get('SMTP_USERNAME')
+app.config['SMTP_PASSWORD'] = os.environ.get('SMTP_PASSWORD')
+app.config['SMTP_USE_TLS'] = os.environ.get('SMTP_USE_TLS') == '1'
+app.config['MAIL_SENDER'] = os.environ.get('MAIL_SENDER', 'projmanager@localhost')
+app.config['NOTIFY_INTERVAL'] = 60  # секунд между отправками дайджестов
+app.config['LIVE_POLL_INTERVAL'] = 0.5  # секунд между проверками PRAGMA data_version
+app.config['OPENED_FLUSH_INTERVAL'] = 1.0  # секунд между сбросами открытых задач в базу
+app.config['API_PAGE_SIZE'] = 50  # размер страницы JSON API по умолчанию
+app.config['API_MAX_PAGE_SIZE'] = 200
+app.config['API_MAX_MOVES'] = 200  # перемещений задач в одном пакете
+app.config['EXPORT_BATCH_SIZE'] = 1000  # строк выгрузки, читаемых из базы за раз
+app.config['IMPORT_MAX_ROWS'] = 5000  # строк в одном файле импорта курсантов
+# Страницы списков (задачи, проекты, курсанты) отдаются потоком по мере чтения строк из базы
+app.config['STREAM_LISTINGS'] = os.environ.get('STREAM_LISTINGS', '1') == '1'
+app.config['LISTING_BATCH_SIZE'] = 500  # строк списка, читаемых из базы за раз
+app.config['LISTING_STREAM_BUFFER'] = 16384  # символов HTML в одном отправляемом блоке
+# Сжатие текстовых ответов (br при установленном brotli, gzip, deflate)
+app.config['COMPRESS_MIN_SIZE'] = 500  # байт; меньшие ответы отправляются как есть
+app.config['COMPRESS_LEVEL'] = 6
+# Хеширование паролей: алгоритм и стоимость; при заданном PASSWORD_HASH_TARGET (секунд на хеш)
+# стоимость подбирается замером при запуске
+app.config['PASSWORD_ALGORITHM'] = os.environ.get('PASSWORD_ALGORITHM', 'pbkdf2_sha256')
+app.config['PASSWORD_ITERATIONS'] = int(os.environ.get('PASSWORD_ITERATIONS', 260000))
+app.config['PASSWORD_HASH_TARGET'] = float(os.environ['PASSWORD_HASH_TARGET']) if os.environ.get('PASSWORD_HASH_TARGET') else None
+app.config['MAINTENANCE_INTERVAL'] = 3600  # секунд между проходами обслуживания базы
+app.config['MAINTENANCE_VACUUM_PAGES'] = 500  # страниц, возвращаемых за один проход
+app.config['MAINTENANCE_ANALYSIS_LIMIT'] = 1000  # строк индекса, просматриваемых ANALYZE
+# Снимок базы только для чтения, на который можно направить отчеты (?source=snapshot)
+app.config['SNAPSHOT_PATH'] = os.environ.get('SNAPSHOT_PATH', 'schem_snapshot.db')
+app.config['SNAPSHOT_INTERVAL'] = 300  # секунд между обновлениями снимка
+app.config['REPORT_SOURCE'] = os.environ.get('REPORT_SOURCE', 'primary')  # primary | snapshot
+# Архив завершенных проектов (файл <база>_archive.db)
+app.config['ARCHIVE_INTERVAL'] = 86400  # секунд между проходами архивации
+app.config['ARCHIVE_AFTER_DAYS'] = 180  # дней без активности до переноса завершенного проекта в архив
+app.config['ARCHIVE_BATCH_SIZE'] = 20  # проектов в одной транзакции
+
+# Скомпилированные шаблоны сохраняются на диск и переживают перезапуск процесса
+app.config['TEMPLATE_CACHE_DIR'] = os.environ.get('TEMPLATE_CACHE_DIR', os.path.join(app.root_path, '.jinja_cache'))
+os.makedirs(app.config['TEMPLATE_CACHE_DIR'], exist_ok=True)
+app.jinja_env.bytecode_cache = FileSystemBytecodeCache(app.config['TEMPLATE_CACHE_DIR'])
+# Отрисованные карточки задач и проектов (сбрасываются при каждой записи в базу)
+app.config['FRAGMENT_CACHE_SIZE'] = 5000  # фрагментов в памяти (LRU)
+app.config['FRAGMENT_CACHE_TTL'] = 300  # секунд; страховка от записей из других процессов
+fragments.max_entries = app.config['FRAGMENT_CACHE_SIZE']
+fragments.ttl = app.config['FRAGMENT_CACHE_TTL']
+# CSS, JS и Bootstrap отдаются самим приложением под именами с отпечатком содержимого
+app.config['ASSETS_DIST_DIR'] = os.environ.get('ASSETS_DIST_DIR', os.path.join(app.static_folder, 'dist'))
+app.config['ASSETS_MAX_AGE'] = 365 * 24 * 3600  # секунд; файл с отпечатком не меняется
+asset_pipeline = AssetPipeline(app.static_folder, app.config['ASSETS_DIST_DIR'])
+
+# Одна лента изменений на процесс, общая для всех открытых потоков событий
+change_feed = ChangeFeed(poll_interval=app.config['LIVE_POLL_INTERVAL'], logger=app.logger)
+# Открытия задач курсантами (1 -> 2) копятся в памяти и пишутся в базу пакетами
+opened_tasks = OpenedTaskQueue(interval=app.config['OPENED_FLUSH_INTERVAL'])
+# Медленное хеширование паролей выполняется в пуле процессов, а не в потоке запроса
+password_hasher = PasswordHasher(app.config['PASSWORD_ALGORITHM'], iterations=app.config['PASSWORD_ITERATIONS'])
 
 def hash_password(password: str) -> str:
-    return hashlib.sha256(password.encode()).hexdigest()
+    return password_hasher.hash(password)
+
+
+def hash_passwords(passwords) -> list:
+    """Хеширование пачки паролей (массовый импорт) параллельно в пуле процессов"""
+    return password_hasher.hash_many(list(passwords))
 
 
 def init_db():
-    db_manager = DatabaseManager()
-    if not db_manager.database_exists():
-        from sql_active import DatabaseManager as FullDBManager
-        full_db = FullDBManager()
-        full_db.create_database()
-        print("База данных инициализирована")
+    """Создание или обновление схемы базы (при актуальной схеме - одно чтение user_version)"""
+    result = DatabaseManager().migrate()
+    if result['applied']:
+        print(f"Схема базы обновлена: {result['from']} -> {result['to']}")
+    maintenance.configure_database(DatabaseManager().db_path)
+
+
+def warm_up_templates() -> dict:
+    """Загрузка всех шаблонов заранее: {имя: секунд на загрузку}.
+
+    Без кэша байт-кода это компиляция каждого шаблона, с кэшем - чтение
+    готового кода с диска; в обоих случаях первый запрос к странице уже
+    не платит за компиляцию.
+    """
+    timings = {}
+    for name in app.jinja_env.list_templates(extensions=['html']):
+        started = time.perf_counter()
+        app.jinja_env.get_template(name)
+        timings[name] = round(time.perf_counter() - started, 4)
+    return timings
+
+
+@app.cli.command('warm-templates')
+def warm_templates_command():
+    """Компиляция шаблонов в кэш байт-кода (шаг сборки/деплоя): flask --app app warm-templates"""
+    timings = warm_up_templates()
+    for name, seconds in sorted(timings.items(), key=lambda item: -item[1]):
+        print(f"{name}: {seconds * 1000:.1f} мс")
+    print(f"Всего {len(timings)} шаблонов за {sum(timings.values()) * 1000:.1f} мс, "
+          f"кэш: {app.config['TEMPLATE_CACHE_DIR']}")
+
+
+@app.cli.command('build-assets')
+def build_assets_command():
+    """Сборка static/dist: файлы с отпечатком и копии .gz (шаг сборки/деплоя): flask --app app build-assets"""
+    print_report(asset_pipeline.build(), asset_pipeline.dist_dir)
+
+
+def start_background_workers():
+    """Запуск фоновых задач приложения"""
+    # Процессы пула хеширования создаются раньше фоновых потоков
+    if app.config['PASSWORD_HASH_TARGET']:
+        print(f"Стоимость хеширования паролей: {password_hasher.calibrate(app.config['PASSWORD_HASH_TARGET'])}")
+    password_hasher.start()
+
+    # Отложенные миграции (индексы на больших таблицах) строятся в фоне
+    DatabaseManager().start_background_migrations(logger=app.logger)
+
+    background.start_worker('deadline_sweeper', app.config['DEADLINE_SWEEP_INTERVAL'],
+                            DatabaseManager().sweep_deadlines, app.config['DEADLINE_SOON_DAYS'])
+
+    dispatcher = NotificationDispatcher(host=app.config['SMTP_HOST'],
+                                        port=app.config['SMTP_PORT'],
+                                        sender=app.config['MAIL_SENDER'],
+                                        username=app.config['SMTP_USERNAME'],
+                                        password=app.config['SMTP_PASSWORD'],
+                                        use_tls=app.config['SMTP_USE_TLS'])
+    background.start_worker('notification_dispatcher', app.config['NOTIFY_INTERVAL'], dispatcher.run_once)
+
+    background.start_worker('db_maintenance', app.config['MAINTENANCE_INTERVAL'],
+                            maintenance.run_maintenance, DatabaseManager().db_path,
+                            vacuum_pages=app.config['MAINTENANCE_VACUUM_PAGES'],
+                            analysis_limit=app.config['MAINTENANCE_ANALYSIS_LIMIT'])
+
+    background.start_worker('report_snapshot', app.config['SNAPSHOT_INTERVAL'],
+                            backup.refresh_snapshot, DatabaseManager().db_path, app.config['SNAPSHOT_PATH'])
+
+    background.start_worker('project_archiver', app.config['ARCHIVE_INTERVAL'],
+                            DatabaseManager().archive_completed_projects,
+                            app.config['ARCHIVE_AFTER_DAYS'], app.config['ARCHIVE_BATCH_SIZE'])
+
+
+def reporting_db() -> DatabaseManager:
+    """База для отчетов: основная или снимок (?source=primary|snapshot, по умолчанию REPORT_SOURCE).
+
+    Если снимка еще нет, отчет строится по основной базе. Выбранный источник
+    и возраст снимка попадают в заголовки ответа и в шаблон (report_source).
+    """
+    source = request.args.get('source', app.config['REPORT_SOURCE'])
+    age = backup.snapshot_age(app.config['SNAPSHOT_PATH']) if source == 'snapshot' else None
+    if age is None:
+        g.report_source = {'source': 'primary', 'age_seconds': None}
+        return DatabaseManager()
+    g.report_source = {'source': 'snapshot', 'age_seconds': round(age)}
+    return DatabaseManager(app.config['SNAPSHOT_PATH'], read_only=True)
+
+
+@app.context_processor
+def inject_report_source():
+    return {'report_source': g.get('report_source')}
+
+
+@app.before_request
+def remember_fragment_generation():
+    # Поколение кэша фрагментов до чтения данных страницы: если во время запроса
+    # изменилась запись карточки, эта карточка в кэш не попадет
+    g.fragment_generation = fragments.generation
+
+
+@app.template_global()
+def cached_fragment(template_name: str, entity: dict, vary: tuple = (), kind: str = 'task', **context):
+    """Фрагмент шаблона для одной записи (из кэша, если он актуален).
+
+    Ключ - шаблон, id и updated_at записи и значения vary, от которых
+    разметка зависит помимо самой записи; context - переменные шаблона.
+    kind - вид записи ('task' или 'project'): карточка задачи зависит и от
+    своего проекта (название), строка проекта - только от самого проекта.
+    """
+    key = (template_name, entity['id'], entity.get('updated_at')) + tuple(vary)
+    entities = [(kind, entity['id'])]
+    if kind == 'task':
+        entities.append(('project', entity['project_id']))
+    html = fragments.get_or_render(key, lambda: app.jinja_env.get_template(template_name).render(**context),
+                                   g.get('fragment_generation'), entities)
+    return Markup(html)
+
+
+@app.template_global()
+def asset_url(name: str) -> str:
+    """Адрес статического файла с отпечатком: asset_url('css/base.css')"""
+    return url_for('asset', filename=asset_pipeline.url_path(name, check_source=app.debug))
+
+
+@app.route('/assets/<path:filename>')
+def asset(filename):
+    """Собранный файл из static/dist; клиенту с gzip - готовая сжатая копия .gz"""
+    dist_dir = app.config['ASSETS_DIST_DIR']
+    mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    max_age = app.config['ASSETS_MAX_AGE']
+    gz_path = safe_join(dist_dir, filename + '.gz')
+    has_gzip = gz_path is not None and os.path.isfile(gz_path)
+    if has_gzip and request.accept_encodings['gzip']:
+        response = send_file(gz_path, mimetype=mimetype, max_age=max_age)
+        response.headers['Content-Encoding'] = 'gzip'
+    else:
+        response = send_from_directory(dist_dir, filename, mimetype=mimetype, max_age=max_age)
+    if has_gzip:
+        response.vary.add('Accept-Encoding')
+    # Имя файла меняется вместе с содержимым: браузеру не нужно его перепроверять
+    response.cache_control.immutable = True
+    return response
+
+
+@app.after_request
+def compress_response(response):
+    return compression.compress_response(response, request.accept_encodings,
+                                         app.config['COMPRESS_MIN_SIZE'], app.config['COMPRESS_LEVEL'])
+
+
+@app.after_request
+def add_report_source_headers(response):
+    report_source = g.get('report_source')
+    if report_source:
+        response.headers['X-Data-Source'] = report_source['source']
+        if report_source['age_seconds'] is not None:
+            response.headers['X-Snapshot-Age'] = str(report_source['age_seconds'])
+    return response
+
+
+def render_listing(template_name: str, **context):
+    """Страница списка; при STREAM_LISTINGS HTML отправляется по частям, пока строки читаются из базы"""
+    if not app.config['STREAM_LISTINGS']:
+        return render_template(template_name, **context)
+    # Сообщения flash забираются из сессии до отправки заголовков: cookie сессии уходит
+    # с заголовками, и без этого показанные сообщения остались бы в ней до следующей страницы
+    get_flashed_messages(with_categories=True)
+    return Response(buffered_chunks(stream_template(template_name, **context), app.config['LISTING_STREAM_BUFFER']))
+
+
+def buffered_chunks(chunks, size: int):
+    """Склейка мелких кусков шаблона (каждый тег и строка - отдельный кусок) в блоки от size символов"""
+    buffer, length = [], 0
+    for chunk in chunks:
+        buffer.append(chunk)
+        length += len(chunk)
+        if length >= size:
+            yield ''.join(buffer)
+            buffer, length = [], 0
+    if buffer:
+        yield ''.join(buffer)
+
+
+def page_etag():
+    """Слабый ETag страницы: версия данных базы, пользователь, адрес страницы и текущая дата.
+
+    None - страницу нельзя подтверждать ответом 304 (в сессии ждут сообщения flash,
+    которые она должна показать).
+    """
+    if session.get('_flashes'):
+        return None
+    db = DatabaseManager()
+    versions = [db.data_version()]
+    if request.args.get('archived') == '1':
+        # Архивные списки читаются из файла архива
+        archive = db.archived()
+        versions.append(archive.data_version() if archive else None)
+    scope = f"{session.get('user_id')}:{session.get('role')}:{session.get('username')}"
+    # Дата: цвет дедлайнов зависит от текущего дня
+    key = '|'.join(str(part) for part in versions + [scope, request.full_path, datetime.now().date()])
+    return hashlib.sha1(key.encode()).hexdigest()
+
+
+def conditional_page(f):
+    """Декоратор страницы с ETag: повторный просмотр без изменений данных - 304 без запросов к базе"""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        etag = page_etag() if request.method == 'GET' else None
+        if etag is None:
+            return f(*args, **kwargs)
+        if request.if_none_match.contains_weak(etag):
+            response = Response(status=304)
+        else:
+            response = make_response(f(*args, **kwargs))
+            if response.status_code != 200:
+                return response
+        response.set_etag(etag, weak=True)
+        # Браузер хранит страницу, но перед показом всегда сверяет ETag
+        response.headers['Cache-Control'] = 'private, no-cache'
+        return response
+    return decorated_function
 
 
 def login_required(f):
@@ -94,8 +393,14 @@ def login():
 
         db_manager = DatabaseManager()
         user = db_manager.get_user_by_username(user_email)
+        if user:
+            valid = password_hasher.verify(password, user['password_hash'])
+        else:
+            # Неизвестный email проверяется так же долго, как известный
+            password_hasher.verify(password, password_hasher.dummy_hash())
+            valid = False
 
-        if user and user['password_hash'] == hash_password(password):
+        if valid:
             # Проверка роли пользователя
             if user_type == 'курсант' and user['role'] != 'курсант':
                 flash('Доступ разрешен только для курсантов', 'error')
@@ -104,6 +409,10 @@ def login():
                 flash('Доступ разрешен только для кураторов', 'error')
                 return render_template('login.html')
 
+            # Старый хеш (SHA-256 без соли) или устаревшая стоимость заменяются при входе
+            if password_hasher.needs_rehash(user['password_hash']):
+                db_manager.update_password_hash(user['id'], password_hasher.hash(password))
+
             session['user_id'] = user['id']
             session['username'] = user['username']
             session['email'] = user['email']
@@ -133,7 +442,13 @@ def curator_dashboard():
         flash('Доступ запрещен', 'error')
         return redirect(url_for('login'))
 
-    return render_template('curator_dashboard.html', username=session.get('username'))
+    try:
+        stats = reporting_db().get_curator_dashboard_stats(session['user_id'])
+    except Exception as e:
+        stats = None
+        flash(f'Ошибка при загрузке статистики: {str(e)}', 'error')
+
+    return render_template('curator_dashboard.html', username=session.get('username'), stats=stats)
 
 
 @app.route('/cadet_dashboard')
@@ -194,26 +509,24 @@ def cadet_task_detail(task_id):
 
     # GET запрос - показываем детали задачи
     try:
-        # Автоматически устанавливаем статус "в работе" при первом открытии
-        task = db.get_task_with_all_details(task_id, session['user_id'])
+        # Задача и файлы текущего курсанта - одним запросом
+        task = db.load_task_page(task_id, session['user_id'], 'курсант', own_files_only=True)
 
         if not task:
             flash('Задача не найдена или у вас нет к ней доступа', 'error')
             return redirect(url_for('cadet_tasks_table'))
 
-        # Если задача в статусе "ожидает" (1), автоматически меняем на "в работе" (2)
+        # Если задача в статусе "ожидает" (1), автоматически меняем на "в работе" (2).
+        # Запись откладывается в очередь, страница сразу показывает новый статус.
         if task['status_code'] == 1:
-            db.update_cadet_task_status(task_id, session['user_id'], 2)
-            # Обновляем данные задачи
-            task = db.get_task_with_all_details(task_id, session['user_id'])
-            flash('Статус задачи автоматически изменен на "В работе"', 'info')
-
-        # Получаем файлы задачи (только от текущего курсанта)
-        files = db.get_task_files(task_id, session['user_id'])
+            if opened_tasks.mark_opened(task_id, session['user_id']):
+                flash('Статус задачи автоматически изменен на "В работе"', 'info')
+            task.update(OPENED_STATUS)
 
         return render_template('cadet_task_detail.html',
                                task=task,
-                               files=files)
+                               files=task['files'],
+                               now=datetime.now())
 
     except Exception as e:
         flash(f'Ошибка при загрузке задачи: {str(e)}', 'error')
@@ -223,6 +536,7 @@ def cadet_task_detail(task_id):
 @app.route('/cadet/tasks')
 @login_required
 @role_required('курсант')
+@conditional_page
 def cadet_tasks():
     """Карточный просмотр задач для курсанта"""
     db = DatabaseManager()
@@ -247,8 +561,7 @@ def cadet_tasks():
         return render_template('cadet_tasks.html',
                                tasks=tasks,
                                total_tasks=total_tasks,
-                               tasks_by_status=tasks_by_status,
-                               now=datetime.now())
+                               tasks_by_status=tasks_by_status)
 
     except Exception as e:
         flash(f'Ошибка при загрузке задач: {str(e)}', 'error')
@@ -266,36 +579,25 @@ def cadets_list():
         search_query = request.args.get('search', '').strip()
         group_filter = request.args.get('group', '')
 
-        # Получаем курсантов с учетом фильтров
-        cadets = db.get_all_cadets(search_query, group_filter)
+        # Курсанты с учетом фильтров читаются пачками во время отдачи страницы
+        cadets = db.stream_cadets(search_query, group_filter, batch_size=app.config['LISTING_BATCH_SIZE'])
 
-        # Получаем уникальные группы для фильтра
-        all_cadets = db.get_all_cadets()  # все курсанты без фильтров
-        unique_groups = set()
-        for cadet in all_cadets:
-            if cadet.get('academic_group'):
-                unique_groups.add(cadet['academic_group'])
+        # Группы и статистика - одним агрегирующим запросом, без загрузки всех курсантов
+        groups = db.count_cadets_by_group()
+        unique_groups = {group for group in groups if group}
 
         # Статистика
-        total_cadets = len(all_cadets)
+        total_cadets = sum(groups.values())
         filtered_cadets = len(cadets)
 
-        # Группировка по академическим группам
-        groups = {}
-        for cadet in all_cadets:
-            group = cadet.get('academic_group', 'без группы')
-            if group not in groups:
-                groups[group] = 0
-            groups[group] += 1
-
-        return render_template('cadets_list.html',
-                               cadets=cadets,
-                               total_cadets=total_cadets,
-                               filtered_cadets=filtered_cadets,
-                               groups=groups,
-                               unique_groups=sorted(unique_groups),
-                               search_query=search_query,
-                               group_filter=group_filter)
+        return render_listing('cadets_list.html',
+                              cadets=cadets,
+                              total_cadets=total_cadets,
+                              filtered_cadets=filtered_cadets,
+                              groups=groups,
+                              unique_groups=sorted(unique_groups),
+                              search_query=search_query,
+                              group_filter=group_filter)
 
     except Exception as e:
         flash(f'Ошибка при загрузке списка курсантов: {str(e)}', 'error')
@@ -395,26 +697,115 @@ def register_cadet():
     # GET запрос - показываем форму регистрации
     return render_template('register_cadet.html')
 
+@app.route('/cadets/import', methods=['GET', 'POST'])
+@login_required
+@role_required('куратор')
+def import_cadets():
+    """Массовая регистрация курсантов из CSV/XLSX с построчным отчетом"""
+    if request.method == 'GET':
+        return render_template('import_cadets.html', report=None, xlsx_supported=cadet_import.openpyxl is not None)
+
+    upload = request.files.get('file')
+    if not upload or not upload.filename:
+        flash('Выберите файл для импорта', 'error')
+        return redirect(url_for('import_cadets'))
+
+    try:
+        rows = cadet_import.validate_rows(
+            cadet_import.read_rows(upload.filename, upload.read(), max_rows=app.config['IMPORT_MAX_ROWS']))
+    except cadet_import.ImportFileError as e:
+        flash(str(e), 'error')
+        return redirect(url_for('import_cadets'))
+
+    db = DatabaseManager()
+    valid = [row for row in rows if not row['errors']]
+    # Занятые email - одним запросом на весь файл
+    existing = db.get_existing_emails(row['email'] for row in valid)
+    for row in valid:
+        if row['email'] in existing:
+            row['errors'].append('Пользователь с таким email уже существует')
+    valid = [row for row in valid if not row['errors']]
+
+    created = {}
+    if valid:
+        hashes = hash_passwords([row['password'] for row in valid])
+        try:
+            created = db.create_users([{
+                'username': row['first_name'],
+                'surname': row['last_name'],
+                'patronymic': row['patronymic'],
+                'email': row['email'],
+                'academic_group': row['academic_group'],
+                'password_hash': password_hash,
+            } for row, password_hash in zip(valid, hashes)])
+        except Exception as e:
+            flash(f'Ошибка при регистрации: {str(e)}', 'error')
+            return redirect(url_for('import_cadets'))
+        print(f"Куратор {session.get('username')} импортировал курсантов: {len(created)} из {len(rows)}")
+
+    def report():
+        for row in rows:
+            if row['email'] in created and not row['errors']:
+                row['status'] = 'создан'
+                row['user_id'] = created[row['email']]
+            elif not row['errors']:
+                # Email заняли между проверкой и записью
+                row['status'] = 'пропущен'
+                row['errors'].append('Пользователь с таким email уже существует')
+            else:
+                row['status'] = 'ошибка'
+            yield row
+
+    summary = {'total': len(rows), 'created': len(created), 'failed': len(rows) - len(created)}
+    # stream_template сам сохраняет контекст запроса на время отдачи
+    return Response(stream_template('import_cadets.html', report=report(), summary=summary,
+                                    xlsx_supported=cadet_import.openpyxl is not None))
+
+
 @app.route('/projects')
 @login_required
+@conditional_page
 def projects():
     db = DatabaseManager()
     """Страница управления проектами"""
     user_id = session.get('user_id')
     user_role = session.get('role')
 
+    show_all = request.args.get('all') == '1'
+    # Архивные проекты читаются из архива теми же методами
+    show_archived = request.args.get('archived') == '1'
+    if show_archived:
+        db = db.archived()
+        if db is None:
+            return render_template('projects.html', projects=RowStream.empty(), show_all=show_all,
+                                   show_archived=True, filters={}, now=datetime.now())
+    filters = {
+        'status': request.args.get('status') or None,
+        'deadline_from': request.args.get('deadline_from') or None,
+        'deadline_to': request.args.get('deadline_to') or None,
+    }
+
     try:
+        # Строки читаются пачками во время отдачи страницы (render_listing)
+        batch_size = app.config['LISTING_BATCH_SIZE']
         if user_role == 'куратор':
-            # Кураторы видят все проекты
-            projects_list = db.get_all_projects()
+            # По умолчанию куратор видит свои проекты, по переключателю - проекты всех кураторов
+            if show_all:
+                projects_list = db.stream_projects(**filters, batch_size=batch_size)
+            else:
+                projects_list = db.stream_projects(user_id, **filters, batch_size=batch_size)
         else:
             # Курсанты видят только свои проекты
-            projects_list = db.get_projects_by_cadet(user_id)
-
-        print(projects_list)
-        return render_template('projects.html',
-                               projects=projects_list,
-                               now=datetime.now())
+            projects_list = db.stream_projects(cadet_id=user_id, batch_size=batch_size)
+        # Счетчики статистики считаются до начала отдачи: ошибка базы еще может стать переадресацией
+        projects_list.count_by('status')
+
+        return render_listing('projects.html',
+                              projects=projects_list,
+                              show_all=show_all,
+                              show_archived=show_archived,
+                              filters=filters,
+                              now=datetime.now())
     except Exception as e:
         flash(f'Ошибка при загрузке проектов: {str(e)}', 'error')
         return redirect(url_for('curator_dashboard' if user_role == 'куратор' else 'cadet_dashboard'))
@@ -422,26 +813,66 @@ def projects():
 
 @app.route('/tasks')
 @login_required
+@conditional_page
 def tasks():
     """Страница управления задачами"""
     db = DatabaseManager()
     user_id = session.get('user_id')
     user_role = session.get('role')
 
+    show_all = request.args.get('all') == '1'
+    # Архивные проекты читаются из архива теми же методами
+    show_archived = request.args.get('archived') == '1'
+    if show_archived:
+        db = db.archived()
+        if db is None:
+            return render_template('tasks.html', tasks=RowStream.empty(), show_all=show_all, filters={})
+    filters = {
+        'status_code': request.args.get('status_code', type=int),
+        'deadline_from': request.args.get('deadline_from') or None,
+        'deadline_to': request.args.get('deadline_to') or None,
+    }
+
     try:
+        # Строки читаются пачками во время отдачи страницы (render_listing)
+        batch_size = app.config['LISTING_BATCH_SIZE']
         if user_role == 'куратор':
-            # Кураторы видят все задачи
-            tasks_list = db.get_all_tasks()
+            # По умолчанию куратор видит задачи своих проектов, по переключателю - задачи всех кураторов
+            if show_all:
+                tasks_list = db.stream_tasks(**filters, batch_size=batch_size)
+            else:
+                tasks_list = db.stream_tasks(user_id, **filters, batch_size=batch_size)
         else:
             # Курсанты видят только свои задачи
-            tasks_list = db.get_tasks_by_cadet(user_id)
+            tasks_list = db.stream_tasks(cadet_id=user_id, batch_size=batch_size)
+        # Счетчики статистики считаются до начала отдачи: ошибка базы еще может стать переадресацией
+        tasks_list.count_by('status_code')
 
-        return render_template('tasks.html', tasks=tasks_list)
+        return render_listing('tasks.html', tasks=tasks_list, show_all=show_all, filters=filters)
     except Exception as e:
         flash(f'Ошибка при загрузке задач: {str(e)}', 'error')
         return redirect(url_for('curator_dashboard' if user_role == 'куратор' else 'cadet_dashboard'))
 
 
+@app.route('/review_inbox')
+@login_required
+@role_required('куратор')
+def review_inbox():
+    """Очередь задач куратора, ожидающих проверки"""
+    db = DatabaseManager()
+    cursor = request.args.get('cursor')
+
+    try:
+        tasks_list, next_cursor = db.get_review_inbox(session['user_id'], cursor)
+        return render_template('review_inbox.html',
+                               tasks=tasks_list,
+                               next_cursor=next_cursor,
+                               is_first_page=not cursor)
+    except Exception as e:
+        flash(f'Ошибка при загрузке очереди проверки: {str(e)}', 'error')
+        return redirect(url_for('curator_dashboard'))
+
+
 @app.route('/projects/create', methods=['GET', 'POST'])
 @login_required
 @role_required('куратор')
@@ -459,26 +890,16 @@ def create_project():
             return render_template('create_project.html')
 
         try:
-            project_id = db.create_project(
+            # Проект, задачи выбранных курсантов и уведомления создаются одной транзакцией
+            db.create_project_with_tasks(
                 title=title,
                 description=description,
                 curator_id=session['user_id'],
                 status=status,
-                deadline=deadline
+                deadline=deadline,
+                cadet_ids=request.form.getlist('cadet_id')
             )
 
-            # Если выбраны курсанты, создаем для них задачи
-            cadet_ids = request.form.getlist('cadet_id')
-            if cadet_ids:
-                for cadet_id in cadet_ids:
-                    db.create_task(
-                        project_id=project_id,
-                        cadet_id=cadet_id,
-                        title=f"Задача по проекту '{title[:30]}...'",
-                        description=f"Начальная задача по проекту '{title}'",
-                        status_code=1
-                    )
-
             flash(f'Проект "{title}" успешно создан!', 'success')
             return redirect(url_for('projects'))
 
@@ -608,51 +1029,127 @@ def view_task(task_id):
         user_id = session['user_id']
         user_role = session['role']
 
-        # Получаем задачу с учетом прав доступа
-        task = db.get_task_with_permissions(task_id, user_id, user_role)
+        # Задача, файлы с авторами и (для куратора) прогресс курсанта - одним запросом
+        task = opened_tasks.apply(db.load_task_page(task_id, user_id, user_role,
+                                                    with_progress=(user_role == 'куратор')))
+        archived = False
+        if not task and db.archived():
+            task = db.archived().load_task_page(task_id, user_id, user_role,
+                                                with_progress=(user_role == 'куратор'))
+            archived = task is not None
 
         if not task:
             flash('Задача не найдена или у вас нет доступа', 'error')
             return redirect(url_for('tasks'))
 
-        # Получаем все файлы задачи с информацией об авторе
-        files = []
-        if hasattr(db, 'get_files_by_task_with_authors'):
-            files = db.get_files_by_task_with_authors(task_id)
-        else:
-            # Fallback если метод не существует
-            files = db.get_files_by_task(task_id)
-
         # Дополнительная информация для куратора
         additional_info = {}
-        if user_role == 'куратор':
-            # Получаем статистику курсанта
-            with db.create_connection() as conn:
-                cursor = conn.cursor()
-                cursor.execute("""
-                    SELECT 
-                        COUNT(*) as total_tasks,
-                        SUM(CASE WHEN status_code = 4 THEN 1 ELSE 0 END) as completed_tasks,
-                        SUM(CASE WHEN status_code = 3 THEN 1 ELSE 0 END) as in_review_tasks
-                    FROM tasks 
-                    WHERE cadet_id = ? AND project_id = ?
-                """, (task['cadet_id'], task['project_id']))
-                progress = cursor.fetchone()
-                if progress:
-                    additional_info['cadet_total_tasks'] = progress[0]
-                    additional_info['cadet_completed_tasks'] = progress[1]
-                    additional_info['cadet_in_review_tasks'] = progress[2]
+        if task['progress']:
+            additional_info['cadet_total_tasks'] = task['progress']['total_tasks']
+            additional_info['cadet_completed_tasks'] = task['progress']['completed_tasks']
+            additional_info['cadet_in_review_tasks'] = task['progress']['in_review_tasks']
 
         return render_template('view_task.html',
                                task=task,
                                user_role=user_role,
-                               files=files,
+                               archived=archived,
+                               files=task['files'],
+                               now=datetime.now(),
                                **additional_info)
 
     except Exception as e:
         flash(f'Ошибка при загрузке задачи: {str(e)}', 'error')
         return redirect(url_for('tasks'))
 
+@app.route('/project/<int:project_id>/analytics')
+@login_required
+@role_required('куратор')
+def project_analytics(project_id):
+    """Аналитика проекта: burndown, время в статусах и скорость проверки"""
+    db = DatabaseManager()
+    try:
+        project = db.get_project_by_id(project_id)
+        if not project or project['curator_id'] != session['user_id']:
+            flash('Проект не найден или у вас нет к нему доступа', 'error')
+            return redirect(url_for('projects'))
+
+        # Доступ проверяется по основной базе, тяжелые отчеты можно строить по снимку
+        reports = reporting_db()
+        burndown = reports.get_project_burndown(project_id)
+        status_percentiles = reports.get_time_in_status_percentiles(project_id=project_id)
+        review_latency = reports.get_curator_review_latency(session['user_id'], project_id=project_id)
+
+        return render_template('project_analytics.html',
+                               project=project,
+                               burndown=burndown,
+                               status_percentiles=status_percentiles,
+                               review_latency=review_latency[0] if review_latency else None)
+    except Exception as e:
+        flash(f'Ошибка при загрузке аналитики: {str(e)}', 'error')
+        return redirect(url_for('view_project', project_id=project_id))
+
+
+@app.route('/export/tasks')
+@login_required
+@role_required('куратор')
+def export_tasks():
+    """Потоковая выгрузка задач проектов куратора в CSV или JSONL.
+
+    Фильтры: project_id, group, status; источник - ?source=primary|snapshot.
+    Строки читаются из базы пачками и сразу отправляются клиенту.
+    """
+    export_format = request.args.get('format', 'csv')
+    if export_format not in ('csv', 'jsonl'):
+        flash('Неизвестный формат выгрузки', 'error')
+        return redirect(request.referrer or url_for('projects'))
+    project_id = request.args.get('project_id', type=int)
+    group = request.args.get('group') or None
+    status_code = request.args.get('status', type=int)
+
+    batches = reporting_db().iter_task_export(session['user_id'], project_id=project_id, group=group,
+                                              status_code=status_code,
+                                              batch_size=app.config['EXPORT_BATCH_SIZE'])
+    columns = DatabaseManager.EXPORT_TASK_COLUMNS
+
+    def generate_csv():
+        buffer = io.StringIO()
+        # BOM и ";" - чтобы файл сразу открывался в Excel с русской локалью
+        writer = csv.DictWriter(buffer, fieldnames=columns, delimiter=';')
+        buffer.write('\ufeff')
+        writer.writeheader()
+        yield buffer.getvalue()
+        for rows in batches:
+            buffer.seek(0)
+            buffer.truncate()
+            writer.writerows(rows)
+            yield buffer.getvalue()
+
+    def generate_jsonl():
+        for rows in batches:
+            yield ''.join(json.dumps(row, ensure_ascii=False) + '\n' for row in rows)
+
+    if export_format == 'csv':
+        body, content_type = generate_csv(), 'text/csv; charset=utf-8'
+    else:
+        body, content_type = generate_jsonl(), 'application/x-ndjson; charset=utf-8'
+    filename = f"tasks-{project_id or 'all'}-{datetime.now().strftime('%Y%m%d-%H%M')}.{export_format}"
+    return Response(stream_with_context(body), content_type=content_type,
+                    headers={'Content-Disposition': f'attachment; filename={filename}'})
+
+
+@app.template_filter('duration')
+def format_duration(seconds):
+    """Человекочитаемая длительность для шаблонов"""
+    if seconds is None:
+        return '—'
+    seconds = int(seconds)
+    if seconds < 3600:
+        return f'{seconds // 60} мин'
+    if seconds < 86400:
+        return f'{seconds // 3600} ч'
+    return f'{seconds // 86400} дн'
+
+
 @app.route('/tast/<int:task_id>/edit')
 @login_required
 def edit_task(task_id):
@@ -665,12 +1162,16 @@ def view_project(project_id):
     db = DatabaseManager()
     try:
         project = db.get_project_by_id(project_id)
+        archived = False
+        if not project and db.archived():
+            project = db.archived().get_project_by_id(project_id)
+            archived = project is not None
         if not project:
             flash('Проект не найден', 'error')
             return redirect(url_for('projects'))
 
         # Просто отображаем информацию о проекте
-        return render_template('simple_view_project.html', project=project)
+        return render_template('simple_view_project.html', project=project, archived=archived)
 
     except Exception as e:
         flash(f'Ошибка: {str(e)}', 'error')
@@ -719,50 +1220,9 @@ def edit_project(project_id):
                                    cadets=cadets)
 
         try:
-            # Обновляем проект в базе данных
-            with db.create_connection() as conn:
-                cursor = conn.cursor()
-                cursor.execute('''
-                    UPDATE projects 
-                    SET title = ?, description = ?, status = ?, deadline = ?
-                    WHERE id = ?
-                ''', (title, description, status, deadline, project_id))
-                conn.commit()
-
-            # Обновляем задачи, если были выбраны курсанты
-            cadet_ids = request.form.getlist('cadet_id')
-
-            # Если выбраны курсанты, проверяем существующие задачи
-            with db.create_connection() as conn:
-                cursor = conn.cursor()
-
-                # Получаем текущих курсантов проекта
-                cursor.execute('''
-                    SELECT DISTINCT cadet_id FROM tasks WHERE project_id = ?
-                ''', (project_id,))
-                current_cadet_ids = {row[0] for row in cursor.fetchall()}
-
-                # Добавляем новые задачи для курсантов, которых еще нет
-                for cadet_id in cadet_ids:
-                    if int(cadet_id) not in current_cadet_ids:
-                        cursor.execute('''
-                            INSERT INTO tasks (project_id, cadet_id, title, description, status_code)
-                            VALUES (?, ?, ?, ?, ?)
-                        ''', (project_id, cadet_id,
-                              f"Задача по проекту '{title[:30]}...'",
-                              f"Начальная задача по проекту '{title}'",
-                              1))
-
-                # Удаляем задачи курсантов, которых убрали из проекта
-                # (опционально, закомментируйте если не нужно)
-                # for cadet_id in current_cadet_ids:
-                #     if cadet_id not in [int(cid) for cid in cadet_ids]:
-                #         cursor.execute('''
-                #             DELETE FROM tasks
-                #             WHERE project_id = ? AND cadet_id = ?
-                #         ''', (project_id, cadet_id))
-
-                conn.commit()
+            # Обновляем проект и добавляем задачи курсантам, которых еще нет в проекте
+            db.update_project_with_tasks(project_id, title, description, status, deadline,
+                                         request.form.getlist('cadet_id'))
 
             flash(f'Проект "{title}" успешно обновлен!', 'success')
             return redirect(url_for('view_project', project_id=project_id))
@@ -780,12 +1240,7 @@ def edit_project(project_id):
         cadets = db.get_users_by_role('курсант')
 
         # Получаем текущих курсантов проекта для предварительного выбора
-        with db.create_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute('''
-                SELECT DISTINCT cadet_id FROM tasks WHERE project_id = ?
-            ''', (project_id,))
-            current_cadet_ids = [str(row[0]) for row in cursor.fetchall()]
+        current_cadet_ids = [str(cadet_id) for cadet_id in db.get_project_cadet_ids(project_id)]
 
         return render_template('edit_project.html',
                                project=project,
@@ -816,10 +1271,7 @@ def delete_project(project_id):
 
     try:
         # Удаляем проект (все связанные задачи и файлы удалятся каскадно)
-        with db.create_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute('DELETE FROM projects WHERE id = ?', (project_id,))
-            conn.commit()
+        db.delete_project(project_id)
 
         flash(f'Проект "{project["title"]}" успешно удален!', 'success')
 
@@ -833,9 +1285,32 @@ def delete_project(project_id):
     return redirect(url_for('projects'))
 
 
+@app.route('/project/<int:project_id>/restore', methods=['POST'])
+@login_required
+@role_required('куратор')
+def restore_project(project_id):
+    """Возврат проекта из архива"""
+    db = DatabaseManager()
+    archive = db.archived()
+    project = archive.get_project_by_id(project_id) if archive else None
+    if not project or project['curator_id'] != session['user_id']:
+        flash('Проект не найден в архиве или у вас нет к нему доступа', 'error')
+        return redirect(url_for('projects', archived=1))
+
+    try:
+        if db.restore_archived_project(project_id):
+            flash(f'Проект "{project["title"]}" восстановлен из архива', 'success')
+        else:
+            flash('Проект не найден в архиве', 'error')
+    except Exception as e:
+        flash(f'Ошибка при восстановлении проекта: {str(e)}', 'error')
+    return redirect(url_for('view_project', project_id=project_id))
+
+
 @app.route('/cadet/tasks/table')
 @login_required
 @role_required('курсант')
+@conditional_page
 def cadet_tasks_table():
     """Табличный просмотр задач для курсанта"""
     db = DatabaseManager()
@@ -844,8 +1319,7 @@ def cadet_tasks_table():
         tasks = db.get_cadet_tasks_with_details(session['user_id'])
 
         return render_template('cadet_tasks_table.html',
-                               tasks=tasks,
-                               now=datetime.now())
+                               tasks=tasks)
 
     except Exception as e:
         flash(f'Ошибка при загрузке задач: {str(e)}', 'error')
@@ -861,6 +1335,8 @@ def download_file(file_id):
     try:
         # Получаем информацию о файле из базы данных
         file_info = db.get_file_with_details(file_id)
+        if not file_info and db.archived():
+            file_info = db.archived().get_file_with_details(file_id)
 
         if not file_info:
             flash('Файл не найден', 'error')
@@ -916,6 +1392,188 @@ def download_file(file_id):
 
 
 
+@app.route('/events/stream')
+@login_required
+def events_stream():
+    """Поток событий (SSE) по задачам текущего пользователя"""
+    return Response(event_stream(change_feed, session['user_id']),
+                    mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+# JSON API (версия 1)
+def api_login_required(f):
+    """Декоратор авторизации для API: вместо перенаправления - ответ 401"""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if 'user_id' not in session:
+            return api_error('Требуется авторизация', 401)
+        return f(*args, **kwargs)
+    return decorated_function
+
+
+def api_error(message: str, status: int):
+    return jsonify({'error': message}), status
+
+
+def api_response(payload):
+    """JSON-ответ с ETag: при совпадении If-None-Match клиент получает 304 без тела"""
+    response = jsonify(payload)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    response.add_etag()
+    return response.make_conditional(request)
+
+
+def api_request_fields():
+    """Список полей из параметра ?fields=a,b,c (None - все поля)"""
+    fields = request.args.get('fields', '').strip()
+    if not fields:
+        return None
+    return [field.strip() for field in fields.split(',') if field.strip()]
+
+
+def api_request_limit() -> int:
+    limit = request.args.get('limit', app.config['API_PAGE_SIZE'], type=int)
+    return max(1, min(limit, app.config['API_MAX_PAGE_SIZE']))
+
+
+def api_page(rows, next_cursor):
+    return api_response({'data': rows, 'next_cursor': next_cursor})
+
+
+@app.route('/api/v1/tasks')
+@api_login_required
+def api_tasks():
+    """Задачи текущего пользователя: ?fields=, ?cursor=, ?limit=, ?status_code=, ?project_id="""
+    try:
+        rows, next_cursor = DatabaseManager().api_get_tasks(
+            session['user_id'], session['role'],
+            fields=api_request_fields(),
+            cursor=request.args.get('cursor'),
+            limit=api_request_limit(),
+            status_code=request.args.get('status_code', type=int),
+            project_id=request.args.get('project_id', type=int))
+    except ValueError as e:
+        return api_error(str(e), 400)
+    return api_page(rows, next_cursor)
+
+
+@app.route('/api/v1/tasks/<int:task_id>')
+@api_login_required
+def api_task(task_id):
+    """Одна задача; ?include=files добавляет файлы задачи"""
+    db = DatabaseManager()
+    try:
+        task = db.api_get_task(task_id, session['user_id'], session['role'], fields=api_request_fields())
+    except ValueError as e:
+        return api_error(str(e), 400)
+    if not task:
+        return api_error('Задача не найдена или у вас нет прав доступа', 404)
+
+    if 'files' in request.args.get('include', '').split(','):
+        task['files'], _ = db.api_get_task_files(task_id, session['user_id'], session['role'],
+                                                 limit=app.config['API_MAX_PAGE_SIZE'])
+    return api_response({'data': task})
+
+
+@app.route('/api/v1/tasks/<int:task_id>/files')
+@api_login_required
+def api_task_files(task_id):
+    """Файлы задачи (метаданные; само содержимое - через /download_file)"""
+    db = DatabaseManager()
+    if not db.api_get_task(task_id, session['user_id'], session['role'], fields=['id']):
+        return api_error('Задача не найдена или у вас нет прав доступа', 404)
+    try:
+        rows, next_cursor = db.api_get_task_files(
+            task_id, session['user_id'], session['role'],
+            fields=api_request_fields(),
+            cursor=request.args.get('cursor'),
+            limit=api_request_limit())
+    except ValueError as e:
+        return api_error(str(e), 400)
+    return api_page(rows, next_cursor)
+
+
+@app.route('/api/v1/tasks/moves', methods=['POST'])
+@api_login_required
+def api_task_moves():
+    """Пакет перемещений задач по статусам (канбан): {"moves": [{task_id, from_status, to_status}, ...]}"""
+    if session.get('role') != 'куратор':
+        return api_error('Доступ запрещен. Требуется роль: куратор', 403)
+
+    payload = request.get_json(silent=True) or {}
+    moves = payload.get('moves')
+    if not isinstance(moves, list) or not moves:
+        return api_error('Ожидается непустой список moves', 400)
+    if len(moves) > app.config['API_MAX_MOVES']:
+        return api_error(f"Не более {app.config['API_MAX_MOVES']} перемещений за запрос", 400)
+
+    results = DatabaseManager().apply_task_moves(session['user_id'], moves)
+    applied = sum(1 for result in results if result['result'] == 'applied')
+    return jsonify({'results': results, 'applied': applied})
+
+
+@app.route('/api/v1/projects')
+@api_login_required
+def api_projects():
+    """Проекты куратора или проекты, где у курсанта есть задачи: ?fields=, ?cursor=, ?limit=, ?status="""
+    try:
+        rows, next_cursor = DatabaseManager().api_get_projects(
+            session['user_id'], session['role'],
+            fields=api_request_fields(),
+            cursor=request.args.get('cursor'),
+            limit=api_request_limit(),
+            status=request.args.get('status') or None)
+    except ValueError as e:
+        return api_error(str(e), 400)
+    return api_page(rows, next_cursor)
+
+
+@app.route('/api/v1/cadets')
+@api_login_required
+def api_cadets():
+    """Список курсантов (только для кураторов): ?fields=, ?cursor=, ?limit=, ?group="""
+    if session.get('role') != 'куратор':
+        return api_error('Доступ запрещен. Требуется роль: куратор', 403)
+    try:
+        rows, next_cursor = DatabaseManager().api_get_cadets(
+            fields=api_request_fields(),
+            cursor=request.args.get('cursor'),
+            limit=api_request_limit(),
+            group=request.args.get('group') or None)
+    except ValueError as e:
+        return api_error(str(e), 400)
+    return api_page(rows, next_cursor)
+
+
+def api_maintenance_status():
+    """Последний проход фонового обслуживания базы"""
+    worker = background.workers.get('db_maintenance')
+    if worker is None:
+        return None
+    return {'last_run': worker.last_run, 'last_error': worker.last_error, 'report': worker.last_result}
+
+
+@app.route('/api/v1/metrics')
+@api_login_required
+def api_metrics():
+    """Метрики очереди записи, конкуренции за блокировку, фоновых очередей и кэша фрагментов (для кураторов)"""
+    if session.get('role') != 'куратор':
+        return api_error('Доступ запрещен. Требуется роль: куратор', 403)
+    return jsonify({
+        'writer': DatabaseManager().get_writer().metrics(),
+        'contention': DatabaseManager.get_contention_stats(),
+        'opened_tasks': {'pending': opened_tasks.pending_count(),
+                         'flushed': opened_tasks.flushed,
+                         'batches': opened_tasks.batches},
+        'live_subscribers': change_feed.subscriber_count(),
+        'maintenance': api_maintenance_status(),
+        'snapshot': {'path': app.config['SNAPSHOT_PATH'],
+                     'age_seconds': backup.snapshot_age(app.config['SNAPSHOT_PATH'])},
+        'fragment_cache': fragments.stats(),
+    })
+
+
 @app.route('/logout')
 def logout():
     session.clear()
@@ -925,4 +1583,9 @@ def logout():
 
 if __name__ == '__main__':
     init_db()
+    warm_up_templates()
+    asset_pipeline.build()
+    # В режиме отладки фоновые задачи запускаются только в рабочем процессе перезагрузчика
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        start_background_workers()
     app.run(debug=True)
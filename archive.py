@@ -0,0 +1,42 @@
+# archive.py
+"""Архивация завершенных проектов вручную (в приложении - фоновая задача project_archiver).
+
+    python archive.py [schem.db] [--older-than 180] [--batch 20]
+    python archive.py [schem.db] --restore 42
+"""
+import argparse
+import os
+import sys
+
+from sql_active import DatabaseManager
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Архив завершенных проектов')
+    parser.add_argument('database', nargs='?', default='schem.db')
+    parser.add_argument('--older-than', type=int, default=180,
+                        help='дней без активности до переноса проекта в архив')
+    parser.add_argument('--batch', type=int, default=20, help='проектов в одной транзакции')
+    parser.add_argument('--restore', type=int, metavar='PROJECT_ID', help='вернуть проект из архива')
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.database):
+        print(f"{args.database}: файл не найден")
+        return 1
+    db = DatabaseManager(args.database)
+
+    if args.restore is not None:
+        if not db.restore_archived_project(args.restore):
+            print(f"Проект {args.restore} не найден в архиве {db.archive_path}")
+            return 1
+        print(f"Проект {args.restore} восстановлен из архива")
+        return 0
+
+    result = db.archive_completed_projects(args.older_than, args.batch)
+    print(f"Перенесено в {db.archive_path}: {result['archived']} проектов "
+          f"({result['batches']} пачек, {result['seconds']} с)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,176 @@
+# assets.py
+"""Статические файлы (CSS, JS, Bootstrap) с отпечатком содержимого в имени.
+
+Исходники лежат в static/ (сторонние библиотеки - в static/vendor, без
+изменений). Сборка копирует каждый файл в static/dist под именем
+<имя>.<sha256[:12]>.<расширение>, рядом кладет сжатую копию .gz (gzip -9)
+и записывает manifest.json: {исходное имя: имя с отпечатком}. Файл с
+отпечатком никогда не меняется, поэтому отдается с Cache-Control
+immutable на год: браузер не перепроверяет его, а новая версия файла
+получает новое имя и новую ссылку в шаблонах.
+
+Старые файлы удаляются не сразу: сохраняется предыдущая сборка, чтобы
+страницы, отданные до деплоя, догрузили свои ресурсы.
+
+    python assets.py [--clean]
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import sys
+import threading
+
+from compression import COMPRESSIBLE_TYPES
+
+MANIFEST_NAME = 'manifest.json'
+HASH_LENGTH = 12
+
+
+def fingerprint(name: str, data: bytes) -> str:
+    """css/base.css -> css/base.<хеш>.css"""
+    root, ext = os.path.splitext(name)
+    return f"{root}.{hashlib.sha256(data).hexdigest()[:HASH_LENGTH]}{ext}"
+
+
+def _write_atomic(path: str, data: bytes):
+    """Запись через временный файл: параллельный процесс не увидит файл наполовину"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+class AssetPipeline:
+    """Сборка static/dist и ссылки на файлы с отпечатком"""
+
+    def __init__(self, source_dir: str, dist_dir: str = None):
+        self.source_dir = source_dir
+        self.dist_dir = dist_dir or os.path.join(source_dir, 'dist')
+        self._manifest = None
+        self._mtimes = {}  # время изменения исходников на момент сборки
+        self._lock = threading.Lock()
+
+    @property
+    def manifest_path(self) -> str:
+        return os.path.join(self.dist_dir, MANIFEST_NAME)
+
+    def sources(self) -> list:
+        """Исходные файлы (пути относительно static/, через /), кроме собранных"""
+        names = []
+        for root, dirs, files in os.walk(self.source_dir):
+            dirs[:] = sorted(d for d in dirs
+                             if os.path.join(root, d) != self.dist_dir and not d.startswith('.'))
+            for filename in sorted(files):
+                if filename.startswith('.'):
+                    continue
+                path = os.path.relpath(os.path.join(root, filename), self.source_dir)
+                names.append(path.replace(os.sep, '/'))
+        return names
+
+    def build(self) -> dict:
+        """Сборка всех файлов: {имя: {'file', 'size', 'gzip_size'}}"""
+        with self._lock:
+            previous = self._read_manifest() or {}
+            manifest, report, mtimes = {}, {}, {}
+            for name in self.sources():
+                source_path = os.path.join(self.source_dir, name)
+                mtimes[name] = os.path.getmtime(source_path)
+                with open(source_path, 'rb') as f:
+                    data = f.read()
+                target = fingerprint(name, data)
+                manifest[name] = target
+                report[name] = {'file': target, 'size': len(data), 'gzip_size': None}
+
+                path = os.path.join(self.dist_dir, target)
+                if not os.path.exists(path):
+                    _write_atomic(path, data)
+                if mimetypes.guess_type(name)[0] in COMPRESSIBLE_TYPES:
+                    gz_path = path + '.gz'
+                    if not os.path.exists(gz_path):
+                        # mtime=0: одинаковый исходник дает одинаковый .gz при каждой сборке
+                        packed = gzip.compress(data, compresslevel=9, mtime=0)
+                        if len(packed) < len(data):
+                            _write_atomic(gz_path, packed)
+                    if os.path.exists(gz_path):
+                        report[name]['gzip_size'] = os.path.getsize(gz_path)
+
+            _write_atomic(self.manifest_path, json.dumps(manifest, indent=2, sort_keys=True).encode())
+            self._remove_stale(set(manifest.values()) | set(previous.values()))
+            self._manifest = manifest
+            self._mtimes = mtimes
+            return report
+
+    def _read_manifest(self):
+        try:
+            with open(self.manifest_path, encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _remove_stale(self, keep: set):
+        """Удаление файлов, которых нет ни в текущей, ни в предыдущей сборке"""
+        for root, _, files in os.walk(self.dist_dir):
+            for filename in files:
+                path = os.path.join(root, filename)
+                name = os.path.relpath(path, self.dist_dir).replace(os.sep, '/')
+                if name == MANIFEST_NAME or name.removesuffix('.gz') in keep:
+                    continue
+                os.remove(path)
+
+    def load(self) -> dict:
+        """Манифест текущих исходников (при первом обращении - сборка; готовые файлы не перезаписываются)"""
+        if self._manifest is None:
+            self.build()
+        return self._manifest
+
+    def url_path(self, name: str, check_source: bool = False) -> str:
+        """Имя файла с отпечатком для исходника name (KeyError, если его нет).
+
+        check_source - режим разработки: если исходник изменен после сборки,
+        сборка повторяется и ссылка указывает на новую версию.
+        """
+        manifest = self.load()
+        if check_source and name in manifest:
+            if os.path.getmtime(os.path.join(self.source_dir, name)) != self._mtimes.get(name):
+                self.build()
+                manifest = self._manifest
+        return manifest[name]
+
+    def clean(self) -> int:
+        """Удаление всей сборки; число удаленных файлов"""
+        removed = 0
+        with self._lock:
+            for root, _, files in os.walk(self.dist_dir):
+                for filename in files:
+                    os.remove(os.path.join(root, filename))
+                    removed += 1
+            self._manifest = None
+        return removed
+
+
+def print_report(report: dict, dist_dir: str):
+    for name, entry in report.items():
+        gzip_size = f", gzip {entry['gzip_size']} байт" if entry['gzip_size'] else ''
+        print(f"{name} -> {entry['file']} ({entry['size']} байт{gzip_size})")
+    print(f"Собрано {len(report)} файлов в {dist_dir}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Сборка статических файлов с отпечатком содержимого')
+    parser.add_argument('--static', default=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static'))
+    parser.add_argument('--clean', action='store_true', help='удалить static/dist перед сборкой')
+    args = parser.parse_args(argv)
+
+    pipeline = AssetPipeline(args.static)
+    if args.clean:
+        print(f"Удалено файлов: {pipeline.clean()}")
+    print_report(pipeline.build(), pipeline.dist_dir)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
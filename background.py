@@ -0,0 +1,63 @@
+# background.py
+import threading
+import time
+import traceback
+
+
+class PeriodicWorker(threading.Thread):
+    """Фоновый поток, вызывающий функцию через заданный интервал (в секундах)"""
+
+    def __init__(self, name: str, interval: float, func, *args, **kwargs):
+        super().__init__(name=name, daemon=True)
+        self.interval = interval
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.last_run = None
+        self.last_result = None
+        self.last_error = None
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            self.run_once()
+            self._stop_event.wait(self.interval)
+
+    def run_once(self):
+        """Один проход задачи; ошибки печатаются и не останавливают поток"""
+        try:
+            self.last_result = self.func(*self.args, **self.kwargs)
+            self.last_error = None
+        except Exception as e:
+            self.last_error = str(e)
+            print(f"Ошибка в фоновой задаче {self.name}: {e}")
+            traceback.print_exc()
+        finally:
+            self.last_run = time.time()
+        return self.last_result
+
+    def stop(self, timeout: float = None):
+        self._stop_event.set()
+        if self.is_alive():
+            self.join(timeout)
+
+
+# Запущенные фоновые задачи процесса: {имя: PeriodicWorker}
+workers = {}
+
+
+def start_worker(name: str, interval: float, func, *args, **kwargs) -> PeriodicWorker:
+    """Запуск именованной фоновой задачи (повторный вызов возвращает уже запущенную)"""
+    worker = workers.get(name)
+    if worker and worker.is_alive():
+        return worker
+    worker = PeriodicWorker(name, interval, func, *args, **kwargs)
+    workers[name] = worker
+    worker.start()
+    return worker
+
+
+def stop_all(timeout: float = 5):
+    for worker in list(workers.values()):
+        worker.stop(timeout)
+    workers.clear()
@@ -0,0 +1,168 @@
+# backup.py
+"""Онлайн-резервное копирование базы и снимок для отчетов.
+
+Копирование идет через sqlite3 backup API. По умолчанию база копируется
+одним шагом (pages=-1): шаг читает согласованный снимок базы в одной
+транзакции чтения, а в режиме WAL чтение не блокирует писателя, так что
+рабочая нагрузка не останавливается. Порционное копирование (pages > 0)
+не подходит для работающего приложения: если между порциями другое
+соединение (в приложении - всегда поток-писатель) фиксирует изменение,
+SQLite начинает копирование заново с первой страницы, и при постоянных
+записях копия может не закончиться никогда. Поэтому число таких перезапусков
+и общее время копирования ограничены (max_restarts, max_seconds): при
+превышении копирование прерывается с ошибкой BackupStalled.
+
+Снимок для отчетов - та же копия, которая атомарно заменяет файл снимка
+(os.replace) и открывается только для чтения. Его возраст - время последнего
+обновления (mtime файла).
+
+    python backup.py [schem.db] [--dir backups] [--compress] [--keep 7]
+    python backup.py [schem.db] --snapshot [schem_snapshot.db]
+"""
+import argparse
+import gzip
+import os
+import shutil
+import sqlite3
+import sys
+import time
+
+
+class BackupStalled(Exception):
+    """Копирование перезапускается из-за записей в базу и не успевает закончиться"""
+
+
+def _copy(db_path: str, dest_path: str, pages: int, sleep: float,
+          max_restarts: int = 3, max_seconds: float = 300) -> dict:
+    """Копия базы в dest_path (pages=-1 - одним шагом); итоговая копия в режиме журнала DELETE"""
+    started = time.monotonic()
+    steps = restarts = 0
+    last_remaining = None
+
+    def progress(status, remaining, total):
+        nonlocal steps, restarts, last_remaining
+        steps += 1
+        # Оставшихся страниц стало больше - база изменилась, копирование началось сначала
+        if last_remaining is not None and remaining > last_remaining:
+            restarts += 1
+        last_remaining = remaining
+        if remaining and (restarts > max_restarts or time.monotonic() - started > max_seconds):
+            raise BackupStalled(f'Копирование {db_path} не завершено: {restarts} перезапусков '
+                                f'за {time.monotonic() - started:.1f} с (база постоянно меняется)')
+
+    source = sqlite3.connect(db_path)
+    target = sqlite3.connect(dest_path)
+    try:
+        source.backup(target, pages=pages, progress=progress, sleep=sleep)
+        # Копия - отдельный файл без -wal/-shm, его можно открывать только для чтения
+        target.execute("PRAGMA journal_mode = DELETE")
+        page_count = target.execute("PRAGMA page_count").fetchone()[0]
+    finally:
+        target.close()
+        source.close()
+    return {'pages': page_count, 'steps': steps, 'restarts': restarts,
+            'seconds': round(time.monotonic() - started, 4)}
+
+
+def _compress(path: str) -> str:
+    compressed = path + '.gz'
+    with open(path, 'rb') as src, gzip.open(compressed, 'wb') as dst:
+        shutil.copyfileobj(src, dst, 1024 * 1024)
+    os.remove(path)
+    return compressed
+
+
+def rotate_backups(backup_dir: str, prefix: str, keep: int) -> list:
+    """Удаление старых копий, кроме последних keep; возвращает удаленные файлы"""
+    backups = sorted(name for name in os.listdir(backup_dir)
+                     if name.startswith(prefix + '-') and name.endswith(('.db', '.db.gz')))
+    removed = backups[:-keep] if keep > 0 else []
+    for name in removed:
+        os.remove(os.path.join(backup_dir, name))
+    return removed
+
+
+def backup_database(db_path: str = 'schem.db', backup_dir: str = 'backups', pages: int = -1,
+                    sleep: float = 0.005, compress: bool = False, keep: int = 7) -> dict:
+    """Резервная копия с отметкой времени в имени, при необходимости сжатая, с ротацией"""
+    os.makedirs(backup_dir, exist_ok=True)
+    prefix = os.path.splitext(os.path.basename(db_path))[0]
+    path = os.path.join(backup_dir, f"{prefix}-{time.strftime('%Y%m%d-%H%M%S')}.db")
+    temp_path = path + '.tmp'
+    try:
+        result = _copy(db_path, temp_path, pages, sleep)
+    except Exception:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    os.replace(temp_path, path)
+    if compress:
+        path = _compress(path)
+    result['path'] = path
+    result['size'] = os.path.getsize(path)
+    result['removed'] = rotate_backups(backup_dir, prefix, keep)
+    return result
+
+
+def refresh_snapshot(db_path: str = 'schem.db', snapshot_path: str = 'schem_snapshot.db',
+                     pages: int = -1, sleep: float = 0.005) -> dict:
+    """Обновление снимка для отчетов: копия пишется рядом и атомарно подменяет старую"""
+    temp_path = snapshot_path + '.tmp'
+    try:
+        result = _copy(db_path, temp_path, pages, sleep)
+    except Exception:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    # Открытые соединения со старым снимком дочитывают его, новые видят свежий
+    os.replace(temp_path, snapshot_path)
+    result['path'] = snapshot_path
+    result['refreshed_at'] = time.strftime('%Y-%m-%d %H:%M:%S')
+    return result
+
+
+def snapshot_age(snapshot_path: str = 'schem_snapshot.db'):
+    """Возраст снимка в секундах (None, если снимка нет)"""
+    try:
+        return max(0.0, time.time() - os.path.getmtime(snapshot_path))
+    except OSError:
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Резервное копирование базы данных')
+    parser.add_argument('database', nargs='?', default='schem.db')
+    parser.add_argument('--dir', default='backups', help='каталог резервных копий')
+    parser.add_argument('--compress', action='store_true', help='сжать копию gzip')
+    parser.add_argument('--keep', type=int, default=7, help='сколько последних копий хранить')
+    parser.add_argument('--pages', type=int, default=-1,
+                        help='страниц за один шаг копирования (-1 - вся база одним шагом)')
+    parser.add_argument('--snapshot', nargs='?', const='schem_snapshot.db',
+                        help='обновить снимок для отчетов вместо резервной копии')
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.database):
+        print(f"{args.database}: файл не найден")
+        return 1
+
+    try:
+        if args.snapshot:
+            result = refresh_snapshot(args.database, args.snapshot, pages=args.pages)
+            print(f"Снимок обновлен: {result['path']} ({result['pages']} страниц, "
+                  f"{result['steps']} шагов, {result['seconds']} с)")
+            return 0
+
+        result = backup_database(args.database, args.dir, pages=args.pages,
+                                 compress=args.compress, keep=args.keep)
+    except BackupStalled as e:
+        print(e)
+        return 1
+    print(f"Резервная копия: {result['path']} ({result['size']} байт, {result['pages']} страниц, "
+          f"{result['steps']} шагов, {result['seconds']} с)")
+    for name in result['removed']:
+        print(f"Удалена старая копия: {name}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,139 @@
+# cadet_import.py
+"""Разбор и проверка списка курсантов для массовой регистрации (CSV или XLSX).
+
+Первая строка файла - заголовок; колонки узнаются по названию (русскому или
+английскому), порядок не важен. Пароль необязателен: для пустого пароля
+генерируется случайный, и он показывается в отчете импорта.
+XLSX читается через openpyxl, если он установлен (pip install openpyxl).
+"""
+import csv
+import io
+import secrets
+
+try:
+    import openpyxl
+except ImportError:  # XLSX-импорт недоступен, CSV работает
+    openpyxl = None
+
+
+# Поле курсанта -> допустимые названия колонки (в нижнем регистре)
+FIELD_ALIASES = {
+    'last_name': ('фамилия', 'last_name', 'surname'),
+    'first_name': ('имя', 'first_name', 'name', 'username'),
+    'patronymic': ('отчество', 'patronymic'),
+    'email': ('email', 'e-mail', 'почта', 'электронная почта'),
+    'academic_group': ('группа', 'академическая группа', 'academic_group', 'group'),
+    'password': ('пароль', 'password'),
+}
+
+# Отчество необязательно, как и в форме регистрации курсанта
+REQUIRED_FIELDS = {
+    'first_name': 'Имя',
+    'last_name': 'Фамилия',
+    'email': 'Email',
+    'academic_group': 'Академическая группа',
+}
+
+
+class ImportFileError(ValueError):
+    """Файл нельзя разобрать целиком (формат, кодировка, заголовок)"""
+
+
+def _header_map(header) -> dict:
+    """Номер колонки для каждого узнанного поля"""
+    columns = {}
+    for index, title in enumerate(header):
+        title = str(title or '').strip().lower()
+        for field, aliases in FIELD_ALIASES.items():
+            if title in aliases and field not in columns:
+                columns[field] = index
+    missing = [REQUIRED_FIELDS[field] for field in REQUIRED_FIELDS if field not in columns]
+    if missing:
+        raise ImportFileError(f"В заголовке файла нет колонок: {', '.join(missing)}")
+    return columns
+
+
+def _read_csv(data: bytes):
+    for encoding in ('utf-8-sig', 'cp1251'):
+        try:
+            text = data.decode(encoding)
+            break
+        except UnicodeDecodeError:
+            continue
+    else:
+        raise ImportFileError('Не удалось определить кодировку файла (ожидается UTF-8 или Windows-1251)')
+    try:
+        dialect = csv.Sniffer().sniff(text[:4096], delimiters=';,\t')
+    except csv.Error:
+        dialect = csv.excel
+    return csv.reader(io.StringIO(text), dialect)
+
+
+def _read_xlsx(data: bytes):
+    if openpyxl is None:
+        raise ImportFileError('Импорт XLSX недоступен: установите openpyxl или сохраните файл как CSV')
+    try:
+        workbook = openpyxl.load_workbook(io.BytesIO(data), read_only=True, data_only=True)
+    except Exception as e:
+        raise ImportFileError(f'Не удалось прочитать XLSX: {e}')
+    return workbook.active.iter_rows(values_only=True)
+
+
+def read_rows(filename: str, data: bytes, max_rows: int = 5000) -> list:
+    """Строки файла как словари полей; номер строки файла - в ключе 'line'"""
+    if filename.lower().endswith('.xlsx'):
+        reader = _read_xlsx(data)
+    elif filename.lower().endswith(('.csv', '.txt')):
+        reader = _read_csv(data)
+    else:
+        raise ImportFileError('Поддерживаются файлы CSV и XLSX')
+
+    header = next(iter(reader), None)
+    if not header:
+        raise ImportFileError('Файл пуст')
+    columns = _header_map(header)
+
+    rows = []
+    for line, values in enumerate(reader, start=2):
+        values = list(values or [])
+        if not any(str(value or '').strip() for value in values):
+            continue
+        if len(rows) >= max_rows:
+            raise ImportFileError(f'В файле больше {max_rows} строк')
+        row = {field: str(values[index] if index < len(values) and values[index] is not None else '').strip()
+               for field, index in columns.items()}
+        row.setdefault('patronymic', '')
+        row['line'] = line
+        rows.append(row)
+    return rows
+
+
+def validate_rows(rows: list) -> list:
+    """Проверка всех строк за один проход (правила формы регистрации курсанта).
+
+    Каждой строке добавляются 'errors' (список) и, если пароль не задан,
+    сгенерированный 'password' с флагом 'password_generated'.
+    """
+    seen_emails = {}
+    for row in rows:
+        errors = []
+        for field, field_name in REQUIRED_FIELDS.items():
+            if not row.get(field):
+                errors.append(f'Поле "{field_name}" обязательно для заполнения')
+        if row.get('academic_group') and len(row['academic_group']) < 2:
+            errors.append('Академическая группа должна содержать минимум 2 символа')
+        if row.get('password') and len(row['password']) < 6:
+            errors.append('Пароль должен содержать минимум 6 символов')
+        if row.get('email'):
+            email_key = row['email'].lower()
+            if '@' not in row['email']:
+                errors.append('Некорректный формат email')
+            elif email_key in seen_emails:
+                errors.append(f"Email повторяется в строке {seen_emails[email_key]}")
+            else:
+                seen_emails[email_key] = row['line']
+        if not row.get('password'):
+            row['password'] = secrets.token_urlsafe(8)
+            row['password_generated'] = True
+        row['errors'] = errors
+    return rows
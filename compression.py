@@ -0,0 +1,89 @@
+# compression.py
+"""Сжатие текстовых ответов (br, gzip, deflate) по заголовку Accept-Encoding.
+
+Обычный ответ сжимается целиком, если он не меньше min_size байт.
+Потоковый ответ (страницы списков, выгрузки) сжимается по мере отдачи:
+каждый блок дожимается Z_SYNC_FLUSH и сразу уходит клиенту, поэтому время
+до первого байта не растет. Поток событий (text/event-stream), файлы
+(send_file) и уже сжатые ответы не трогаются.
+Brotli используется, если установлен пакет brotli (pip install brotli).
+"""
+import zlib
+
+try:
+    import brotli
+except ImportError:  # br недоступен, gzip и deflate работают
+    brotli = None
+
+
+COMPRESSIBLE_TYPES = ('text/html', 'text/css', 'text/plain', 'text/csv', 'text/javascript',
+                      'application/javascript', 'application/json', 'application/x-ndjson',
+                      'application/xml', 'image/svg+xml')
+
+# Порядок предпочтения при равном качестве в Accept-Encoding
+ENCODINGS = ('br', 'gzip', 'deflate') if brotli is not None else ('gzip', 'deflate')
+
+# wbits для zlib: 31 - формат gzip, 15 - zlib (HTTP deflate)
+_WBITS = {'gzip': 31, 'deflate': 15}
+
+
+def choose_encoding(accept_encodings):
+    """Лучшее поддерживаемое кодирование из Accept-Encoding (werkzeug Accept) или None"""
+    best, best_quality = None, 0
+    for encoding in ENCODINGS:
+        quality = accept_encodings[encoding]
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def is_compressible(response) -> bool:
+    return (200 <= response.status_code < 300 and response.status_code != 204
+            and not response.direct_passthrough
+            and 'Content-Encoding' not in response.headers
+            and response.mimetype in COMPRESSIBLE_TYPES)
+
+
+def _compressor(encoding: str, level: int):
+    if encoding == 'br':
+        compressor = brotli.Compressor(quality=min(level, 11))
+        return compressor.process, compressor.flush, compressor.finish
+    compressor = zlib.compressobj(level, zlib.DEFLATED, _WBITS[encoding])
+    return (compressor.compress, lambda: compressor.flush(zlib.Z_SYNC_FLUSH),
+            lambda: compressor.flush(zlib.Z_FINISH))
+
+
+def _compress_stream(chunks, source, encoding: str, level: int):
+    process, flush, finish = _compressor(encoding, level)
+    try:
+        for chunk in chunks:
+            data = process(chunk) + flush()
+            if data:
+                yield data
+        yield finish()
+    finally:
+        # Исходный генератор держит контекст запроса и соединение с базой до закрытия
+        if hasattr(source, 'close'):
+            source.close()
+
+
+def compress_response(response, accept_encodings, min_size: int = 500, level: int = 6):
+    """Сжатие ответа на месте; возвращает тот же объект ответа"""
+    if not is_compressible(response):
+        return response
+    response.vary.add('Accept-Encoding')
+    encoding = choose_encoding(accept_encodings)
+    if encoding is None:
+        return response
+
+    if response.is_streamed:
+        response.response = _compress_stream(response.iter_encoded(), response.response, encoding, level)
+        response.headers.pop('Content-Length', None)
+    else:
+        data = response.get_data()
+        if len(data) < min_size:
+            return response
+        process, _, finish = _compressor(encoding, level)
+        response.set_data(process(data) + finish())
+    response.headers['Content-Encoding'] = encoding
+    return response
@@ -0,0 +1,115 @@
+# db_retry.py
+"""Повтор операций SQLite при занятой базе (SQLITE_BUSY / SQLITE_LOCKED).
+
+Встроенный обработчик занятости SQLite ждет недолго (busy_timeout), после
+чего операция повторяется с экспоненциальной задержкой со случайным
+разбросом, пока не истечет общий срок вызова (deadline). Число повторов и
+время ожидания блокировки копятся по именам методов в ContentionStats.
+"""
+import random
+import sqlite3
+import threading
+import time
+from functools import wraps
+
+
+def is_busy_error(error: Exception) -> bool:
+    """Ошибка вызвана занятой или заблокированной базой"""
+    if not isinstance(error, sqlite3.OperationalError):
+        return False
+    code = getattr(error, 'sqlite_errorcode', None)
+    if code is not None:
+        return code & 0xff in (sqlite3.SQLITE_BUSY, sqlite3.SQLITE_LOCKED)
+    message = str(error).lower()
+    return 'locked' in message or 'busy' in message
+
+
+class ContentionStats:
+    """Счетчики конкуренции за блокировку по методам"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._methods = {}
+
+    def record(self, names, retries: int, waited: float, gave_up: bool = False):
+        if isinstance(names, str):
+            names = (names,)
+        with self._lock:
+            for name in names:
+                entry = self._methods.setdefault(name, {
+                    'contended_calls': 0, 'retries': 0, 'lock_wait_seconds': 0.0,
+                    'max_lock_wait_seconds': 0.0, 'gave_up': 0,
+                })
+                entry['contended_calls'] += 1
+                entry['retries'] += retries
+                entry['lock_wait_seconds'] += waited
+                entry['max_lock_wait_seconds'] = max(entry['max_lock_wait_seconds'], waited)
+                if gave_up:
+                    entry['gave_up'] += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            methods = {name: dict(entry) for name, entry in self._methods.items()}
+        for entry in methods.values():
+            entry['lock_wait_seconds'] = round(entry['lock_wait_seconds'], 4)
+            entry['max_lock_wait_seconds'] = round(entry['max_lock_wait_seconds'], 4)
+        return {
+            'retries': sum(entry['retries'] for entry in methods.values()),
+            'lock_wait_seconds': round(sum(entry['lock_wait_seconds'] for entry in methods.values()), 4),
+            'gave_up': sum(entry['gave_up'] for entry in methods.values()),
+            'methods': methods,
+        }
+
+    def reset(self):
+        with self._lock:
+            self._methods.clear()
+
+
+# Счетчики процесса
+contention = ContentionStats()
+
+
+class RetryPolicy:
+    """Экспоненциальная задержка со случайным разбросом и общим сроком вызова (в секундах)"""
+
+    def __init__(self, base_delay: float = 0.01, max_delay: float = 0.5, deadline: float = 10.0,
+                 busy_timeout: float = 0.1, stats: ContentionStats = None):
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.deadline = deadline
+        self.busy_timeout = busy_timeout  # ожидание внутри SQLite до возврата SQLITE_BUSY
+        self.stats = stats or contention
+
+    def backoff(self, attempt: int) -> float:
+        """Задержка перед повтором номер attempt ("full jitter")"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    def call(self, names, func, *args, **kwargs):
+        """Вызов func с повторами при занятой базе; names - имя метода (или имена) для счетчиков"""
+        started = time.monotonic()
+        attempt = 0
+        while True:
+            attempt_started = time.monotonic()
+            try:
+                result = func(*args, **kwargs)
+            except sqlite3.OperationalError as e:
+                if not is_busy_error(e):
+                    raise
+                delay = self.backoff(attempt)
+                if time.monotonic() + delay - started > self.deadline:
+                    self.stats.record(names, attempt, time.monotonic() - started, gave_up=True)
+                    raise
+                time.sleep(delay)
+                attempt += 1
+                continue
+            if attempt:
+                self.stats.record(names, attempt, attempt_started - started)
+            return result
+
+
+def busy_retry(method):
+    """Декоратор метода DatabaseManager: повтор всего метода по его retry_policy"""
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        return self.retry_policy.call(method.__name__, method, self, *args, **kwargs)
+    return wrapper
@@ -0,0 +1,296 @@
+# db_writer.py
+"""Единственный поток-писатель для изменений SQLite.
+
+Все изменения DatabaseManager ставятся в ограниченную очередь и выполняются
+одним потоком на одном соединении, поэтому потоки запросов не конкурируют
+за блокировку записи. Писатель забирает из очереди все накопившиеся
+небольшие изменения (до max_batch) и применяет их одной транзакцией:
+каждое изменение выполняется в своей точке сохранения (SAVEPOINT), так что
+ошибка одного изменения откатывает только его, а остальные фиксируются
+общим COMMIT. Вызывающий получает Future с результатом своего изменения.
+Если база занята другим процессом, BEGIN IMMEDIATE и COMMIT повторяются по
+политике retry_policy, а ожидание записывается на методы всех изменений пакета.
+
+Отдельное (exclusive) изменение может работать и с другими файлами баз
+(attach, например архив): писатель подключает их перед своей транзакцией и
+отключает после нее, чтобы обычные записи не блокировали эти файлы.
+
+После COMMIT писатель вызывает on_commit(changed) с сущностями, которые
+изменил пакет (для сброса кэшей): каждое изменение передает их в invalidates
+(функция изменения может дополнять этот список по ходу работы). Пустой
+invalidates - изменение не затрагивает кэшируемые данные, None (по
+умолчанию) - затронуто неизвестно что, и on_commit получает None.
+"""
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+
+
+class WriteJob:
+    """Одно изменение: функция func(cursor, *args) и Future для результата"""
+
+    __slots__ = ('name', 'func', 'args', 'kwargs', 'exclusive', 'attach', 'invalidates', 'future', 'enqueued_at')
+
+    def __init__(self, name: str, func, args, kwargs, exclusive: bool = False, attach: dict = None,
+                 invalidates=None):
+        self.name = name
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.exclusive = exclusive
+        self.attach = attach or {}  # {псевдоним: путь к файлу базы}
+        self.invalidates = invalidates  # измененные сущности; None - неизвестно какие
+        self.future = Future()
+        self.enqueued_at = time.monotonic()
+
+
+class DatabaseWriter:
+    """Поток-писатель с очередью и групповой фиксацией транзакций"""
+
+    # Границы гистограммы размеров пакетов
+    BATCH_BUCKETS = (1, 2, 4, 8, 16, 32, 64)
+
+    def __init__(self, connect, on_commit=None, queue_size: int = 1000, max_batch: int = 64,
+                 submit_timeout: float = 5.0, retry_policy=None):
+        self.connect = connect
+        self.on_commit = on_commit
+        self.retry_policy = retry_policy
+        self.max_batch = max_batch
+        self.submit_timeout = submit_timeout
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            'submitted': 0,
+            'rejected': 0,
+            'committed_jobs': 0,
+            'failed_jobs': 0,
+            'commits': 0,
+            'failed_commits': 0,
+            'connect_errors': 0,
+            'max_batch_size': 0,
+            'max_queue_depth': 0,
+            'queue_wait_seconds': 0.0,
+            'commit_seconds': 0.0,
+        }
+        self._batch_histogram = {bucket: 0 for bucket in self.BATCH_BUCKETS}
+        self._batch_histogram['more'] = 0
+
+    # Постановка изменений
+    def submit(self, func, *args, exclusive: bool = False, name: str = None, attach: dict = None,
+               invalidates=None, **kwargs) -> Future:
+        """Поставить изменение в очередь; exclusive - выполнить отдельной транзакцией.
+
+        attach - {псевдоним: путь} баз, подключаемых на время этого изменения
+        (только вместе с exclusive). invalidates - сущности, которые изменение
+        меняет (см. описание модуля).
+        """
+        if threading.current_thread() is self._thread:
+            raise RuntimeError('Изменение нельзя ставить в очередь из самого потока-писателя')
+        if attach and not exclusive:
+            raise ValueError('Подключать другие базы можно только для отдельного (exclusive) изменения')
+        if attach and not all(alias.isidentifier() for alias in attach):
+            raise ValueError(f'Недопустимый псевдоним базы: {list(attach)}')
+        job = WriteJob(name or func.__name__, func, args, kwargs, exclusive, attach, invalidates)
+        try:
+            self._queue.put(job, timeout=self.submit_timeout)
+        except queue.Full:
+            with self._stats_lock:
+                self._stats['rejected'] += 1
+            raise sqlite3.OperationalError('Очередь записи в базу переполнена, повторите попытку позже')
+        # Поток запускается после постановки: если он как раз завершается из-за
+        # ошибки соединения, изменение либо получит эту ошибку, либо достанется новому потоку
+        self._ensure_started()
+        with self._stats_lock:
+            self._stats['submitted'] += 1
+            self._stats['max_queue_depth'] = max(self._stats['max_queue_depth'], self._queue.qsize())
+        return job.future
+
+    def metrics(self) -> dict:
+        """Снимок метрик: глубина очереди, размеры пакетов, время ожидания и фиксации"""
+        with self._stats_lock:
+            stats = dict(self._stats)
+            histogram = dict(self._batch_histogram)
+        stats['queue_depth'] = self._queue.qsize()
+        stats['queue_capacity'] = self._queue.maxsize
+        stats['avg_batch_size'] = (round(stats['committed_jobs'] / stats['commits'], 2)
+                                   if stats['commits'] else 0)
+        stats['batch_size_histogram'] = {str(bucket): count for bucket, count in histogram.items()}
+        stats['running'] = self._thread is not None and self._thread.is_alive()
+        return stats
+
+    # Поток-писатель
+    def _ensure_started(self):
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='db_writer', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        try:
+            conn = self.connect()
+        except Exception as e:
+            # Без соединения поток завершается, а ожидающие изменения получают ошибку;
+            # следующее изменение снова запустит поток и попробует подключиться
+            print(f"Ошибка подключения потока записи: {e}")
+            with self._start_lock:
+                self._thread = None
+                pending = []
+                while True:
+                    try:
+                        pending.append(self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+            with self._stats_lock:
+                self._stats['connect_errors'] += 1
+            self._fail(pending, e)
+            return
+        # Транзакциями управляет сам писатель (BEGIN/SAVEPOINT/COMMIT)
+        conn.isolation_level = None
+        try:
+            deferred = None
+            while True:
+                job = deferred or self._queue.get()
+                deferred = None
+                batch = [job]
+                if not job.exclusive:
+                    while len(batch) < self.max_batch:
+                        try:
+                            next_job = self._queue.get_nowait()
+                        except queue.Empty:
+                            break
+                        if next_job.exclusive:
+                            deferred = next_job
+                            break
+                        batch.append(next_job)
+                try:
+                    self._run_batch(conn, batch)
+                except Exception as e:
+                    # Непредвиденная ошибка не должна оставлять вызывающих без ответа
+                    print(f"Ошибка в потоке записи: {e}")
+                    for failed in batch:
+                        if not failed.future.done():
+                            failed.future.set_exception(e)
+        finally:
+            conn.close()
+
+    def _run_batch(self, conn, batch):
+        """Пакет в одной транзакции; базы из attach подключаются только на ее время"""
+        attach = batch[0].attach
+        if not attach:
+            return self._run_transaction(conn, batch)
+        try:
+            attached = self._attach(conn, attach)
+        except sqlite3.Error as e:
+            self._fail(batch, e)
+            return
+        try:
+            self._run_transaction(conn, batch)
+        finally:
+            for alias in attached:
+                try:
+                    conn.execute(f"DETACH DATABASE {alias}")
+                except sqlite3.Error:
+                    pass  # следующее подключение увидит, что база уже подключена
+
+    @staticmethod
+    def _attach(conn, attach: dict) -> list:
+        """Подключение баз к соединению писателя; псевдонимы, которые надо будет отключить"""
+        present = {row[1] for row in conn.execute("PRAGMA database_list")}
+        attached = []
+        for alias, path in attach.items():
+            if alias not in present:
+                conn.execute(f"ATTACH DATABASE ? AS {alias}", (path,))
+            attached.append(alias)
+        return attached
+
+    def _run_transaction(self, conn, batch):
+        started = time.monotonic()
+        waited = sum(started - job.enqueued_at for job in batch)
+        cursor = conn.cursor()
+        names = tuple({job.name for job in batch})
+        done = []
+        try:
+            self._execute_with_retry(cursor, names, "BEGIN IMMEDIATE")
+        except sqlite3.Error as e:
+            self._fail(batch, e)
+            return
+
+        for job in batch:
+            if not job.future.set_running_or_notify_cancel():
+                continue
+            cursor.execute("SAVEPOINT write_job")
+            try:
+                result = job.func(cursor, *job.args, **job.kwargs)
+                cursor.execute("RELEASE write_job")
+                done.append((job, result))
+            except Exception as e:
+                # Откатываем только это изменение, остальные изменения пакета сохраняются
+                try:
+                    cursor.execute("ROLLBACK TO write_job")
+                    cursor.execute("RELEASE write_job")
+                except sqlite3.Error:
+                    pass
+                job.future.set_exception(e)
+                with self._stats_lock:
+                    self._stats['failed_jobs'] += 1
+
+        try:
+            self._execute_with_retry(cursor, names, "COMMIT")
+        except sqlite3.Error as e:
+            try:
+                cursor.execute("ROLLBACK")
+            except sqlite3.Error:
+                pass
+            with self._stats_lock:
+                self._stats['failed_commits'] += 1
+            self._fail([job for job, _ in done], e, already_running=True)
+            return
+
+        if done and self.on_commit:
+            changed = self._changed([job for job, _ in done])
+            if changed is None or changed:
+                try:
+                    self.on_commit(changed)
+                except Exception as e:
+                    # Изменения уже зафиксированы: ошибка сброса кэшей не должна стать их ошибкой
+                    print(f"Ошибка обработчика после фиксации записи: {e}")
+        finished = time.monotonic()
+        self._record_commit(len(batch), len(done), waited, finished - started)
+        for job, result in done:
+            job.future.set_result(result)
+
+    @staticmethod
+    def _changed(jobs):
+        """Сущности, измененные зафиксированными изменениями; None - неизвестно какие"""
+        changed = set()
+        for job in jobs:
+            if job.invalidates is None:
+                return None
+            changed.update(job.invalidates)
+        return changed
+
+    def _execute_with_retry(self, cursor, names, statement: str):
+        if self.retry_policy is None:
+            return cursor.execute(statement)
+        return self.retry_policy.call(names, cursor.execute, statement)
+
+    def _fail(self, jobs, error, already_running: bool = False):
+        for job in jobs:
+            if already_running or job.future.set_running_or_notify_cancel():
+                job.future.set_exception(error)
+        with self._stats_lock:
+            self._stats['failed_jobs'] += len(jobs)
+
+    def _record_commit(self, batch_size: int, committed: int, waited: float, elapsed: float):
+        with self._stats_lock:
+            self._stats['commits'] += 1
+            self._stats['committed_jobs'] += committed
+            self._stats['commit_seconds'] += elapsed
+            self._stats['queue_wait_seconds'] += waited
+            self._stats['max_batch_size'] = max(self._stats['max_batch_size'], batch_size)
+            bucket = next((bucket for bucket in self.BATCH_BUCKETS if batch_size <= bucket), 'more')
+            self._batch_histogram[bucket] += 1
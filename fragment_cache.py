@@ -0,0 +1,136 @@
+# fragment_cache.py
+"""Кэш отрисованных фрагментов страниц (карточки и строки задач и проектов).
+
+Ключ фрагмента - шаблон, id сущности, ее updated_at (если есть) и значения,
+от которых зависит разметка помимо самой записи (например, текущая дата).
+Объем ограничен: при переполнении вытесняются давно не использованные
+фрагменты (LRU).
+
+Карточка показывает и связанные данные (название проекта, состояние
+срока), которые меняются без изменения updated_at самой записи, а
+updated_at хранится с точностью до секунды. Поэтому фрагмент объявляет
+сущности, от которых зависит (('task', id), ('project', id)), а запись через
+DatabaseManager сообщает, какие сущности она изменила (invalidate_caches).
+Каждое изменение начинает новое поколение; поколение последнего изменения
+сущности входит в ключ фрагмента, так что прежние фрагменты этой сущности
+больше не находятся и вытесняются LRU. Фрагмент, отрисованный по данным,
+прочитанным до изменения одной из его сущностей, в кэш не попадает.
+Запись, для которой измененные сущности неизвестны, сбрасывает кэш целиком.
+TTL страхует от изменений в обход DatabaseManager (другие процессы).
+"""
+import threading
+import time
+from collections import OrderedDict
+
+
+class FragmentCache:
+    """LRU-кэш HTML-фрагментов с учетом попаданий и сэкономленного времени отрисовки"""
+
+    def __init__(self, max_entries: int = 2000, ttl: float = 300):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()  # {ключ: (время отрисовки, html, секунд на отрисовку)}
+        self._lock = threading.Lock()
+        self._templates = {}  # счетчики по шаблонам фрагментов
+        self._changed = {}  # {(вид, id): поколение последнего изменения сущности}
+        self._cleared = 0  # поколение последнего полного сброса
+        self.generation = 0
+        self.invalidations = 0
+        self.evictions = 0
+
+    def invalidate(self, entities=None):
+        """Данные изменились: entities - измененные сущности (вид, id), None - сброс всех фрагментов"""
+        with self._lock:
+            self.generation += 1
+            self.invalidations += 1
+            # Учет изменений ограничен: при переполнении - полный сброс
+            if entities is None or len(self._changed) > self.max_entries * 10:
+                self._cleared = self.generation
+                self._changed.clear()
+                self._entries.clear()
+                return
+            for entity in entities:
+                self._changed[entity] = self.generation
+
+    def get_or_render(self, key: tuple, render, generation: int = None, entities=()) -> str:
+        """HTML фрагмента из кэша или результат render() с сохранением в кэш.
+
+        entities - сущности (вид, id), от которых зависит фрагмент.
+        generation - поколение кэша на момент чтения данных для страницы;
+        если с тех пор изменилась одна из entities (или был полный сброс),
+        отрисованный фрагмент не сохраняется.
+        """
+        template = key[0]
+        now = time.monotonic()
+        with self._lock:
+            key = key + tuple(self._changed.get(entity, 0) for entity in entities)
+            entry = self._entries.get(key)
+            if entry is not None and now - entry[0] < self.ttl:
+                self._entries.move_to_end(key)
+                self._count(template, hit=True, seconds=entry[2])
+                return entry[1]
+
+        started = time.perf_counter()
+        html = render()
+        seconds = time.perf_counter() - started
+
+        with self._lock:
+            self._count(template, hit=False, seconds=seconds)
+            if generation is None or (generation >= self._cleared and
+                                      all(self._changed.get(entity, 0) <= generation for entity in entities)):
+                self._entries[key] = (now, html, seconds)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+                    self.evictions += 1
+        return html
+
+    def _count(self, template: str, hit: bool, seconds: float):
+        entry = self._templates.setdefault(template, {
+            'hits': 0, 'misses': 0, 'render_seconds': 0.0, 'saved_seconds': 0.0,
+        })
+        if hit:
+            entry['hits'] += 1
+            entry['saved_seconds'] += seconds
+        else:
+            entry['misses'] += 1
+            entry['render_seconds'] += seconds
+
+    def stats(self) -> dict:
+        """Доля попаданий, время отрисовки на промахах и время, сэкономленное попаданиями"""
+        with self._lock:
+            templates = {name: dict(entry) for name, entry in self._templates.items()}
+            entries = len(self._entries)
+            changed = len(self._changed)
+        for entry in templates.values():
+            lookups = entry['hits'] + entry['misses']
+            entry['hit_rate'] = round(entry['hits'] / lookups, 4) if lookups else None
+            entry['render_seconds'] = round(entry['render_seconds'], 4)
+            entry['saved_seconds'] = round(entry['saved_seconds'], 4)
+        hits = sum(entry['hits'] for entry in templates.values())
+        lookups = hits + sum(entry['misses'] for entry in templates.values())
+        return {
+            'entries': entries,
+            'max_entries': self.max_entries,
+            'hits': hits,
+            'misses': lookups - hits,
+            'hit_rate': round(hits / lookups, 4) if lookups else None,
+            'render_seconds': round(sum(entry['render_seconds'] for entry in templates.values()), 4),
+            'saved_seconds': round(sum(entry['saved_seconds'] for entry in templates.values()), 4),
+            'evictions': self.evictions,
+            'invalidations': self.invalidations,
+            'generation': self.generation,
+            'changed_entities': changed,
+            'templates': templates,
+        }
+
+    def reset(self):
+        with self._lock:
+            self._entries.clear()
+            self._templates.clear()
+            self.evictions = 0
+            self.invalidations = 0
+
+
+# Кэш процесса
+fragments = FragmentCache()
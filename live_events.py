@@ -0,0 +1,204 @@
+# live_events.py
+"""Лента изменений для потоковых обновлений страниц (Server-Sent Events).
+
+Один поток-наблюдатель на процесс опрашивает PRAGMA data_version на своем
+соединении. Значение меняется только после коммита из другого соединения,
+поэтому пока данных никто не менял, опрос стоит одного PRAGMA. После
+изменения наблюдатель дочитывает новые записи task_status_history и files
+выше запомненных id и раздает события подписчикам, которым они адресованы
+(курсант задачи и куратор проекта).
+
+Ошибка базы (например, "database is locked" во время обслуживания или
+checkpoint) не останавливает наблюдатель: он закрывает соединение, ждет с
+нарастающей паузой и подключается заново, не теряя отметок.
+"""
+import json
+import logging
+import queue
+import sqlite3
+import threading
+
+
+class ChangeFeed:
+    """Общий наблюдатель за базой и реестр подписчиков по пользователям"""
+
+    def __init__(self, db_path: str = "schem.db", poll_interval: float = 0.5, queue_size: int = 100,
+                 max_backoff: float = 30, logger: logging.Logger = None):
+        self.db_path = db_path
+        self.poll_interval = poll_interval
+        self.queue_size = queue_size
+        self.max_backoff = max_backoff  # секунд; предел паузы перед переподключением
+        self.logger = logger or logging.getLogger(__name__)
+        self._subscribers = {}  # {user_id: set(queue.Queue)}
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop_event = threading.Event()
+        self._watermarks_ready = False
+        self._last_history_id = 0
+        self._last_file_id = 0
+        self._failures = 0  # ошибок базы подряд
+
+    # Подписки
+    def subscribe(self, user_id: int) -> queue.Queue:
+        """Очередь событий для одного открытого потока пользователя"""
+        subscriber = queue.Queue(maxsize=self.queue_size)
+        with self._lock:
+            self._subscribers.setdefault(user_id, set()).add(subscriber)
+            self._ensure_started()
+        return subscriber
+
+    def unsubscribe(self, user_id: int, subscriber: queue.Queue):
+        with self._lock:
+            subscribers = self._subscribers.get(user_id)
+            if subscribers:
+                subscribers.discard(subscriber)
+                if not subscribers:
+                    del self._subscribers[user_id]
+
+    def subscriber_count(self) -> int:
+        with self._lock:
+            return sum(len(subscribers) for subscribers in self._subscribers.values())
+
+    def publish(self, event: str, data: dict, recipients):
+        """Доставка события подписчикам; переполненная очередь получает запрос на полную перезагрузку"""
+        with self._lock:
+            targets = [subscriber
+                       for user_id in set(recipients) if user_id is not None
+                       for subscriber in self._subscribers.get(user_id, ())]
+        for subscriber in targets:
+            try:
+                subscriber.put_nowait((event, data))
+            except queue.Full:
+                # Клиент не успевает читать: очищаем очередь и просим страницу перезагрузиться
+                try:
+                    while True:
+                        subscriber.get_nowait()
+                except queue.Empty:
+                    pass
+                subscriber.put_nowait(('resync', {}))
+
+    # Наблюдатель
+    def _ensure_started(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop_event.clear()
+            self._thread = threading.Thread(target=self._watch, name='change_feed', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+
+    def _watch(self):
+        """Опрос до остановки; после ошибки базы - пауза и новое соединение"""
+        while not self._stop_event.is_set():
+            try:
+                self._poll()
+            except sqlite3.Error as e:
+                self._failures += 1
+                delay = min(self.poll_interval * 2 ** self._failures, self.max_backoff)
+                self.logger.warning("Лента изменений: ошибка базы (%s), переподключение через %.1f с "
+                                    "(ошибок подряд: %d)", e, delay, self._failures)
+                self._stop_event.wait(delay)
+
+    def _poll(self):
+        """Цикл опроса на одном соединении; ошибка базы прерывает его (см. _watch)"""
+        conn = sqlite3.connect(self.db_path)
+        conn.row_factory = sqlite3.Row
+        try:
+            cursor = conn.cursor()
+            data_version = cursor.execute("PRAGMA data_version").fetchone()[0]
+            if self._watermarks_ready and self.subscriber_count():
+                # Переподключение: изменения, сделанные за время ошибки, раздаются сразу
+                self._dispatch_changes(cursor)
+            else:
+                self._init_watermarks(cursor)
+                self._watermarks_ready = True
+            if self._failures:
+                self.logger.info("Лента изменений: соединение с базой восстановлено")
+                self._failures = 0
+
+            while not self._stop_event.wait(self.poll_interval):
+                current = cursor.execute("PRAGMA data_version").fetchone()[0]
+                if current == data_version:
+                    continue
+                data_version = current
+                if self.subscriber_count():
+                    self._dispatch_changes(cursor)
+                else:
+                    # Слушать некому: просто сдвигаем отметки
+                    self._init_watermarks(cursor)
+        finally:
+            conn.close()
+
+    def _init_watermarks(self, cursor):
+        cursor.execute("SELECT COALESCE(MAX(id), 0) FROM task_status_history")
+        self._last_history_id = cursor.fetchone()[0]
+        cursor.execute("SELECT COALESCE(MAX(id), 0) FROM files")
+        self._last_file_id = cursor.fetchone()[0]
+
+    def _dispatch_changes(self, cursor):
+        cursor.execute("""
+            SELECT h.id, h.task_id, h.from_status, h.to_status, h.changed_at,
+                   t.title, t.cadet_id, t.project_id,
+                   p.title as project_title, p.curator_id,
+                   ts.status_name
+            FROM task_status_history h
+            JOIN tasks t ON h.task_id = t.id
+            JOIN projects p ON t.project_id = p.id
+            JOIN task_status_codes ts ON h.to_status = ts.status_code
+            WHERE h.id > ?
+            ORDER BY h.id
+        """, (self._last_history_id,))
+        for row in cursor.fetchall():
+            self._last_history_id = row['id']
+            data = {
+                'task_id': row['task_id'],
+                'title': row['title'],
+                'project_id': row['project_id'],
+                'project_title': row['project_title'],
+                'status_code': row['to_status'],
+                'status_name': row['status_name'],
+                'from_status': row['from_status'],
+                'changed_at': row['changed_at'],
+            }
+            event = 'task_assigned' if row['from_status'] is None else 'task_status'
+            self.publish(event, data, (row['cadet_id'], row['curator_id']))
+
+        cursor.execute("""
+            SELECT f.id, f.task_id, f.filename, f.upload_time, f.author_id,
+                   t.cadet_id, p.curator_id
+            FROM files f
+            JOIN tasks t ON f.task_id = t.id
+            JOIN projects p ON t.project_id = p.id
+            WHERE f.id > ?
+            ORDER BY f.id
+        """, (self._last_file_id,))
+        for row in cursor.fetchall():
+            self._last_file_id = row['id']
+            data = {
+                'task_id': row['task_id'],
+                'file_id': row['id'],
+                'filename': row['filename'],
+                'upload_time': row['upload_time'],
+            }
+            self.publish('file_uploaded', data, (row['cadet_id'], row['curator_id']))
+
+
+def format_sse(event: str, data: dict) -> str:
+    """Кадр text/event-stream"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def event_stream(feed: ChangeFeed, user_id: int, heartbeat: float = 15):
+    """Генератор потока событий пользователя с периодическим keepalive"""
+    subscriber = feed.subscribe(user_id)
+    try:
+        yield "retry: 3000\n\n"
+        while True:
+            try:
+                event, data = subscriber.get(timeout=heartbeat)
+            except queue.Empty:
+                yield ": keepalive\n\n"
+                continue
+            yield format_sse(event, data)
+    finally:
+        feed.unsubscribe(user_id, subscriber)
@@ -0,0 +1,192 @@
+# maintenance.py
+"""Обслуживание базы: статистика планировщика, контрольные точки WAL и
+инкрементальная очистка свободных страниц.
+
+Каждый шаг ограничен бюджетом, чтобы не держать блокировку записи долго:
+ANALYZE - через PRAGMA analysis_limit, очистка - порциями по vacuum_chunk
+страниц (каждая порция - отдельная транзакция через поток-писатель),
+контрольная точка - в режиме PASSIVE, который не ждет читателей и писателей.
+
+Запуск из приложения - фоновой задачей (см. start_background_workers),
+вручную:
+
+    python maintenance.py [schem.db] [--vacuum-pages 2000] [--analyze]
+    python maintenance.py schem.db --enable-incremental-vacuum
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import time
+
+from sql_active import DatabaseManager
+
+
+def configure_database(db_path: str) -> dict:
+    """Режим журнала WAL (читатели не блокируют писателя); значение сохраняется в файле базы"""
+    conn = sqlite3.connect(db_path)
+    try:
+        journal_mode = conn.execute("PRAGMA journal_mode = WAL").fetchone()[0]
+        auto_vacuum = conn.execute("PRAGMA auto_vacuum").fetchone()[0]
+        return {'journal_mode': journal_mode, 'auto_vacuum': auto_vacuum}
+    finally:
+        conn.close()
+
+
+def database_stats(db_path: str) -> dict:
+    """Размер файлов базы, число страниц и свободных страниц"""
+    conn = sqlite3.connect(db_path)
+    try:
+        page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+        page_count = conn.execute("PRAGMA page_count").fetchone()[0]
+        freelist_count = conn.execute("PRAGMA freelist_count").fetchone()[0]
+    finally:
+        conn.close()
+    wal_path = db_path + '-wal'
+    return {
+        'file_size': os.path.getsize(db_path),
+        'wal_size': os.path.getsize(wal_path) if os.path.exists(wal_path) else 0,
+        'page_size': page_size,
+        'page_count': page_count,
+        'freelist_count': freelist_count,
+    }
+
+
+def enable_incremental_vacuum(db_path: str) -> dict:
+    """Перевод существующей базы на auto_vacuum=INCREMENTAL.
+
+    Требует полного VACUUM (перезапись файла с блокировкой базы), поэтому
+    выполняется только вручную из командной строки при остановленном приложении.
+    """
+    before = database_stats(db_path)
+    started = time.monotonic()
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    try:
+        conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        conn.execute("VACUUM")
+        auto_vacuum = conn.execute("PRAGMA auto_vacuum").fetchone()[0]
+    finally:
+        conn.close()
+    return {'auto_vacuum': auto_vacuum, 'before': before, 'after': database_stats(db_path),
+            'seconds': round(time.monotonic() - started, 3)}
+
+
+def run_maintenance(db_path: str = 'schem.db', vacuum_pages: int = 500, vacuum_chunk: int = 100,
+                    analysis_limit: int = 1000, full_analyze: bool = False,
+                    checkpoint_mode: str = 'PASSIVE') -> dict:
+    """Один проход обслуживания с отчетом: состояние до и после и время каждого шага"""
+    db = DatabaseManager(db_path)
+    started = time.monotonic()
+    before = database_stats(db_path)
+    steps = {}
+
+    # Статистика планировщика: первый раз (или по запросу) - ANALYZE, дальше - PRAGMA optimize,
+    # который пересобирает статистику только там, где она устарела
+    step_started = time.monotonic()
+
+    def analyze(cursor):
+        cursor.execute(f"PRAGMA analysis_limit = {int(analysis_limit)}")
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'")
+        if full_analyze or cursor.fetchone() is None:
+            cursor.execute("ANALYZE")
+            return 'analyze'
+        cursor.execute("PRAGMA optimize")
+        return 'optimize'
+    steps['statistics'] = db.submit_write(analyze, exclusive=True, invalidates=()).result()
+    steps['statistics_seconds'] = round(time.monotonic() - step_started, 4)
+
+    # Инкрементальная очистка: свободные страницы возвращаются порциями
+    step_started = time.monotonic()
+    vacuumed = 0
+    conn = sqlite3.connect(db_path)
+    try:
+        auto_vacuum = conn.execute("PRAGMA auto_vacuum").fetchone()[0]
+    finally:
+        conn.close()
+    if auto_vacuum == 2:
+        def vacuum_chunk_step(cursor, pages):
+            cursor.execute("PRAGMA freelist_count")
+            free_before = cursor.fetchone()[0]
+            cursor.execute(f"PRAGMA incremental_vacuum({int(pages)})").fetchall()
+            cursor.execute("PRAGMA freelist_count")
+            return free_before - cursor.fetchone()[0]
+        while vacuumed < vacuum_pages:
+            freed = db.submit_write(vacuum_chunk_step, min(vacuum_chunk, vacuum_pages - vacuumed),
+                                    exclusive=True, invalidates=()).result()
+            if freed <= 0:
+                break
+            vacuumed += freed
+        steps['vacuum'] = 'incremental'
+    else:
+        steps['vacuum'] = 'отключена (auto_vacuum != INCREMENTAL)'
+    steps['vacuumed_pages'] = vacuumed
+    steps['vacuum_seconds'] = round(time.monotonic() - step_started, 4)
+
+    # Контрольная точка WAL (в режиме PASSIVE не ждет активных транзакций)
+    step_started = time.monotonic()
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    try:
+        busy, wal_frames, checkpointed = conn.execute(
+            f"PRAGMA wal_checkpoint({checkpoint_mode})").fetchone()
+    finally:
+        conn.close()
+    steps['checkpoint'] = {'mode': checkpoint_mode, 'busy': busy,
+                           'wal_frames': wal_frames, 'checkpointed': checkpointed}
+    steps['checkpoint_seconds'] = round(time.monotonic() - step_started, 4)
+
+    return {
+        'before': before,
+        'after': database_stats(db_path),
+        'steps': steps,
+        'seconds': round(time.monotonic() - started, 4),
+        'finished_at': time.strftime('%Y-%m-%d %H:%M:%S'),
+    }
+
+
+def format_report(report: dict) -> str:
+    before, after, steps = report['before'], report['after'], report['steps']
+    lines = [
+        f"Размер файла: {before['file_size']} -> {after['file_size']} байт "
+        f"(WAL: {before['wal_size']} -> {after['wal_size']})",
+        f"Свободных страниц: {before['freelist_count']} -> {after['freelist_count']} "
+        f"(всего страниц: {before['page_count']} -> {after['page_count']})",
+        f"Статистика: {steps['statistics']} за {steps['statistics_seconds']} с",
+        f"Очистка: {steps['vacuum']}, освобождено страниц {steps['vacuumed_pages']} "
+        f"за {steps['vacuum_seconds']} с",
+        f"Контрольная точка: {steps['checkpoint']} за {steps['checkpoint_seconds']} с",
+        f"Всего: {report['seconds']} с",
+    ]
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Обслуживание базы данных')
+    parser.add_argument('database', nargs='?', default='schem.db')
+    parser.add_argument('--vacuum-pages', type=int, default=2000, help='бюджет очистки (страниц)')
+    parser.add_argument('--analysis-limit', type=int, default=1000, help='PRAGMA analysis_limit')
+    parser.add_argument('--analyze', action='store_true', help='полный ANALYZE вместо PRAGMA optimize')
+    parser.add_argument('--checkpoint', default='PASSIVE', choices=['PASSIVE', 'FULL', 'RESTART', 'TRUNCATE'])
+    parser.add_argument('--enable-incremental-vacuum', action='store_true',
+                        help='однократно перевести базу на auto_vacuum=INCREMENTAL (полный VACUUM)')
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.database):
+        print(f"{args.database}: файл не найден")
+        return 1
+
+    if args.enable_incremental_vacuum:
+        result = enable_incremental_vacuum(args.database)
+        print(f"auto_vacuum = {result['auto_vacuum']}, размер {result['before']['file_size']} -> "
+              f"{result['after']['file_size']} байт за {result['seconds']} с")
+        return 0
+
+    configure_database(args.database)
+    report = run_maintenance(args.database, vacuum_pages=args.vacuum_pages,
+                             analysis_limit=args.analysis_limit, full_analyze=args.analyze,
+                             checkpoint_mode=args.checkpoint)
+    print(format_report(report))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
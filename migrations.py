@@ -0,0 +1,548 @@
+# migrations.py
+"""Версионные миграции схемы базы по PRAGMA user_version.
+
+Каждая миграция переводит схему на одну версию вперед и применяется в своей
+транзакции вместе с записью нового user_version. При актуальной схеме запуск
+приложения читает одно число и ничего больше не делает.
+
+Миграции с background=True строят индексы на больших таблицах: при запуске
+приложения они выполняются в фоне, по одному индексу на транзакцию через
+поток-писатель, чтобы не держать блокировку записи все время сборки.
+Такие миграции должны идти в конце списка: приложение работает и без них.
+
+Обновление существующих баз (в том числе schem.db и schem11.db):
+
+    python migrations.py schem.db schem11.db
+    python migrations.py --status schem.db
+"""
+import argparse
+import logging
+import os
+import sqlite3
+import sys
+import threading
+
+from sql_active import DatabaseManager, _dwell_bucket_sql
+
+
+class Migration:
+    """Одна версия схемы: шаги - функции step(cursor)"""
+
+    def __init__(self, version: int, description: str, steps, background: bool = False):
+        self.version = version
+        self.description = description
+        self.steps = steps
+        self.background = background
+
+
+def _columns(cursor, table: str) -> set:
+    cursor.execute(f"PRAGMA table_info({table})")
+    return {row[1] for row in cursor.fetchall()}
+
+
+def _sql(*statements):
+    """Шаг миграции из готовых SQL-выражений"""
+    def step(cursor):
+        for statement in statements:
+            cursor.execute(statement)
+    return step
+
+
+# Версия 1: исходная схема (таблицы, справочник статусов, индексы и триггеры целостности)
+def _base_schema(cursor):
+    # Создание таблицы пользователей (с академической группой из файла)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username VARCHAR(50) NOT NULL,
+            surname VARCHAR(50) NOT NULL,
+            patronymic VARCHAR(50),
+            email VARCHAR(100) NOT NULL UNIQUE,
+            password_hash VARCHAR(255) NOT NULL,
+            role VARCHAR(10) CHECK(role IN ('куратор', 'курсант')) NOT NULL,
+            registration_date DATETIME DEFAULT CURRENT_TIMESTAMP,
+            academic_group VARCHAR(50)
+        )
+    ''')
+
+    # Создание таблицы проектов
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS projects (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            title VARCHAR(255) NOT NULL,
+            description TEXT,
+            curator_id INTEGER NOT NULL,
+            status VARCHAR(20) CHECK(status IN ('планирование', 'активен', 'завершён')) NOT NULL,
+            deadline DATE,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (curator_id) REFERENCES users(id) ON DELETE CASCADE
+        )
+    ''')
+
+    # Создание таблицы задач (сроки задач добавляет миграция 2)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS tasks (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            project_id INTEGER NOT NULL,
+            cadet_id INTEGER NOT NULL,
+            title VARCHAR(255) NOT NULL,
+            description TEXT,
+            status_code INTEGER CHECK(status_code IN (1, 2, 3, 4)) NOT NULL DEFAULT 1,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            updated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (project_id) REFERENCES projects(id) ON DELETE CASCADE,
+            FOREIGN KEY (cadet_id) REFERENCES users(id) ON DELETE CASCADE
+        )
+    ''')
+
+    # Создание таблицы файлов
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS files (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            filename VARCHAR(255) NOT NULL,
+            file_path VARCHAR(500) NOT NULL,
+            task_id INTEGER NOT NULL,
+            author_id INTEGER NOT NULL,
+            upload_time DATETIME DEFAULT CURRENT_TIMESTAMP,
+            file_size INTEGER,
+            mime_type VARCHAR(100),
+            FOREIGN KEY (task_id) REFERENCES tasks(id) ON DELETE CASCADE,
+            FOREIGN KEY (author_id) REFERENCES users(id) ON DELETE CASCADE
+        )
+    ''')
+
+    # Создание таблицы для справочника статусов задач
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS task_status_codes (
+            status_code INTEGER PRIMARY KEY,
+            status_name VARCHAR(20) NOT NULL,
+            description TEXT
+        )
+    ''')
+
+    # Создание индексов для улучшения производительности
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_projects_curator ON projects(curator_id)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_projects_status ON projects(status)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_tasks_project ON tasks(project_id)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_tasks_cadet ON tasks(cadet_id)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_tasks_status ON tasks(status_code)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_files_task ON files(task_id)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_files_author ON files(author_id)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_users_email ON users(email)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_users_role ON users(role)')
+
+    # Заполнение справочника статусов задач
+    cursor.execute('''
+        INSERT OR IGNORE INTO task_status_codes (status_code, status_name, description) VALUES
+        (1, 'ожидает', 'Задача ожидает начала работы'),
+        (2, 'в работе', 'Задача находится в работе'),
+        (3, 'на проверке', 'Задача отправлена на проверку'),
+        (4, 'завершена', 'Задача завершена')
+    ''')
+
+    # Триггер для автоматического обновления updated_at в задачах
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS update_tasks_timestamp
+        AFTER UPDATE ON tasks
+        FOR EACH ROW
+        BEGIN
+            UPDATE tasks SET updated_at = CURRENT_TIMESTAMP WHERE id = NEW.id;
+        END
+    ''')
+
+    # Триггер для проверки, что куратор имеет правильную роль
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS check_curator_role
+        BEFORE INSERT ON projects
+        FOR EACH ROW
+        BEGIN
+            SELECT CASE
+                WHEN (SELECT role FROM users WHERE id = NEW.curator_id) != 'куратор'
+                THEN RAISE(ABORT, 'Только пользователь с ролью "куратор" может быть назначен куратором проекта')
+            END;
+        END
+    ''')
+
+    # Триггер для проверки, что курсант имеет правильную роль
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS check_cadet_role
+        BEFORE INSERT ON tasks
+        FOR EACH ROW
+        BEGIN
+            SELECT CASE
+                WHEN (SELECT role FROM users WHERE id = NEW.cadet_id) != 'курсант'
+                THEN RAISE(ABORT, 'Только пользователь с ролью "курсант" может быть назначен исполнителем задачи')
+            END;
+        END
+    ''')
+
+    # Триггер для проверки дедлайна проекта
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS check_project_deadline
+        BEFORE INSERT ON projects
+        FOR EACH ROW
+        BEGIN
+            SELECT CASE
+                WHEN NEW.deadline IS NOT NULL AND DATE(NEW.deadline) < DATE('now')
+                THEN RAISE(ABORT, 'Дедлайн проекта не может быть в прошлом')
+            END;
+        END
+    ''')
+
+    # Триггер для автоматической смены статуса проекта при завершении всех задач
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS update_project_status_on_task_completion
+        AFTER UPDATE OF status_code ON tasks
+        FOR EACH ROW
+        WHEN NEW.status_code = 4
+        BEGIN
+            UPDATE projects
+            SET status = 'завершён'
+            WHERE id = NEW.project_id
+            AND NOT EXISTS (
+                SELECT 1 FROM tasks
+                WHERE project_id = NEW.project_id
+                AND status_code != 4
+            );
+        END
+    ''')
+
+
+# Версия 2: сроки задач (в старых базах этих колонок нет)
+def _task_dates(cursor):
+    columns = _columns(cursor, 'tasks')
+    if 'start_date' not in columns:
+        cursor.execute('ALTER TABLE tasks ADD COLUMN start_date DATE')
+    if 'due_date' not in columns:
+        cursor.execute('ALTER TABLE tasks ADD COLUMN due_date DATE')
+
+
+# Версия 3: история статусов задач и сводки для аналитики
+def _status_history(cursor):
+    # История смен статусов задач (пишется триггерами в той же транзакции, что и UPDATE)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS task_status_history (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            task_id INTEGER NOT NULL,
+            project_id INTEGER NOT NULL,
+            from_status INTEGER,
+            to_status INTEGER NOT NULL,
+            changed_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            seconds_in_previous INTEGER,
+            FOREIGN KEY (task_id) REFERENCES tasks(id) ON DELETE CASCADE
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_status_history_task ON task_status_history(task_id, changed_at)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_status_history_project ON task_status_history(project_id, changed_at)')
+
+    # Дневная сводка по статусам: сколько задач вошло в статус / вышло из него и сколько в нем пробыло
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS task_status_daily (
+            day DATE NOT NULL,
+            project_id INTEGER NOT NULL,
+            status_code INTEGER NOT NULL,
+            entered INTEGER NOT NULL DEFAULT 0,
+            exited INTEGER NOT NULL DEFAULT 0,
+            dwell_count INTEGER NOT NULL DEFAULT 0,
+            dwell_seconds INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (project_id, day, status_code)
+        )
+    ''')
+
+    # Гистограмма времени пребывания в статусе (для перцентилей без обхода всей истории)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS task_status_dwell_buckets (
+            project_id INTEGER NOT NULL,
+            status_code INTEGER NOT NULL,
+            bucket_seconds INTEGER NOT NULL,
+            transitions INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (project_id, status_code, bucket_seconds)
+        )
+    ''')
+
+    # Триггер: начальный статус новой задачи
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS record_task_status_on_insert
+        AFTER INSERT ON tasks
+        FOR EACH ROW
+        BEGIN
+            INSERT INTO task_status_history (task_id, project_id, from_status, to_status)
+            VALUES (NEW.id, NEW.project_id, NULL, NEW.status_code);
+        END
+    ''')
+
+    # Триггер: смена статуса с подсчетом времени, проведенного в предыдущем статусе
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS record_task_status_change
+        AFTER UPDATE OF status_code ON tasks
+        FOR EACH ROW
+        WHEN OLD.status_code != NEW.status_code
+        BEGIN
+            INSERT INTO task_status_history
+                (task_id, project_id, from_status, to_status, seconds_in_previous)
+            VALUES (
+                NEW.id, NEW.project_id, OLD.status_code, NEW.status_code,
+                MAX(0, CAST(strftime('%s', 'now') AS INTEGER) - CAST(strftime('%s', COALESCE(
+                    (SELECT h.changed_at FROM task_status_history h
+                     WHERE h.task_id = NEW.id
+                     ORDER BY h.changed_at DESC, h.id DESC LIMIT 1),
+                    OLD.created_at)) AS INTEGER))
+            );
+        END
+    ''')
+
+    # Триггер: инкрементальное обновление сводок по каждой записи истории.
+    # Границы корзин зашиты в текст триггера: их изменение требует новой миграции.
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS rollup_task_status_history
+        AFTER INSERT ON task_status_history
+        FOR EACH ROW
+        BEGIN
+            INSERT INTO task_status_daily (day, project_id, status_code, entered)
+            VALUES (DATE(NEW.changed_at), NEW.project_id, NEW.to_status, 1)
+            ON CONFLICT (project_id, day, status_code) DO UPDATE SET entered = entered + 1;
+
+            INSERT INTO task_status_daily (day, project_id, status_code, exited, dwell_count, dwell_seconds)
+            SELECT DATE(NEW.changed_at), NEW.project_id, NEW.from_status, 1, 1, COALESCE(NEW.seconds_in_previous, 0)
+            WHERE NEW.from_status IS NOT NULL
+            ON CONFLICT (project_id, day, status_code) DO UPDATE SET
+                exited = exited + 1,
+                dwell_count = dwell_count + 1,
+                dwell_seconds = dwell_seconds + excluded.dwell_seconds;
+
+            INSERT INTO task_status_dwell_buckets (project_id, status_code, bucket_seconds, transitions)
+            SELECT NEW.project_id, NEW.from_status, {_dwell_bucket_sql('COALESCE(NEW.seconds_in_previous, 0)')}, 1
+            WHERE NEW.from_status IS NOT NULL
+            ON CONFLICT (project_id, status_code, bucket_seconds) DO UPDATE SET
+                transitions = transitions + 1;
+        END
+    ''')
+
+    # Триггер: удаленная задача уходит из сводки (иначе burndown никогда не дойдет до нуля)
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS rollup_task_delete
+        AFTER DELETE ON tasks
+        FOR EACH ROW
+        BEGIN
+            INSERT INTO task_status_daily (day, project_id, status_code, exited)
+            VALUES (DATE('now'), OLD.project_id, OLD.status_code, 1)
+            ON CONFLICT (project_id, day, status_code) DO UPDATE SET exited = exited + 1;
+        END
+    ''')
+
+    # Задачи, созданные до появления истории, получают начальную запись
+    cursor.execute('''
+        INSERT INTO task_status_history (task_id, project_id, from_status, to_status, changed_at)
+        SELECT t.id, t.project_id, NULL, t.status_code, COALESCE(t.updated_at, t.created_at)
+        FROM tasks t
+        WHERE NOT EXISTS (SELECT 1 FROM task_status_history h WHERE h.task_id = t.id)
+    ''')
+
+
+# Версия 4: предупреждения о сроках и исходящие уведомления
+def _deadlines_and_outbox(cursor):
+    # Текущие предупреждения о сроках (заполняются фоновым обходчиком дедлайнов)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS deadline_alerts (
+            entity_type VARCHAR(10) CHECK(entity_type IN ('task', 'project')) NOT NULL,
+            entity_id INTEGER NOT NULL,
+            state VARCHAR(10) CHECK(state IN ('soon', 'overdue')) NOT NULL,
+            due DATE NOT NULL,
+            curator_id INTEGER NOT NULL,
+            cadet_id INTEGER,
+            detected_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            notified INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (entity_type, entity_id)
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_deadline_alerts_curator ON deadline_alerts(curator_id, state)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_deadline_alerts_cadet ON deadline_alerts(cadet_id, state)')
+
+    # Исходящие уведомления (transactional outbox): пишутся в одной транзакции с изменением,
+    # доставляются фоновым рассыльщиком
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS notification_outbox (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            recipient_id INTEGER NOT NULL,
+            event_type VARCHAR(30) NOT NULL,
+            task_id INTEGER,
+            project_id INTEGER,
+            message TEXT NOT NULL,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            next_attempt_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            sent_at DATETIME,
+            last_error TEXT,
+            FOREIGN KEY (recipient_id) REFERENCES users(id) ON DELETE CASCADE
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_outbox_pending ON notification_outbox(next_attempt_at) WHERE sent_at IS NULL')
+
+
+MIGRATIONS = [
+    Migration(1, 'Исходная схема', [_base_schema]),
+    Migration(2, 'Сроки задач (start_date, due_date)', [_task_dates]),
+    Migration(3, 'История статусов задач и сводки', [_status_history]),
+    Migration(4, 'Предупреждения о сроках и исходящие уведомления', [_deadlines_and_outbox]),
+    # Индексы для списков, очереди проверки и обхода сроков - по одному на транзакцию
+    Migration(5, 'Индексы для списков и обхода сроков', [
+        # Очередь на проверку: частичный индекс только по задачам в статусе "на проверке"
+        _sql('CREATE INDEX IF NOT EXISTS idx_tasks_review_queue ON tasks(updated_at, id) WHERE status_code = 3'),
+        _sql('CREATE INDEX IF NOT EXISTS idx_files_task_upload ON files(task_id, upload_time)'),
+        # Списки проектов и задач в разрезе куратора
+        _sql('CREATE INDEX IF NOT EXISTS idx_projects_curator_created ON projects(curator_id, created_at)'),
+        _sql('CREATE INDEX IF NOT EXISTS idx_tasks_project_status ON tasks(project_id, status_code, created_at)'),
+        # Поиск просроченных: диапазонные выборки по срокам незавершенных задач и проектов
+        _sql('CREATE INDEX IF NOT EXISTS idx_tasks_due_open ON tasks(due_date) WHERE status_code != 4 AND due_date IS NOT NULL'),
+        _sql('CREATE INDEX IF NOT EXISTS idx_projects_deadline ON projects(deadline) WHERE deadline IS NOT NULL'),
+    ], background=True),
+]
+
+LATEST_VERSION = MIGRATIONS[-1].version
+
+
+def get_version(conn) -> int:
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def _is_empty(conn) -> bool:
+    return conn.execute("SELECT COUNT(*) FROM sqlite_master WHERE type = 'table'").fetchone()[0] == 0
+
+
+def _apply(conn, migration: Migration) -> bool:
+    """Миграция целиком в одной транзакции; False, если ее уже применил другой процесс"""
+    cursor = conn.cursor()
+    cursor.execute("BEGIN IMMEDIATE")
+    try:
+        if get_version(conn) >= migration.version:
+            cursor.execute("ROLLBACK")
+            return False
+        for step in migration.steps:
+            step(cursor)
+        cursor.execute(f"PRAGMA user_version = {int(migration.version)}")
+        cursor.execute("COMMIT")
+        return True
+    except Exception:
+        cursor.execute("ROLLBACK")
+        raise
+
+
+def migrate(db_path: str, defer_background: bool = False) -> dict:
+    """Применить недостающие миграции по порядку.
+
+    При defer_background=True фоновые миграции не выполняются (их список
+    возвращается в 'deferred'), если только база не пустая: в новой базе
+    индексы строятся мгновенно, и вся схема создается сразу.
+    """
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    try:
+        version = get_version(conn)
+        result = {'from': version, 'to': version, 'applied': [], 'deferred': []}
+        if version >= LATEST_VERSION:
+            return result
+
+        empty = _is_empty(conn)
+        if empty:
+            # В новой базе свободные страницы можно возвращать порциями (см. maintenance.py);
+            # для существующей базы режим включается только полным VACUUM
+            conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        defer = defer_background and not empty
+        for migration in MIGRATIONS:
+            if migration.version <= version:
+                continue
+            if migration.background and defer:
+                result['deferred'].append(migration.version)
+                continue
+            if _apply(conn, migration):
+                result['applied'].append(migration.version)
+        result['to'] = get_version(conn)
+        return result
+    finally:
+        conn.close()
+
+
+def pending_background(db_path: str) -> list:
+    """Фоновые миграции, которые еще не применены"""
+    conn = sqlite3.connect(db_path)
+    try:
+        version = get_version(conn)
+    finally:
+        conn.close()
+    return [migration for migration in MIGRATIONS if migration.background and migration.version > version]
+
+
+def run_background(db: DatabaseManager) -> list:
+    """Фоновые миграции через поток-писатель базы db: каждый шаг - отдельная
+    транзакция, номер версии записывается вместе с последним шагом"""
+    applied = []
+    for migration in pending_background(db.db_path):
+        for step in migration.steps[:-1]:
+            db.submit_write(step, exclusive=True).result()
+
+        def finish(cursor, migration=migration):
+            migration.steps[-1](cursor)
+            cursor.execute("PRAGMA user_version")
+            if cursor.fetchone()[0] < migration.version:
+                cursor.execute(f"PRAGMA user_version = {int(migration.version)}")
+        db.submit_write(finish, exclusive=True).result()
+        applied.append(migration.version)
+    return applied
+
+
+_background_thread = None
+
+
+def start_background(db: DatabaseManager, logger: logging.Logger = None):
+    """Запуск фоновых миграций в отдельном потоке (если они есть и поток еще не запущен).
+
+    Шаги идут через поток-писатель db, общий с остальными записями приложения.
+    """
+    global _background_thread
+    if _background_thread is not None and _background_thread.is_alive():
+        return _background_thread
+    if not pending_background(db.db_path):
+        return None
+    logger = logger or logging.getLogger(__name__)
+
+    def run():
+        try:
+            applied = run_background(db)
+            logger.info("Фоновые миграции применены: %s", applied)
+        except Exception:
+            logger.exception("Ошибка фоновой миграции")
+
+    _background_thread = threading.Thread(target=run, name='schema_migrations', daemon=True)
+    _background_thread.start()
+    return _background_thread
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Миграции схемы базы данных')
+    parser.add_argument('databases', nargs='*', default=['schem.db'], help='файлы баз (по умолчанию schem.db)')
+    parser.add_argument('--status', action='store_true', help='только показать версии схемы')
+    args = parser.parse_args(argv)
+
+    for db_path in args.databases:
+        if not os.path.exists(db_path):
+            print(f"{db_path}: файл не найден")
+            continue
+        if args.status:
+            conn = sqlite3.connect(db_path)
+            try:
+                version = get_version(conn)
+            finally:
+                conn.close()
+            pending = [m.version for m in MIGRATIONS if m.version > version]
+            print(f"{db_path}: версия {version} из {LATEST_VERSION}, ожидают: {pending or 'нет'}")
+            continue
+
+        result = migrate(db_path)
+        if result['applied']:
+            print(f"{db_path}: {result['from']} -> {result['to']}, применены миграции {result['applied']}")
+        else:
+            print(f"{db_path}: схема актуальна (версия {result['to']})")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,120 @@
+# notifications.py
+"""Доставка уведомлений из notification_outbox по SMTP.
+
+Рассыльщик забирает пачку неотправленных событий, собирает их в один дайджест
+на получателя и отправляет все письма пачки через одно SMTP-соединение.
+Для локальной проверки достаточно любого SMTP-заглушки, например:
+
+    python -m aiosmtpd -n -l localhost:1025
+"""
+import smtplib
+from email.message import EmailMessage
+
+from sql_active import DatabaseManager
+
+
+EVENT_TITLES = {
+    'task_assigned': 'Новые задачи',
+    'task_approved': 'Принятые задачи',
+    'task_rejected': 'Задачи на доработку',
+    'task_status': 'Изменения статусов',
+    'task_overdue': 'Просроченные задачи',
+    'task_due_soon': 'Скоро срок',
+}
+
+
+class NotificationDispatcher:
+    """Пакетная отправка дайджестов уведомлений с переиспользованием SMTP-соединения"""
+
+    def __init__(self, db: DatabaseManager = None, host: str = 'localhost', port: int = 1025,
+                 sender: str = 'projmanager@localhost', username: str = None, password: str = None,
+                 use_tls: bool = False, batch_size: int = 500, max_attempts: int = 5,
+                 timeout: float = 10):
+        self.db = db or DatabaseManager()
+        self.host = host
+        self.port = port
+        self.sender = sender
+        self.username = username
+        self.password = password
+        self.use_tls = use_tls
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.timeout = timeout
+
+    def run_once(self) -> dict:
+        """Один проход: забрать пачку, сгруппировать по получателям и отправить"""
+        pending = self.db.get_pending_notifications(self.batch_size, self.max_attempts)
+        if not pending:
+            return {'events': 0, 'digests': 0, 'failed': 0}
+
+        digests = {}
+        for event in pending:
+            digests.setdefault(event['recipient_id'], []).append(event)
+
+        sent_ids, failed_ids = [], []
+        smtp = None
+        try:
+            pending_digests = list(digests.values())
+            while pending_digests:
+                events = pending_digests.pop(0)
+                event_ids = [event['id'] for event in events]
+                message = self.build_digest(events)
+                try:
+                    smtp = smtp or self._connect()
+                    try:
+                        smtp.send_message(message)
+                    except smtplib.SMTPServerDisconnected:
+                        # Сервер закрыл соединение посреди пачки: одна попытка переподключения
+                        smtp = self._connect()
+                        smtp.send_message(message)
+                    sent_ids.extend(event_ids)
+                except (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused, smtplib.SMTPDataError) as e:
+                    # Отказ по конкретному письму не мешает остальным получателям
+                    failed_ids.extend(event_ids)
+                    self.db.mark_notifications_failed(event_ids, str(e))
+                except (smtplib.SMTPException, OSError) as e:
+                    # Сервер недоступен: текущее и все оставшиеся письма уходят на повтор с задержкой
+                    smtp = None
+                    rest = event_ids + [event['id'] for later in pending_digests for event in later]
+                    failed_ids.extend(rest)
+                    self.db.mark_notifications_failed(rest, str(e))
+                    break
+        finally:
+            if smtp is not None:
+                try:
+                    smtp.quit()
+                except (smtplib.SMTPException, OSError):
+                    pass
+            self.db.mark_notifications_sent(sent_ids)
+
+        return {'events': len(pending), 'digests': len(digests), 'failed': len(failed_ids)}
+
+    def build_digest(self, events) -> EmailMessage:
+        """Одно письмо со всеми событиями получателя, сгруппированными по типу"""
+        first = events[0]
+        sections = {}
+        for event in events:
+            sections.setdefault(event['event_type'], []).append(event)
+
+        lines = [f"Здравствуйте, {first['recipient_name']}!", '']
+        for event_type, items in sections.items():
+            lines.append(EVENT_TITLES.get(event_type, event_type) + ':')
+            for item in items:
+                lines.append(f"  - {item['message']} ({item['created_at']})")
+            lines.append('')
+        lines.append('Это письмо отправлено автоматически системой управления проектами.')
+
+        message = EmailMessage()
+        message['From'] = self.sender
+        message['To'] = first['recipient_email']
+        message['Subject'] = f'Уведомления по задачам ({len(events)})'
+        message.set_content('\n'.join(lines))
+        return message
+
+    def _connect(self) -> smtplib.SMTP:
+        smtp = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        if self.use_tls:
+            smtp.starttls()
+        if self.username:
+            smtp.login(self.username, self.password)
+        return smtp
@@ -0,0 +1,272 @@
+# passwords.py
+"""Хеширование паролей с солью и настраиваемой стоимостью в пуле процессов.
+
+Формат хеша: pbkdf2_sha256$<итерации>$<соль>$<хеш> или
+scrypt$<n>$<r>$<p>$<соль>$<хеш> (соль и хеш - base64). Старые хеши - одна
+несоленая SHA-256 в hex (64 символа): они проверяются как раньше, а после
+успешного входа заменяются новым хешем (needs_rehash).
+
+Медленная функция выполняется в отдельных процессах: поток запроса только
+ждет результат, не удерживая GIL, поэтому остальные запросы процесса Flask
+продолжают обслуживаться. Пул создается при первом использовании; в
+приложении он запускается заранее (start), до фоновых потоков.
+
+Подбор стоимости под целевое время и замер входа под нагрузкой:
+
+    python passwords.py --target 0.25
+    python passwords.py --iterations 200000 --logins 64 --threads 16
+"""
+import argparse
+import base64
+import hashlib
+import hmac
+import os
+import secrets
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+LEGACY_HEX_LENGTH = 64
+
+
+def _b64(data: bytes) -> str:
+    return base64.b64encode(data).decode().rstrip('=')
+
+
+def _unb64(text: str) -> bytes:
+    return base64.b64decode(text + '=' * (-len(text) % 4))
+
+
+# Функции верхнего уровня: выполняются в процессах пула
+def _pbkdf2(password: str, salt: bytes, iterations: int) -> bytes:
+    return hashlib.pbkdf2_hmac('sha256', password.encode(), salt, iterations)
+
+
+def _scrypt(password: str, salt: bytes, n: int, r: int, p: int) -> bytes:
+    return hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p, maxmem=256 * n * r + 1024 * 1024)
+
+
+def _warm_up(_=None) -> int:
+    return os.getpid()
+
+
+class PasswordHasher:
+    """Хеширование и проверка паролей в пуле процессов"""
+
+    ALGORITHMS = ('pbkdf2_sha256', 'scrypt')
+
+    def __init__(self, algorithm: str = 'pbkdf2_sha256', iterations: int = 260000,
+                 scrypt_n: int = 2 ** 14, scrypt_r: int = 8, scrypt_p: int = 1, workers: int = None):
+        if algorithm not in self.ALGORITHMS:
+            raise ValueError(f'Неизвестный алгоритм хеширования паролей: {algorithm}')
+        self.algorithm = algorithm
+        self.iterations = iterations
+        self.scrypt_n = scrypt_n
+        self.scrypt_r = scrypt_r
+        self.scrypt_p = scrypt_p
+        self.workers = workers or os.cpu_count() or 1
+        self._pool = None
+        self._pool_lock = threading.Lock()
+        self._dummy = None  # (параметры, хеш случайного пароля) для dummy_hash
+
+    # Пул процессов
+    def start(self):
+        """Запуск процессов пула заранее (до запуска фоновых потоков приложения)"""
+        pool = self._get_pool()
+        list(pool.map(_warm_up, range(self.workers)))
+        self.dummy_hash()
+        return self
+
+    def shutdown(self):
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.workers)
+            return self._pool
+
+    def _run(self, func, *args) -> bytes:
+        """Вычисление в пуле; если пул сломан (процесс упал), он пересоздается один раз"""
+        try:
+            return self._get_pool().submit(func, *args).result()
+        except BrokenProcessPool:
+            self.shutdown()
+            return self._get_pool().submit(func, *args).result()
+
+    def _derive(self, password: str, salt: bytes, params: tuple) -> bytes:
+        if params[0] == 'pbkdf2_sha256':
+            return self._run(_pbkdf2, password, salt, params[1])
+        return self._run(_scrypt, password, salt, *params[1:])
+
+    # Хеширование и проверка
+    def _current_params(self) -> tuple:
+        if self.algorithm == 'pbkdf2_sha256':
+            return ('pbkdf2_sha256', self.iterations)
+        return ('scrypt', self.scrypt_n, self.scrypt_r, self.scrypt_p)
+
+    @staticmethod
+    def _encode(params: tuple, salt: bytes, digest: bytes) -> str:
+        return '$'.join([params[0]] + [str(value) for value in params[1:]] + [_b64(salt), _b64(digest)])
+
+    @staticmethod
+    def _decode(stored: str):
+        """(параметры, соль, хеш) или None для старого или неизвестного формата"""
+        parts = stored.split('$')
+        try:
+            if parts[0] == 'pbkdf2_sha256' and len(parts) == 4:
+                return ('pbkdf2_sha256', int(parts[1])), _unb64(parts[2]), _unb64(parts[3])
+            if parts[0] == 'scrypt' and len(parts) == 6:
+                return ('scrypt', int(parts[1]), int(parts[2]), int(parts[3])), _unb64(parts[4]), _unb64(parts[5])
+        except ValueError:
+            return None
+        return None
+
+    def hash(self, password: str) -> str:
+        params = self._current_params()
+        salt = secrets.token_bytes(16)
+        return self._encode(params, salt, self._derive(password, salt, params))
+
+    def hash_many(self, passwords) -> list:
+        """Пачка паролей (массовая регистрация): все хеши считаются в пуле параллельно.
+
+        Если пул сломан, он пересоздается и пачка считается заново один раз (как в _run).
+        """
+        passwords = list(passwords)
+        params = self._current_params()
+        salts = [secrets.token_bytes(16) for _ in passwords]
+        try:
+            digests = self._derive_many(passwords, salts, params)
+        except BrokenProcessPool:
+            self.shutdown()
+            digests = self._derive_many(passwords, salts, params)
+        return [self._encode(params, salt, digest) for salt, digest in zip(salts, digests)]
+
+    def _derive_many(self, passwords: list, salts: list, params: tuple) -> list:
+        pool = self._get_pool()
+        if params[0] == 'pbkdf2_sha256':
+            futures = [pool.submit(_pbkdf2, password, salt, params[1]) for password, salt in zip(passwords, salts)]
+        else:
+            futures = [pool.submit(_scrypt, password, salt, *params[1:]) for password, salt in zip(passwords, salts)]
+        return [future.result() for future in futures]
+
+    def dummy_hash(self) -> str:
+        """Хеш случайного пароля с текущими параметрами стоимости.
+
+        Проверка пароля неизвестного пользователя по нему занимает столько же,
+        сколько проверка настоящего: время ответа не выдает, зарегистрирован ли email.
+        """
+        params = self._current_params()
+        dummy = self._dummy
+        if dummy is None or dummy[0] != params:
+            dummy = (params, self.hash(secrets.token_urlsafe(16)))
+            self._dummy = dummy
+        return dummy[1]
+
+    def verify(self, password: str, stored: str) -> bool:
+        if not stored:
+            return False
+        decoded = self._decode(stored)
+        if decoded is None:
+            if len(stored) == LEGACY_HEX_LENGTH:
+                legacy = hashlib.sha256(password.encode()).hexdigest()
+                return hmac.compare_digest(legacy, stored)
+            return False
+        params, salt, digest = decoded
+        return hmac.compare_digest(self._derive(password, salt, params), digest)
+
+    def needs_rehash(self, stored: str) -> bool:
+        """Хеш старого формата или с устаревшими параметрами стоимости"""
+        decoded = self._decode(stored or '')
+        return decoded is None or decoded[0] != self._current_params()
+
+    # Подбор стоимости
+    def calibrate(self, target_seconds: float = 0.25, samples: int = 3) -> dict:
+        """Подбор стоимости, при которой один хеш считается примерно target_seconds.
+
+        Для pbkdf2 время линейно по числу итераций; для scrypt подбирается
+        степень двойки n (r и p не меняются).
+        """
+        salt = secrets.token_bytes(16)
+        if self.algorithm == 'pbkdf2_sha256':
+            probe = 50000
+            elapsed = min(self._timed(_pbkdf2, 'calibrate', salt, probe) for _ in range(samples))
+            self.iterations = max(100000, int(probe * target_seconds / elapsed) // 1000 * 1000)
+            cost = {'iterations': self.iterations}
+        else:
+            n = 2 ** 12
+            while n < 2 ** 20:
+                elapsed = min(self._timed(_scrypt, 'calibrate', salt, n * 2, self.scrypt_r, self.scrypt_p)
+                              for _ in range(samples))
+                if elapsed > target_seconds:
+                    break
+                n *= 2
+            self.scrypt_n = max(2 ** 14, n)
+            cost = {'n': self.scrypt_n, 'r': self.scrypt_r, 'p': self.scrypt_p}
+        measured = min(self._timed(*self._hash_call(salt)) for _ in range(samples))
+        return {'algorithm': self.algorithm, 'target_seconds': target_seconds,
+                'hash_seconds': round(measured, 4), **cost}
+
+    def _hash_call(self, salt: bytes) -> tuple:
+        params = self._current_params()
+        if params[0] == 'pbkdf2_sha256':
+            return (_pbkdf2, 'calibrate', salt, params[1])
+        return (_scrypt, 'calibrate', salt, *params[1:])
+
+    @staticmethod
+    def _timed(func, *args) -> float:
+        started = time.perf_counter()
+        func(*args)
+        return time.perf_counter() - started
+
+
+def benchmark_logins(hasher: PasswordHasher, logins: int = 64, threads: int = 16) -> dict:
+    """Время проверки пароля при одновременных входах (как в потоках запросов Flask)"""
+    stored = hasher.hash('benchmark-password')
+    hasher.start()
+
+    def one_login(_):
+        started = time.perf_counter()
+        hasher.verify('benchmark-password', stored)
+        return time.perf_counter() - started
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        latencies = sorted(pool.map(one_login, range(logins)))
+    total = time.perf_counter() - started
+    return {
+        'logins': logins,
+        'threads': threads,
+        'workers': hasher.workers,
+        'p50': round(statistics.median(latencies), 4),
+        'p99': round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))], 4),
+        'logins_per_second': round(logins / total, 1),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Подбор стоимости хеширования паролей')
+    parser.add_argument('--algorithm', default='pbkdf2_sha256', choices=PasswordHasher.ALGORITHMS)
+    parser.add_argument('--target', type=float, help='целевое время одного хеша, секунд')
+    parser.add_argument('--iterations', type=int, default=260000)
+    parser.add_argument('--logins', type=int, default=64, help='входов в замере')
+    parser.add_argument('--threads', type=int, default=16, help='одновременных входов')
+    parser.add_argument('--workers', type=int, help='процессов пула (по умолчанию - число ядер)')
+    args = parser.parse_args(argv)
+
+    hasher = PasswordHasher(args.algorithm, iterations=args.iterations, workers=args.workers)
+    if args.target:
+        print(f"Подобранная стоимость: {hasher.calibrate(args.target)}")
+    print(f"Одновременные входы: {benchmark_logins(hasher, args.logins, args.threads)}")
+    hasher.shutdown()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,191 +1,278 @@
 import sqlite3
 import os
+import json
+import base64
+import threading
+import time
 from typing import List, Optional
 from datetime import datetime
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+
+from db_retry import RetryPolicy, busy_retry, contention
+from db_writer import DatabaseWriter
+from fragment_cache import fragments
+
+# Границы интервалов (в секундах) для гистограммы времени пребывания задачи в статусе.
+# Последняя граница покрывает всё, что дольше 90 дней.
+DWELL_BUCKETS = [
+    3600,          # 1 час
+    4 * 3600,      # 4 часа
+    12 * 3600,     # 12 часов
+    86400,         # 1 день
+    2 * 86400,     # 2 дня
+    4 * 86400,     # 4 дня
+    7 * 86400,     # неделя
+    14 * 86400,    # 2 недели
+    30 * 86400,    # месяц
+    90 * 86400,    # 3 месяца
+    10 * 365 * 86400,
+]
+
+
+def _dwell_bucket_sql(seconds_expr: str) -> str:
+    """SQL-выражение CASE, относящее длительность к интервалу гистограммы"""
+    cases = ' '.join(f'WHEN {seconds_expr} <= {bound} THEN {bound}' for bound in DWELL_BUCKETS[:-1])
+    return f'CASE {cases} ELSE {DWELL_BUCKETS[-1]} END'
+
+
+def encode_cursor(*values) -> str:
+    """Непрозрачный курсор для постраничной выдачи по ключу (keyset pagination)"""
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str, types: tuple) -> Optional[list]:
+    """Разбор курсора; для пустого, испорченного или чужого курсора возвращает None.
+
+    types - типы значений курсора по порядку (например, (str, int)): курсор
+    другой длины или с другими типами считается испорченным.
+    """
+    if not cursor:
+        return None
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        return None
+    if not isinstance(values, list) or len(values) != len(types):
+        return None
+    # bool в Python - подкласс int, но в курсоре это ошибка
+    if any(isinstance(value, bool) or not isinstance(value, value_type)
+           for value, value_type in zip(values, types)):
+        return None
+    return values
+
+
+# Поля, доступные через JSON API: имя поля -> выражение SQL.
+# Запрошенное подмножество полей превращается в узкий список SELECT.
+API_FIELDS = {
+    'tasks': {
+        'id': 't.id',
+        'title': 't.title',
+        'description': 't.description',
+        'status_code': 't.status_code',
+        'status_name': 'ts.status_name',
+        'project_id': 't.project_id',
+        'project_title': 'p.title',
+        'cadet_id': 't.cadet_id',
+        'cadet_name': 'u.username',
+        'cadet_surname': 'u.surname',
+        'created_at': 't.created_at',
+        'updated_at': 't.updated_at',
+        'start_date': 't.start_date',
+        'due_date': 't.due_date',
+        'status_description': 'ts.description',
+        'project_deadline': 'p.deadline',
+        'curator_id': 'p.curator_id',
+        'curator_name': 'cu.username',
+        'curator_surname': 'cu.surname',
+    },
+    'projects': {
+        'id': 'p.id',
+        'title': 'p.title',
+        'description': 'p.description',
+        'status': 'p.status',
+        'deadline': 'p.deadline',
+        'created_at': 'p.created_at',
+        'curator_id': 'p.curator_id',
+        'curator_name': 'u.username',
+        'curator_surname': 'u.surname',
+        'task_count': '(SELECT COUNT(*) FROM tasks WHERE project_id = p.id)',
+    },
+    'cadets': {
+        'id': 'u.id',
+        'username': 'u.username',
+        'surname': 'u.surname',
+        'patronymic': 'u.patronymic',
+        'email': 'u.email',
+        'academic_group': 'u.academic_group',
+        'registration_date': 'u.registration_date',
+    },
+    'files': {
+        'id': 'f.id',
+        'filename': 'f.filename',
+        'task_id': 'f.task_id',
+        'author_id': 'f.author_id',
+        'author_name': 'u.username',
+        'author_surname': 'u.surname',
+        'upload_time': 'f.upload_time',
+        'file_size': 'f.file_size',
+        'mime_type': 'f.mime_type',
+    },
+}
+
+
+def api_select_list(resource: str, fields=None) -> str:
+    """Список SELECT для запрошенных полей ресурса (id включается всегда).
+
+    Неизвестные поля - ValueError.
+    """
+    available = API_FIELDS[resource]
+    if not fields:
+        fields = list(available)
+    unknown = [field for field in fields if field not in available]
+    if unknown:
+        raise ValueError(f"Неизвестные поля: {', '.join(unknown)}")
+    if 'id' not in fields:
+        fields = ['id'] + list(fields)
+    return ', '.join(f'{available[field]} as {field}' for field in fields)
+
+
+# Кэш снимков статистики панели куратора: {curator_id: (время расчета, снимок)}.
+# Сбрасывается методами записи; TTL страхует от изменений в обход DatabaseManager (триггеры, другие процессы).
+# Каждый сброс начинает новое поколение: снимок, посчитанный до сброса, в кэш не попадает.
+DASHBOARD_CACHE_TTL = 60
+_dashboard_cache = {}
+_dashboard_cache_generation = 0
+_dashboard_cache_lock = threading.Lock()
+
+# Потоки-писатели по файлам баз: {абсолютный путь: DatabaseWriter}.
+# Дольше WRITE_TIMEOUT секунд поток запроса результата записи не ждет.
+WRITE_TIMEOUT = 30
+_writers = {}
+_writers_lock = threading.Lock()
+
+# Соединения для PRAGMA data_version по файлам баз: {абсолютный путь: (соединение, метка соединения)}
+_version_probes = {}
+_version_probes_lock = threading.Lock()
+
+# Таблицы, переносимые в архив вместе с проектом: (таблица, колонка с id проекта).
+# Порядок - порядок вставки; файлы переносятся отдельно (у них нет project_id).
+# Сводки истории идут после самой истории: при восстановлении триггеры основной
+# базы пересчитывают их, и пересчитанные строки заменяются архивными.
+ARCHIVE_TABLES = [
+    ('projects', 'id'),
+    ('tasks', 'project_id'),
+    ('task_status_history', 'project_id'),
+    ('task_status_daily', 'project_id'),
+    ('task_status_dwell_buckets', 'project_id'),
+]
+
+
+
+class RowStream:
+    """Ленивая выборка для потоковой отдачи страниц списков.
+
+    Строки не загружаются целиком: каждый проход (for) выполняет запрос
+    заново и читает его пачками по batch_size строк, len() и count_by() -
+    отдельные запросы COUNT (их результат запоминается). query - запрос без
+    ORDER BY; order и условия where() применяются к его колонкам.
+    """
+
+    def __init__(self, db, query: str, params=(), order: str = None, batch_size: int = 500):
+        self.db = db
+        self.query = query
+        self.params = tuple(params)
+        self.order = order
+        self.batch_size = batch_size
+        self._count = None
+        self._counts = {}
+
+    @classmethod
+    def empty(cls):
+        """Пустой список (например, когда архива еще нет)"""
+        return cls(None, '')
+
+    def where(self, column: str, value):
+        """Та же выборка с условием column = value"""
+        self._check_column(column)
+        return RowStream(self.db, f"SELECT * FROM ({self.query}) WHERE {column} = ?",
+                         self.params + (value,), self.order, self.batch_size)
+
+    def count_by(self, column: str) -> dict:
+        """Число строк по значениям колонки: {значение: количество}"""
+        self._check_column(column)
+        if column not in self._counts:
+            rows = [] if self.db is None else self.db._fetch_rows(
+                f"SELECT {column}, COUNT(*) FROM ({self.query}) GROUP BY {column}", self.params)
+            self._counts[column] = {row[0]: row[1] for row in rows}
+        return self._counts[column]
+
+    @staticmethod
+    def _check_column(column: str):
+        if not column.isidentifier():
+            raise ValueError(f'Недопустимое имя колонки: {column}')
+
+    def __iter__(self):
+        if self.db is None:
+            return iter(())
+        query = f"SELECT * FROM ({self.query})" + (f" ORDER BY {self.order}" if self.order else '')
+        return self.db._iter_rows(query, self.params, self.batch_size)
+
+    def __len__(self) -> int:
+        if self._count is None:
+            self._count = 0 if self.db is None else self.db._fetch_rows(
+                f"SELECT COUNT(*) FROM ({self.query})", self.params)[0][0]
+        return self._count
+
+    def __bool__(self) -> bool:
+        return len(self) > 0
+
 
 class DatabaseManager:
-    def __init__(self, db_path: str = "schem.db"):
+    # Повторы при занятой базе: общий срок вызова 10 секунд
+    retry_policy = RetryPolicy(base_delay=0.01, max_delay=0.5, deadline=10.0, busy_timeout=0.1)
+
+    def __init__(self, db_path: str = "schem.db", read_only: bool = False, attach: str = None):
         self.db_path = db_path
+        # Только чтение - для снимка отчетов (см. backup.refresh_snapshot) и архива
+        self.read_only = read_only
+        # База, подключаемая к каждому соединению как live (см. archived)
+        self.attach = attach
+        self.archive_path = os.path.splitext(db_path)[0] + '_archive.db'
         self.data_dir = "data"
         os.makedirs(self.data_dir, exist_ok=True)
 
     def create_database(self):
+        """Создание базы со всеми миграциями схемы (включая индексы, которые при запуске строятся в фоне)"""
+        from migrations import migrate
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-
-                # Создание таблицы пользователей (с академической группой из файла)
-                cursor.execute('''
-                    CREATE TABLE IF NOT EXISTS users (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        username VARCHAR(50) NOT NULL,
-                        surname VARCHAR(50) NOT NULL,
-                        patronymic VARCHAR(50),
-                        email VARCHAR(100) NOT NULL UNIQUE,
-                        password_hash VARCHAR(255) NOT NULL,
-                        role VARCHAR(10) CHECK(role IN ('куратор', 'курсант')) NOT NULL,
-                        registration_date DATETIME DEFAULT CURRENT_TIMESTAMP,
-                        academic_group VARCHAR(50)
-                    )
-                ''')
-
-                # Создание таблицы проектов
-                cursor.execute('''
-                    CREATE TABLE IF NOT EXISTS projects (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        title VARCHAR(255) NOT NULL,
-                        description TEXT,
-                        curator_id INTEGER NOT NULL,
-                        status VARCHAR(20) CHECK(status IN ('планирование', 'активен', 'завершён')) NOT NULL,
-                        deadline DATE,
-                        created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-                        FOREIGN KEY (curator_id) REFERENCES users(id) ON DELETE CASCADE
-                    )
-                ''')
-
-                # Создание таблицы задач
-                cursor.execute('''
-                    CREATE TABLE IF NOT EXISTS tasks (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        project_id INTEGER NOT NULL,
-                        cadet_id INTEGER NOT NULL,
-                        title VARCHAR(255) NOT NULL,
-                        description TEXT,
-                        status_code INTEGER CHECK(status_code IN (1, 2, 3, 4)) NOT NULL DEFAULT 1,
-                        created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-                        updated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-                        FOREIGN KEY (project_id) REFERENCES projects(id) ON DELETE CASCADE,
-                        FOREIGN KEY (cadet_id) REFERENCES users(id) ON DELETE CASCADE
-                    )
-                ''')
-
-                # Создание таблицы файлов
-                cursor.execute('''
-                    CREATE TABLE IF NOT EXISTS files (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        filename VARCHAR(255) NOT NULL,
-                        file_path VARCHAR(500) NOT NULL,
-                        task_id INTEGER NOT NULL,
-                        author_id INTEGER NOT NULL,
-                        upload_time DATETIME DEFAULT CURRENT_TIMESTAMP,
-                        file_size INTEGER,
-                        mime_type VARCHAR(100),
-                        FOREIGN KEY (task_id) REFERENCES tasks(id) ON DELETE CASCADE,
-                        FOREIGN KEY (author_id) REFERENCES users(id) ON DELETE CASCADE
-                    )
-                ''')
-
-                # Создание таблицы для справочника статусов задач
-                cursor.execute('''
-                    CREATE TABLE IF NOT EXISTS task_status_codes (
-                        status_code INTEGER PRIMARY KEY,
-                        status_name VARCHAR(20) NOT NULL,
-                        description TEXT
-                    )
-                ''')
-
-                # Создание индексов для улучшения производительности
-                cursor.execute('CREATE INDEX IF NOT EXISTS idx_projects_curator ON projects(curator_id)')
-                cursor.execute('CREATE INDEX IF NOT EXISTS idx_projects_status ON projects(status)')
-                cursor.execute('CREATE INDEX IF NOT EXISTS idx_tasks_project ON tasks(project_id)')
-                cursor.execute('CREATE INDEX IF NOT EXISTS idx_tasks_cadet ON tasks(cadet_id)')
-                cursor.execute('CREATE INDEX IF NOT EXISTS idx_tasks_status ON tasks(status_code)')
-                cursor.execute('CREATE INDEX IF NOT EXISTS idx_files_task ON files(task_id)')
-                cursor.execute('CREATE INDEX IF NOT EXISTS idx_files_author ON files(author_id)')
-                cursor.execute('CREATE INDEX IF NOT EXISTS idx_users_email ON users(email)')
-                cursor.execute('CREATE INDEX IF NOT EXISTS idx_users_role ON users(role)')
-
-                # Заполнение справочника статусов задач
-                cursor.execute('''
-                    INSERT OR IGNORE INTO task_status_codes (status_code, status_name, description) VALUES
-                    (1, 'ожидает', 'Задача ожидает начала работы'),
-                    (2, 'в работе', 'Задача находится в работе'),
-                    (3, 'на проверке', 'Задача отправлена на проверку'),
-                    (4, 'завершена', 'Задача завершена')
-                ''')
-
-                # Триггер для автоматического обновления updated_at в задачах
-                cursor.execute('''
-                    CREATE TRIGGER IF NOT EXISTS update_tasks_timestamp 
-                    AFTER UPDATE ON tasks
-                    FOR EACH ROW
-                    BEGIN
-                        UPDATE tasks SET updated_at = CURRENT_TIMESTAMP WHERE id = NEW.id;
-                    END
-                ''')
-
-                # Дополнительные триггеры для целостности данных
-                
-                # Триггер для проверки, что куратор имеет правильную роль
-                cursor.execute('''
-                    CREATE TRIGGER IF NOT EXISTS check_curator_role 
-                    BEFORE INSERT ON projects
-                    FOR EACH ROW
-                    BEGIN
-                        SELECT CASE
-                            WHEN (SELECT role FROM users WHERE id = NEW.curator_id) != 'куратор'
-                            THEN RAISE(ABORT, 'Только пользователь с ролью "куратор" может быть назначен куратором проекта')
-                        END;
-                    END
-                ''')
-
-                # Триггер для проверки, что курсант имеет правильную роль
-                cursor.execute('''
-                    CREATE TRIGGER IF NOT EXISTS check_cadet_role 
-                    BEFORE INSERT ON tasks
-                    FOR EACH ROW
-                    BEGIN
-                        SELECT CASE
-                            WHEN (SELECT role FROM users WHERE id = NEW.cadet_id) != 'курсант'
-                            THEN RAISE(ABORT, 'Только пользователь с ролью "курсант" может быть назначен исполнителем задачи')
-                        END;
-                    END
-                ''')
-
-                # Триггер для проверки дедлайна проекта
-                cursor.execute('''
-                    CREATE TRIGGER IF NOT EXISTS check_project_deadline 
-                    BEFORE INSERT ON projects
-                    FOR EACH ROW
-                    BEGIN
-                        SELECT CASE
-                            WHEN NEW.deadline IS NOT NULL AND DATE(NEW.deadline) < DATE('now')
-                            THEN RAISE(ABORT, 'Дедлайн проекта не может быть в прошлом')
-                        END;
-                    END
-                ''')
-
-                # Триггер для автоматической смены статуса проекта при завершении всех задач
-                cursor.execute('''
-                    CREATE TRIGGER IF NOT EXISTS update_project_status_on_task_completion 
-                    AFTER UPDATE OF status_code ON tasks
-                    FOR EACH ROW
-                    WHEN NEW.status_code = 4
-                    BEGIN
-                        UPDATE projects 
-                        SET status = 'завершён'
-                        WHERE id = NEW.project_id 
-                        AND NOT EXISTS (
-                            SELECT 1 FROM tasks 
-                            WHERE project_id = NEW.project_id 
-                            AND status_code != 4
-                        );
-                    END
-                ''')
-
-                conn.commit()
-                print(f"База данных успешно создана: {self.db_path}")
-                print("Созданы следующие объекты:")
-                print("- Таблицы: users, projects, tasks, files, task_status_codes")
-                print("- Индексы: idx_projects_curator, idx_projects_status, idx_tasks_project, idx_tasks_cadet, idx_tasks_status, idx_files_task, idx_files_author, idx_users_email, idx_users_role")
-                print("- Триггеры: update_tasks_timestamp, check_curator_role, check_cadet_role, check_project_deadline, update_project_status_on_task_completion")
-                print("- Справочник статусов: заполнен значениями 1-4")
-                return True
+            result = migrate(self.db_path)
+            print(f"База данных успешно создана: {self.db_path} (версия схемы {result['to']})")
+            print("Созданы следующие объекты:")
+            print("- Таблицы: users, projects, tasks, files, task_status_codes, task_status_history, task_status_daily, task_status_dwell_buckets, deadline_alerts, notification_outbox")
+            print("- Индексы: idx_projects_curator, idx_projects_status, idx_tasks_project, idx_tasks_cadet, idx_tasks_status, idx_files_task, idx_files_author, idx_users_email, idx_users_role, idx_tasks_review_queue, idx_files_task_upload, idx_projects_curator_created, idx_tasks_project_status, idx_tasks_due_open, idx_projects_deadline, idx_deadline_alerts_curator, idx_deadline_alerts_cadet, idx_outbox_pending, idx_status_history_task, idx_status_history_project")
+            print("- Триггеры: update_tasks_timestamp, check_curator_role, check_cadet_role, check_project_deadline, update_project_status_on_task_completion, record_task_status_on_insert, record_task_status_change, rollup_task_status_history, rollup_task_delete")
+            print("- Справочник статусов: заполнен значениями 1-4")
+            return True
 
         except sqlite3.Error as e:
             print(f"Ошибка при создании базы данных: {e}")
             return False
 
+    def migrate(self) -> dict:
+        """Приведение схемы к текущей версии при запуске.
+
+        Если схема актуальна, это одно чтение PRAGMA user_version. Индексы на
+        больших таблицах откладываются до start_background_migrations.
+        """
+        from migrations import migrate
+        return migrate(self.db_path, defer_background=True)
+
+    def start_background_migrations(self, logger=None):
+        """Фоновое построение отложенных индексов через поток-писатель этой базы"""
+        from migrations import start_background
+        return start_background(self, logger)
+
     def database_exists(self) -> bool:
         return os.path.exists(self.db_path)
 
@@ -234,24 +321,269 @@ class DatabaseManager:
             return False
 
     def create_connection(self):
-        """Создание соединения с базой данных"""
-        return sqlite3.connect(self.db_path)
+        """Создание соединения с базой данных.
+
+        Короткий busy_timeout: дольше ждать занятую базу приходится через
+        повторы retry_policy, которые учитываются в метриках конкуренции.
+        """
+        if self.read_only:
+            conn = sqlite3.connect(f"file:{os.path.abspath(self.db_path)}?mode=ro", uri=True,
+                                   timeout=self.retry_policy.busy_timeout)
+        else:
+            conn = sqlite3.connect(self.db_path, timeout=self.retry_policy.busy_timeout)
+        if self.attach:
+            conn.execute("ATTACH DATABASE ? AS live", (self.attach,))
+        return conn
+
+    @staticmethod
+    def get_contention_stats() -> dict:
+        """Повторы и время ожидания блокировки по методам с момента запуска процесса"""
+        return contention.snapshot()
+
+    def invalidate_caches(self, changed=None):
+        """Сброс кэшей, зависящих от данных (вызывается писателем после записи).
+
+        changed - измененные задачи и проекты (('task', id), ('project', id));
+        None - неизвестно, что изменилось.
+        """
+        global _dashboard_cache_generation
+        with _dashboard_cache_lock:
+            _dashboard_cache_generation += 1
+            _dashboard_cache.clear()
+        # Отрисованные карточки задач и проектов (см. fragment_cache)
+        fragments.invalidate(changed)
+
+    def data_version(self):
+        """Версия данных базы для условных запросов (ETag); None, если файла базы нет.
+
+        PRAGMA data_version на отдельном соединении процесса меняется после
+        каждого коммита любого другого соединения, в том числе потока-писателя
+        и других процессов. Само число сравнимо только в пределах одного
+        соединения, поэтому к нему добавляется метка соединения (процесс и
+        время открытия): после перезапуска все версии становятся новыми.
+        """
+        key = os.path.abspath(self.db_path)
+        with _version_probes_lock:
+            probe = _version_probes.get(key)
+            if probe is None:
+                if not os.path.exists(key):
+                    return None
+                conn = sqlite3.connect(f"file:{key}?mode=ro", uri=True, check_same_thread=False,
+                                       timeout=self.retry_policy.busy_timeout)
+                probe = (conn, f"{os.getpid()}.{time.time_ns()}")
+                _version_probes[key] = probe
+            conn, token = probe
+            try:
+                value = conn.execute("PRAGMA data_version").fetchone()[0]
+            except sqlite3.Error:
+                # Соединение сломано (например, файл базы заменен): следующий вызов откроет новое
+                conn.close()
+                del _version_probes[key]
+                raise
+        return f"{token}.{value}"
+
+    # Запись через поток-писатель
+    def get_writer(self) -> DatabaseWriter:
+        """Поток-писатель для файла базы (один на процесс)"""
+        key = os.path.abspath(self.db_path)
+        with _writers_lock:
+            writer = _writers.get(key)
+            if writer is None:
+                writer = DatabaseWriter(self.create_connection, on_commit=self.invalidate_caches,
+                                        retry_policy=self.retry_policy)
+                _writers[key] = writer
+            return writer
+
+    def submit_write(self, func, *args, exclusive: bool = False, attach: dict = None,
+                     invalidates=None, **kwargs) -> Future:
+        """Поставить изменение func(cursor, *args) в очередь записи; результат - через Future.
+
+        func выполняется в транзакции писателя и не должна сама вызывать commit.
+        attach - {псевдоним: путь} баз, подключаемых на время изменения (только с exclusive).
+        invalidates - задачи и проекты, которые меняет изменение (для кэшей; func может
+        дополнять список); пустой - кэши не сбрасываются, None - сбрасываются целиком.
+        """
+        # Имя метода DatabaseManager, в котором объявлено изменение (для метрик)
+        name = func.__qualname__.split('.<locals>')[0].rsplit('.', 1)[-1]
+        return self.get_writer().submit(func, *args, exclusive=exclusive, name=name, attach=attach,
+                                        invalidates=invalidates, **kwargs)
+
+    def _write(self, func, *args, **kwargs):
+        """Изменение через очередь записи с ожиданием результата (не дольше WRITE_TIMEOUT)"""
+        future = self.submit_write(func, *args, **kwargs)
+        try:
+            return future.result(timeout=WRITE_TIMEOUT)
+        except FutureTimeoutError:
+            # Еще не начатое изменение отменяется, чтобы оно не выполнилось после ошибки
+            future.cancel()
+            raise sqlite3.OperationalError('Запись в базу не завершилась вовремя, повторите попытку позже')
+
+    # Чтение для RowStream
+    @busy_retry
+    def _fetch_rows(self, query: str, params=()) -> list:
+        with self.create_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(query, params)
+            return cursor.fetchall()
+
+    def _iter_rows(self, query: str, params=(), batch_size: int = 500):
+        """Строки запроса по одной (словарями), из базы - пачками fetchmany.
+
+        Соединение открыто, пока строки читаются: в режиме WAL читатель
+        не мешает записи, а в памяти держится только одна пачка.
+        """
+        conn = self.create_connection()
+        try:
+            conn.row_factory = sqlite3.Row
+            cursor = conn.cursor()
+            self.retry_policy.call('_iter_rows', cursor.execute, query, params)
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                for row in rows:
+                    yield dict(row)
+        finally:
+            conn.close()
+
+    # Методы для панели куратора
+    def get_curator_dashboard_stats(self, curator_id: int) -> dict:
+        """Снимок статистики для панели куратора (из кэша, если он актуален)"""
+        now = time.monotonic()
+        # Основная база и снимок кэшируются раздельно
+        key = (os.path.abspath(self.db_path), curator_id)
+        with _dashboard_cache_lock:
+            cached = _dashboard_cache.get(key)
+            generation = _dashboard_cache_generation
+        if cached and now - cached[0] < DASHBOARD_CACHE_TTL:
+            return cached[1]
+
+        stats = self._compute_curator_dashboard_stats(curator_id)
+        with _dashboard_cache_lock:
+            # Если во время расчета была запись, снимок мог устареть - он не сохраняется
+            if generation == _dashboard_cache_generation:
+                _dashboard_cache[key] = (now, stats)
+        return stats
+
+    @busy_retry
+    def _compute_curator_dashboard_stats(self, curator_id: int) -> dict:
+        """Все счетчики панели одним запросом; читаются только проекты куратора и их задачи"""
+        stats = {
+            'projects_by_status': {'планирование': 0, 'активен': 0, 'завершён': 0},
+            'tasks_by_status': {1: 0, 2: 0, 3: 0, 4: 0},
+            'cadets_by_group': {},
+            'overdue_tasks': 0,
+            'due_soon_tasks': 0,
+            'overdue_projects': 0,
+        }
+        with self.create_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                WITH cp AS (
+                    SELECT id, status, deadline FROM projects WHERE curator_id = ?
+                ),
+                ct AS (
+                    SELECT t.status_code, t.cadet_id, cp.deadline
+                    FROM tasks t
+                    JOIN cp ON t.project_id = cp.id
+                )
+                SELECT 'projects', status, COUNT(*) FROM cp GROUP BY status
+                UNION ALL
+                SELECT 'tasks', status_code, COUNT(*) FROM ct GROUP BY status_code
+                UNION ALL
+                SELECT 'alerts', entity_type || ':' || state, COUNT(*) FROM deadline_alerts
+                WHERE curator_id = ?
+                GROUP BY entity_type, state
+                UNION ALL
+                SELECT 'groups', COALESCE(NULLIF(u.academic_group, ''), 'без группы'), COUNT(DISTINCT u.id)
+                FROM ct JOIN users u ON ct.cadet_id = u.id
+                GROUP BY 2
+            """, (curator_id, curator_id))
+
+            alert_keys = {'task:overdue': 'overdue_tasks', 'task:soon': 'due_soon_tasks',
+                          'project:overdue': 'overdue_projects'}
+            for metric, key, value in cursor.fetchall():
+                if metric == 'projects':
+                    stats['projects_by_status'][key] = value
+                elif metric == 'tasks':
+                    stats['tasks_by_status'][key] = value
+                elif metric == 'alerts' and key in alert_keys:
+                    stats[alert_keys[key]] = value
+                elif metric == 'groups':
+                    stats['cadets_by_group'][key] = value
+
+        stats['total_projects'] = sum(stats['projects_by_status'].values())
+        stats['total_tasks'] = sum(stats['tasks_by_status'].values())
+        stats['pending_reviews'] = stats['tasks_by_status'][3]
+        stats['total_cadets'] = sum(stats['cadets_by_group'].values())
+        stats['generated_at'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        return stats
 
     # Методы для работы с пользователями
     def create_user(self, username: str, surname: str,
                     patronymic: str, email: str, password_hash: str,
                     role: str, academic_group: str = None) -> int:
         """Создание нового пользователя с академической группой"""
-        with self.create_connection() as conn:
-            cursor = conn.cursor()
+        def write(cursor):
             cursor.execute("""
                 INSERT INTO users 
                 (username, surname, patronymic, email, academic_group, password_hash, role) 
                 VALUES (?, ?, ?, ?, ?, ?, ?)
             """, (username, surname, patronymic, email, academic_group, password_hash, role))
-            conn.commit()
             return cursor.lastrowid
+        return self._write(write, invalidates=())
 
+    def update_password_hash(self, user_id: int, password_hash: str) -> bool:
+        """Замена хеша пароля (перехеширование при входе)"""
+        def write(cursor):
+            cursor.execute("UPDATE users SET password_hash = ? WHERE id = ?", (password_hash, user_id))
+            return cursor.rowcount > 0
+        return self._write(write, invalidates=())
+
+    @busy_retry
+    def get_existing_emails(self, emails) -> set:
+        """Email из списка, уже занятые пользователями (один запрос на пачку до 500 адресов)"""
+        emails = list(emails)
+        existing = set()
+        with self.create_connection() as conn:
+            cursor = conn.cursor()
+            for offset in range(0, len(emails), 500):
+                chunk = emails[offset:offset + 500]
+                cursor.execute(f"SELECT email FROM users WHERE email IN ({','.join('?' * len(chunk))})", chunk)
+                existing.update(row[0] for row in cursor.fetchall())
+        return existing
+
+    def create_users(self, users: list, role: str = 'курсант') -> dict:
+        """Массовое создание пользователей одной транзакцией.
+
+        users - словари с username, surname, patronymic, email, academic_group,
+        password_hash. Занятость email проверяется еще раз внутри транзакции:
+        такие пользователи пропускаются. Возвращает {email: id} созданных.
+        """
+        def write(cursor):
+            emails = [user['email'] for user in users]
+            taken = set()
+            for offset in range(0, len(emails), 500):
+                chunk = emails[offset:offset + 500]
+                cursor.execute(f"SELECT email FROM users WHERE email IN ({','.join('?' * len(chunk))})", chunk)
+                taken.update(row[0] for row in cursor.fetchall())
+            new_users = [user for user in users if user['email'] not in taken]
+            cursor.executemany("""
+                INSERT INTO users
+                (username, surname, patronymic, email, academic_group, password_hash, role)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            """, [(user['username'], user['surname'], user['patronymic'], user['email'],
+                   user['academic_group'], user['password_hash'], role) for user in new_users])
+            created = {}
+            new_emails = [user['email'] for user in new_users]
+            for offset in range(0, len(new_emails), 500):
+                chunk = new_emails[offset:offset + 500]
+                cursor.execute(f"SELECT email, id FROM users WHERE email IN ({','.join('?' * len(chunk))})", chunk)
+                created.update(cursor.fetchall())
+            return created
+        return self._write(write, exclusive=True, invalidates=())
+
+    @busy_retry
     def get_user_by_username(self, email: str) -> Optional[dict]:
         """Получение пользователя по имени"""
         with self.create_connection() as conn:
@@ -261,6 +593,7 @@ class DatabaseManager:
             row = cursor.fetchone()
             return dict(row) if row else None
 
+    @busy_retry
     def get_users_by_role(self, role: str):
         with self.create_connection() as conn:
             conn.row_factory = sqlite3.Row
@@ -268,58 +601,145 @@ class DatabaseManager:
             cursor.execute('SELECT id, username, surname FROM users WHERE role=?', (role,))
             return [dict(row) for row in cursor.fetchall()]
 
+    @busy_retry
     def get_all_cadets(self, search_query=None, group_filter=None):
         """Получение всех курсантов с возможностью поиска и фильтрации"""
         with self.create_connection() as conn:
             conn.row_factory = sqlite3.Row
             cursor = conn.cursor()
-
-            query = '''
-                SELECT id, username, surname, patronymic, email, 
-                       registration_date, academic_group
-                FROM users 
-                WHERE role = 'курсант'
-            '''
-
-            params = []
-
-            # Добавляем поиск по ФИО или email
-            if search_query:
-                query += '''
-                    AND (surname LIKE ? OR username LIKE ? 
-                    OR patronymic LIKE ? OR email LIKE ? 
-                    OR (surname || ' ' || username || ' ' || COALESCE(patronymic, '')) LIKE ?)
-                '''
-                search_pattern = f'%{search_query}%'
-                params.extend([search_pattern, search_pattern, search_pattern, search_pattern, search_pattern])
-
-            # Добавляем фильтрацию по группе
-            if group_filter:
-                if group_filter == 'без группы':
-                    query += ' AND (academic_group IS NULL OR academic_group = "")'
-                else:
-                    query += ' AND academic_group = ?'
-                    params.append(group_filter)
-
+            query, params = self._cadets_query(search_query, group_filter)
             query += ' ORDER BY surname, username'
 
             cursor.execute(query, params)
             return [dict(row) for row in cursor.fetchall()]
 
+    def stream_cadets(self, search_query=None, group_filter=None, batch_size: int = 500) -> RowStream:
+        """Курсанты с поиском и фильтрацией для потоковой отдачи страницы"""
+        query, params = self._cadets_query(search_query, group_filter)
+        return RowStream(self, query, params, order='surname, username', batch_size=batch_size)
+
+    def count_cadets_by_group(self) -> dict:
+        """Число курсантов по академическим группам: {группа: количество}"""
+        rows = self._fetch_rows(
+            "SELECT academic_group, COUNT(*) FROM users WHERE role = 'курсант' GROUP BY academic_group")
+        return {row[0]: row[1] for row in rows}
+
+    @staticmethod
+    def _cadets_query(search_query=None, group_filter=None):
+        query = '''
+            SELECT id, username, surname, patronymic, email, 
+                   registration_date, academic_group
+            FROM users 
+            WHERE role = 'курсант'
+        '''
+
+        params = []
+
+        # Добавляем поиск по ФИО или email
+        if search_query:
+            query += '''
+                AND (surname LIKE ? OR username LIKE ? 
+                OR patronymic LIKE ? OR email LIKE ? 
+                OR (surname || ' ' || username || ' ' || COALESCE(patronymic, '')) LIKE ?)
+            '''
+            search_pattern = f'%{search_query}%'
+            params.extend([search_pattern, search_pattern, search_pattern, search_pattern, search_pattern])
+
+        # Добавляем фильтрацию по группе
+        if group_filter:
+            if group_filter == 'без группы':
+                query += ' AND (academic_group IS NULL OR academic_group = "")'
+            else:
+                query += ' AND academic_group = ?'
+                params.append(group_filter)
+        return query, params
+
     # Методы для работы с проектами
     def create_project(self, title: str, description: str, curator_id: int,
                        status: str, deadline: str) -> int:
         """Создание нового проекта"""
-        with self.create_connection() as conn:
-            cursor = conn.cursor()
+        changed = []
+
+        def write(cursor):
             cursor.execute(
                 """INSERT INTO projects (title, description, curator_id, status, deadline) 
                 VALUES (?, ?, ?, ?, ?)""",
                 (title, description, curator_id, status, deadline)
             )
-            conn.commit()
+            changed.append(('project', cursor.lastrowid))
             return cursor.lastrowid
+        return self._write(write, invalidates=changed)
+
+    def create_project_with_tasks(self, title: str, description: str, curator_id: int,
+                                  status: str, deadline: str, cadet_ids=()) -> int:
+        """Создание проекта с начальными задачами для курсантов и уведомлениями в одной транзакции"""
+        changed = []
 
+        def write(cursor):
+            cursor.execute(
+                """INSERT INTO projects (title, description, curator_id, status, deadline) 
+                VALUES (?, ?, ?, ?, ?)""",
+                (title, description, curator_id, status, deadline)
+            )
+            project_id = cursor.lastrowid
+            changed.append(('project', project_id))
+            self._add_initial_tasks(cursor, project_id, title, cadet_ids)
+            return project_id
+        return self._write(write, invalidates=changed)
+
+    def _add_initial_tasks(self, cursor, project_id: int, title: str, cadet_ids):
+        """Начальные задачи проекта для курсантов с уведомлениями (в транзакции вызывающего)"""
+        for cadet_id in cadet_ids:
+            task_title = f"Задача по проекту '{title[:30]}...'"
+            cursor.execute(
+                """INSERT INTO tasks (project_id, cadet_id, title, description, status_code) 
+                VALUES (?, ?, ?, ?, ?)""",
+                (project_id, cadet_id, task_title, f"Начальная задача по проекту '{title}'", 1)
+            )
+            self.enqueue_notification(cursor, cadet_id, 'task_assigned',
+                                      f'Вам назначена задача "{task_title}" по проекту "{title}"',
+                                      task_id=cursor.lastrowid, project_id=project_id)
+
+    def update_project_with_tasks(self, project_id: int, title: str, description: str,
+                                  status: str, deadline: str, cadet_ids=()) -> int:
+        """Обновление проекта и начальные задачи для новых курсантов в одной транзакции.
+
+        Возвращает число созданных задач.
+        """
+        def write(cursor):
+            cursor.execute("""
+                UPDATE projects 
+                SET title = ?, description = ?, status = ?, deadline = ?
+                WHERE id = ?
+            """, (title, description, status, deadline, project_id))
+
+            # Задачи создаются только для курсантов, которых еще нет в проекте
+            cursor.execute("SELECT DISTINCT cadet_id FROM tasks WHERE project_id = ?", (project_id,))
+            current_cadet_ids = {row[0] for row in cursor.fetchall()}
+            new_cadet_ids = []
+            for cadet_id in cadet_ids:
+                if int(cadet_id) not in current_cadet_ids and int(cadet_id) not in new_cadet_ids:
+                    new_cadet_ids.append(int(cadet_id))
+            self._add_initial_tasks(cursor, project_id, title, new_cadet_ids)
+            return len(new_cadet_ids)
+        return self._write(write, invalidates=[('project', project_id)])
+
+    def delete_project(self, project_id: int) -> bool:
+        """Удаление проекта"""
+        def write(cursor):
+            cursor.execute('DELETE FROM projects WHERE id = ?', (project_id,))
+            return cursor.rowcount > 0
+        return self._write(write, invalidates=[('project', project_id)])
+
+    @busy_retry
+    def get_project_cadet_ids(self, project_id: int) -> list:
+        """Курсанты, у которых есть задачи в проекте"""
+        with self.create_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT DISTINCT cadet_id FROM tasks WHERE project_id = ?", (project_id,))
+            return [row[0] for row in cursor.fetchall()]
+
+    @busy_retry
     def get_projects_by_cadet(self, cadet_id: int):
         """Получение проектов курсанта"""
         with self.create_connection() as conn:
@@ -336,6 +756,7 @@ class DatabaseManager:
             """, (cadet_id, cadet_id))
             return [dict(row) for row in cursor.fetchall()]
 
+    @busy_retry
     def get_all_active_projects(self):
         """Получение активных проектов (не завершенных)"""
         with self.create_connection() as conn:
@@ -354,20 +775,24 @@ class DatabaseManager:
                     description: str = None, status_code: int = 1, start_date: str = None,
                     due_date: str = None) -> int:
         """Создание новой задачи с расширенными полями"""
-        with self.create_connection() as conn:
-            cursor = conn.cursor()
+        changed = []
 
-            # Если их еще нет, нужно добавить через ALTER TABLE
+        def write(cursor):
             cursor.execute("""
                 INSERT INTO tasks 
                 (project_id, cadet_id, title, description, status_code, start_date, due_date) 
                 VALUES (?, ?, ?, ?, ?, ?, ?)
             """, (project_id, cadet_id, title, description, status_code,
                   start_date, due_date))
-
-            conn.commit()
-            return cursor.lastrowid
-
+            task_id = cursor.lastrowid
+            changed.append(('task', task_id))
+            self.enqueue_notification(cursor, cadet_id, 'task_assigned',
+                                      f'Вам назначена задача "{title}"',
+                                      task_id=task_id, project_id=project_id)
+            return task_id
+        return self._write(write, invalidates=changed)
+
+    @busy_retry
     def get_user_by_id(self, user_id: int):
         """Получение пользователя по ID"""
         with self.create_connection() as conn:
@@ -382,6 +807,7 @@ class DatabaseManager:
             row = cursor.fetchone()
             return dict(row) if row else None
 
+    @busy_retry
     def get_project_by_id(self, project_id: int):
         """Получение проекта по ID"""
         with self.create_connection() as conn:
@@ -398,6 +824,7 @@ class DatabaseManager:
             row = cursor.fetchone()
             return dict(row) if row else None
 
+    @busy_retry
     def get_task_by_id(self, task_id: int):
         """Получение задачи по ID"""
         with self.create_connection() as conn:
@@ -415,20 +842,74 @@ class DatabaseManager:
             return dict(row) if row else None
 
     # Методы для работы с базой данных
-    def get_all_projects(self):
+    def get_all_projects(self, status: str = None, deadline_from: str = None, deadline_to: str = None):
         """Получение всех проектов с информацией о кураторе"""
+        return self._select_projects(None, status, deadline_from, deadline_to)
+
+    def get_projects_by_curator(self, curator_id: int, status: str = None,
+                                deadline_from: str = None, deadline_to: str = None):
+        """Проекты одного куратора (по индексу projects(curator_id, created_at))"""
+        return self._select_projects(curator_id, status, deadline_from, deadline_to)
+
+    @busy_retry
+    def _select_projects(self, curator_id: int = None, status: str = None,
+                         deadline_from: str = None, deadline_to: str = None):
+        """Общий запрос списка проектов с необязательными фильтрами"""
         with self.create_connection() as conn:
             conn.row_factory = sqlite3.Row
             cursor = conn.cursor()
-            cursor.execute("""
+            query, params = self._projects_query(curator_id, status, deadline_from, deadline_to)
+            query += " ORDER BY p.created_at DESC"
+
+            cursor.execute(query, params)
+            return [dict(row) for row in cursor.fetchall()]
+
+    def stream_projects(self, curator_id: int = None, status: str = None, deadline_from: str = None,
+                        deadline_to: str = None, cadet_id: int = None, batch_size: int = 500) -> RowStream:
+        """Список проектов для потоковой отдачи страницы.
+
+        С cadet_id - проекты, где у курсанта есть задачи, и число только его задач
+        (как get_projects_by_cadet).
+        """
+        query, params = self._projects_query(curator_id, status, deadline_from, deadline_to, cadet_id)
+        return RowStream(self, query, params, order='created_at DESC', batch_size=batch_size)
+
+    @staticmethod
+    def _projects_query(curator_id: int = None, status: str = None, deadline_from: str = None,
+                        deadline_to: str = None, cadet_id: int = None):
+        if cadet_id is not None:
+            query = """
+                SELECT p.*, u.surname as curator_surname, u.username as curator_name, u.patronymic as curator_patr, u.role as role,
+                       (SELECT COUNT(*) FROM tasks t2 WHERE t2.project_id = p.id AND t2.cadet_id = ?) as task_count
+                FROM projects p 
+                JOIN users u ON p.curator_id = u.id
+                WHERE p.id IN (SELECT project_id FROM tasks WHERE cadet_id = ?)
+            """
+            params = [cadet_id, cadet_id]
+        else:
+            query = """
                 SELECT p.*, u.surname as curator_surname, u.username as curator_name, u.patronymic as curator_patr,
                        (SELECT COUNT(*) FROM tasks WHERE project_id = p.id) as task_count
                 FROM projects p 
                 JOIN users u ON p.curator_id = u.id
-                ORDER BY p.created_at DESC
-            """)
-            return [dict(row) for row in cursor.fetchall()]
-
+                WHERE 1 = 1
+            """
+            params = []
+        if curator_id is not None:
+            query += " AND p.curator_id = ?"
+            params.append(curator_id)
+        if status:
+            query += " AND p.status = ?"
+            params.append(status)
+        if deadline_from:
+            query += " AND p.deadline >= ?"
+            params.append(deadline_from)
+        if deadline_to:
+            query += " AND p.deadline <= ?"
+            params.append(deadline_to)
+        return query, params
+
+    @busy_retry
     def get_tasks_by_cadet(self, cadet_id: int):
         """Получение задач курсанта"""
         with self.create_connection() as conn:
@@ -444,44 +925,75 @@ class DatabaseManager:
             """, (cadet_id,))
             return [dict(row) for row in cursor.fetchall()]
 
-    def get_all_tasks(self):
+    def get_all_tasks(self, status_code: int = None, deadline_from: str = None, deadline_to: str = None):
         """Получение всех задач"""
+        return self._select_tasks(None, status_code, deadline_from, deadline_to)
+
+    def get_tasks_by_curator(self, curator_id: int, status_code: int = None,
+                             deadline_from: str = None, deadline_to: str = None):
+        """Задачи в проектах куратора (по индексу tasks(project_id, status_code, created_at)).
+
+        Фильтр по сроку применяется к дедлайну проекта.
+        """
+        return self._select_tasks(curator_id, status_code, deadline_from, deadline_to)
+
+    @busy_retry
+    def _select_tasks(self, curator_id: int = None, status_code: int = None,
+                      deadline_from: str = None, deadline_to: str = None):
+        """Общий запрос списка задач с необязательными фильтрами"""
         with self.create_connection() as conn:
             conn.row_factory = sqlite3.Row
             cursor = conn.cursor()
-            cursor.execute("""
-                SELECT t.*, u.username as cadet_name, p.title as project_title
-                FROM tasks t 
-                JOIN users u ON t.cadet_id = u.id 
-                JOIN projects p ON t.project_id = p.id 
-                ORDER BY t.status_code, t.created_at DESC
-            """)
+            query, params = self._tasks_query(curator_id, status_code, deadline_from, deadline_to)
+            query += " ORDER BY t.status_code, t.created_at DESC"
+
+            cursor.execute(query, params)
             return [dict(row) for row in cursor.fetchall()]
 
-    # Методы для работы с задачами
-    def create_task(self, project_id: int, cadet_id: int, title: str,
-                    description: str = None, status_code: int = 1) -> int:
-        """Создание новой задачи"""
-        with self.create_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute(
-                """INSERT INTO tasks (project_id, cadet_id, title, description, status_code) 
-                VALUES (?, ?, ?, ?, ?)""",
-                (project_id, cadet_id, title, description, status_code)
-            )
-            conn.commit()
-            return cursor.lastrowid
+    def stream_tasks(self, curator_id: int = None, status_code: int = None, deadline_from: str = None,
+                     deadline_to: str = None, cadet_id: int = None, batch_size: int = 500) -> RowStream:
+        """Список задач для потоковой отдачи страницы (с cadet_id - задачи курсанта)"""
+        query, params = self._tasks_query(curator_id, status_code, deadline_from, deadline_to, cadet_id)
+        return RowStream(self, query, params, order='status_code, created_at DESC', batch_size=batch_size)
+
+    @staticmethod
+    def _tasks_query(curator_id: int = None, status_code: int = None, deadline_from: str = None,
+                     deadline_to: str = None, cadet_id: int = None):
+        query = """
+            SELECT t.*, u.username as cadet_name, p.title as project_title
+            FROM tasks t 
+            JOIN users u ON t.cadet_id = u.id 
+            JOIN projects p ON t.project_id = p.id 
+            WHERE 1 = 1
+        """
+        params = []
+        if cadet_id is not None:
+            query += " AND t.cadet_id = ?"
+            params.append(cadet_id)
+        if curator_id is not None:
+            query += " AND p.curator_id = ?"
+            params.append(curator_id)
+        if status_code:
+            query += " AND t.status_code = ?"
+            params.append(status_code)
+        if deadline_from:
+            query += " AND p.deadline >= ?"
+            params.append(deadline_from)
+        if deadline_to:
+            query += " AND p.deadline <= ?"
+            params.append(deadline_to)
+        return query, params
 
+    # Методы для работы с задачами
     def update_task_status(self, task_id: int, status_code: int) -> bool:
         """Обновление статуса задачи"""
-        with self.create_connection() as conn:
-            cursor = conn.cursor()
+        def write(cursor):
             cursor.execute(
                 "UPDATE tasks SET status_code = ? WHERE id = ?",
                 (status_code, task_id)
             )
-            conn.commit()
             return cursor.rowcount > 0
+        return self._write(write, invalidates=[('task', task_id)])
 
     def get_task_status_name(self, status_code: int) -> str:
         """Получение названия статуса по коду"""
@@ -497,16 +1009,16 @@ class DatabaseManager:
     def add_file(self, filename: str, file_path: str, task_id: int,
                  author_id: int, file_size: int = None, mime_type: str = None) -> int:
         """Добавление файла"""
-        with self.create_connection() as conn:
-            cursor = conn.cursor()
+        def write(cursor):
             cursor.execute(
                 """INSERT INTO files (filename, file_path, task_id, author_id, file_size, mime_type) 
                 VALUES (?, ?, ?, ?, ?, ?)""",
                 (filename, file_path, task_id, author_id, file_size, mime_type)
             )
-            conn.commit()
             return cursor.lastrowid
+        return self._write(write, invalidates=())
 
+    @busy_retry
     def get_files_by_task(self, task_id: int) -> List[dict]:
         with self.create_connection() as conn:
             conn.row_factory = sqlite3.Row
@@ -526,24 +1038,18 @@ class DatabaseManager:
         safe_filename = f"task_{task_id}_{author_id}_{timestamp}_{filename.replace(' ', '_')}"
         file_path = os.path.join(self.data_dir, safe_filename)
 
-        # Сохраняем файл
+        # Сохраняем файл (до постановки в очередь записи, чтобы не задерживать писателя)
         file_obj.save(file_path)
 
         # Получаем размер и MIME тип
         file_size = os.path.getsize(file_path)
         mime_type = file_obj.mimetype if hasattr(file_obj, 'mimetype') else 'application/octet-stream'
 
-        with self.create_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute("""
-                INSERT INTO files (filename, file_path, task_id, author_id, file_size, mime_type)
-                VALUES (?, ?, ?, ?, ?, ?)
-            """, (filename, file_path, task_id, author_id, file_size, mime_type))
-            conn.commit()
-            return cursor.lastrowid
+        return self.add_file(filename, file_path, task_id, author_id, file_size, mime_type)
 
     # В класс DatabaseManager добавьте эти методы:
 
+    @busy_retry
     def get_cadet_tasks_with_details(self, cadet_id: int):
         """Получение задач курсанта с детальной информацией о проекте"""
         with self.create_connection() as conn:
@@ -559,12 +1065,14 @@ class DatabaseManager:
                        u_cadet.surname as cadet_surname,
                        u_curator.username as curator_name,
                        ts.status_name,
-                       ts.description as status_description
+                       ts.description as status_description,
+                       da.state as deadline_state
                 FROM tasks t
                 JOIN projects p ON t.project_id = p.id
                 JOIN users u_cadet ON t.cadet_id = u_cadet.id
                 JOIN users u_curator ON p.curator_id = u_curator.id
                 JOIN task_status_codes ts ON t.status_code = ts.status_code
+                LEFT JOIN deadline_alerts da ON da.entity_type = 'task' AND da.entity_id = t.id
                 WHERE t.cadet_id = ?
                 ORDER BY 
                     CASE 
@@ -579,22 +1087,41 @@ class DatabaseManager:
 
     def update_cadet_task_status(self, task_id: int, cadet_id: int, status_code: int) -> bool:
         """Обновление статуса задачи курсантом (с проверкой прав)"""
-        with self.create_connection() as conn:
-            cursor = conn.cursor()
-            # Проверяем, что задача принадлежит курсанту
-            cursor.execute("SELECT id FROM tasks WHERE id = ? AND cadet_id = ?", (task_id, cadet_id))
-            if not cursor.fetchone():
-                return False
-
-            # Обновляем статус
+        def write(cursor):
+            # Задача обновляется, только если принадлежит курсанту
             cursor.execute("""
                 UPDATE tasks 
                 SET status_code = ?, updated_at = CURRENT_TIMESTAMP
                 WHERE id = ? AND cadet_id = ?
             """, (status_code, task_id, cadet_id))
-            conn.commit()
             return cursor.rowcount > 0
+        return self._write(write, invalidates=[('task', task_id)])
+
+    def promote_opened_tasks(self, openings) -> int:
+        """Перевод открытых курсантами задач из "ожидает" (1) в "в работе" (2) одной транзакцией.
 
+        openings - пары (task_id, cadet_id). Задачи, статус которых уже успел
+        измениться, не трогаются. Возвращает число переведенных задач.
+        """
+        openings = list(openings)
+        if not openings:
+            return 0
+
+        changed = []
+
+        def write(cursor):
+            for task_id, cadet_id in openings:
+                cursor.execute("""
+                    UPDATE tasks
+                    SET status_code = 2, updated_at = CURRENT_TIMESTAMP
+                    WHERE id = ? AND cadet_id = ? AND status_code = 1
+                """, (task_id, cadet_id))
+                if cursor.rowcount:
+                    changed.append(('task', task_id))
+            return len(changed)
+        return self._write(write, invalidates=changed)
+
+    @busy_retry
     def get_task_by_id_with_details(self, task_id: int, cadet_id: int = None):
         """Получение задачи по ID с проверкой прав курсанта"""
         with self.create_connection() as conn:
@@ -630,6 +1157,7 @@ class DatabaseManager:
             row = cursor.fetchone()
             return dict(row) if row else None
 
+    @busy_retry
     def get_task_with_all_details(self, task_id: int, cadet_id: int = None):
         """Получение задачи со всей информацией"""
         with self.create_connection() as conn:
@@ -669,6 +1197,7 @@ class DatabaseManager:
             row = cursor.fetchone()
             return dict(row) if row else None
 
+    @busy_retry
     def get_task_files(self, task_id: int, author_id: int = None):
         """Получение файлов задачи с возможностью фильтрации по автору"""
         with self.create_connection() as conn:
@@ -695,32 +1224,7 @@ class DatabaseManager:
             cursor.execute(query, params)
             return [dict(row) for row in cursor.fetchall()]
 
-    def add_file_to_task(self, task_id: int, author_id: int, file_obj, filename: str = None):
-        """Добавление файла к задаче"""
-        if filename is None:
-            filename = file_obj.filename
-
-        # Генерируем уникальное имя файла
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        safe_filename = f"task_{task_id}_{author_id}_{timestamp}_{filename.replace(' ', '_')}"
-        file_path = os.path.join(self.data_dir, safe_filename)
-
-        # Сохраняем файл
-        file_obj.save(file_path)
-
-        # Получаем размер и MIME тип
-        file_size = os.path.getsize(file_path)
-        mime_type = file_obj.mimetype if hasattr(file_obj, 'mimetype') else 'application/octet-stream'
-
-        with self.create_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute("""
-                INSERT INTO files (filename, file_path, task_id, author_id, file_size, mime_type)
-                VALUES (?, ?, ?, ?, ?, ?)
-            """, (filename, file_path, task_id, author_id, file_size, mime_type))
-            conn.commit()
-            return cursor.lastrowid
-
+    @busy_retry
     def get_file_with_details(self, file_id: int):
         """Получение информации о файле со всеми деталями"""
         with self.create_connection() as conn:
@@ -747,6 +1251,7 @@ class DatabaseManager:
             row = cursor.fetchone()
             return dict(row) if row else None
 
+    @busy_retry
     def user_can_access_task(self, task_id: int, user_id: int, user_role: str) -> bool:
         """Проверка, имеет ли пользователь доступ к задаче"""
         with self.create_connection() as conn:
@@ -770,6 +1275,7 @@ class DatabaseManager:
 
             return cursor.fetchone() is not None
 
+    @busy_retry
     def get_task_with_access_check(self, task_id: int, user_id: int, user_role: str):
         """Получение задачи с проверкой прав доступа"""
         with self.create_connection() as conn:
@@ -811,6 +1317,7 @@ class DatabaseManager:
             row = cursor.fetchone()
             return dict(row) if row else None
 
+    @busy_retry
     def get_task_for_view(self, task_id: int):
         """Получение задачи с полной информацией для просмотра"""
         with self.create_connection() as conn:
@@ -842,18 +1349,23 @@ class DatabaseManager:
 
     def update_task_status_by_curator(self, task_id: int, curator_id: int, status_code: int) -> bool:
         """Обновление статуса задачи куратором (с проверкой прав)"""
-        with self.create_connection() as conn:
-            cursor = conn.cursor()
+        changed = []
 
+        def write(cursor):
             # Проверяем, что куратор имеет доступ к задаче
             cursor.execute("""
-                SELECT 1 FROM tasks t
+                SELECT t.cadet_id, t.project_id, t.title, t.status_code FROM tasks t
                 JOIN projects p ON t.project_id = p.id
                 WHERE t.id = ? AND p.curator_id = ?
             """, (task_id, curator_id))
 
-            if not cursor.fetchone():
+            task = cursor.fetchone()
+            if not task:
                 return False
+            cadet_id, project_id, title, from_status = task
+            if from_status == status_code:
+                # Статус не меняется: ни записи, ни уведомления курсанту
+                return True
 
             # Обновляем статус задачи
             cursor.execute("""
@@ -861,10 +1373,83 @@ class DatabaseManager:
                 SET status_code = ?, updated_at = CURRENT_TIMESTAMP
                 WHERE id = ?
             """, (status_code, task_id))
+            updated = cursor.rowcount > 0
+            changed.append(('task', task_id))
+
+            # Уведомление курсанту пишется в той же транзакции
+            event_type, message = self._status_notification(status_code, title, from_status)
+            self.enqueue_notification(cursor, cadet_id, event_type, message,
+                                      task_id=task_id, project_id=project_id)
+            return updated
+        return self._write(write, invalidates=changed)
+
+    def _status_notification(self, status_code: int, title: str, from_status: int = None):
+        """Тип и текст уведомления курсанту о смене статуса задачи куратором"""
+        if status_code == 4:
+            return 'task_approved', f'Задача "{title}" принята куратором'
+        if status_code == 2 and from_status in (None, 3):
+            return 'task_rejected', f'Задача "{title}" возвращена на доработку'
+        return 'task_status', f'Статус задачи "{title}" изменен на "{self.get_task_status_name(status_code)}"'
+
+    def apply_task_moves(self, curator_id: int, moves) -> list:
+        """Пакет перемещений задач куратором (канбан) в одной транзакции.
+
+        Каждое перемещение {task_id, from_status, to_status} применяется как
+        сравнение-с-заменой: статус меняется, только если он все еще равен
+        from_status. Результат по каждому перемещению:
+        applied / conflict (с текущим статусом) / not_found / invalid.
+        """
+        changed = []
+
+        def write(cursor):
+            results = []
+            for move in moves:
+                try:
+                    task_id = int(move['task_id'])
+                    from_status = int(move['from_status'])
+                    to_status = int(move['to_status'])
+                except (KeyError, TypeError, ValueError):
+                    results.append({'task_id': move.get('task_id') if isinstance(move, dict) else None,
+                                    'result': 'invalid'})
+                    continue
+                if to_status not in (1, 2, 3, 4) or from_status == to_status:
+                    results.append({'task_id': task_id, 'result': 'invalid'})
+                    continue
 
-            conn.commit()
-            return cursor.rowcount > 0
+                cursor.execute("""
+                    UPDATE tasks
+                    SET status_code = ?, updated_at = CURRENT_TIMESTAMP
+                    WHERE id = ? AND status_code = ?
+                      AND project_id IN (SELECT id FROM projects WHERE curator_id = ?)
+                    RETURNING cadet_id, project_id, title
+                """, (to_status, task_id, from_status, curator_id))
+                task = cursor.fetchone()
+
+                if task:
+                    cadet_id, project_id, title = task
+                    changed.append(('task', task_id))
+                    event_type, message = self._status_notification(to_status, title, from_status)
+                    self.enqueue_notification(cursor, cadet_id, event_type, message,
+                                              task_id=task_id, project_id=project_id)
+                    results.append({'task_id': task_id, 'result': 'applied', 'status_code': to_status})
+                    continue
+
+                # Не применилось: задачи нет (или она чужая) либо статус уже изменили
+                cursor.execute("""
+                    SELECT t.status_code FROM tasks t
+                    JOIN projects p ON t.project_id = p.id
+                    WHERE t.id = ? AND p.curator_id = ?
+                """, (task_id, curator_id))
+                current = cursor.fetchone()
+                if current:
+                    results.append({'task_id': task_id, 'result': 'conflict', 'status_code': current[0]})
+                else:
+                    results.append({'task_id': task_id, 'result': 'not_found'})
 
+            return results
+        return self._write(write, invalidates=changed)
+
+    @busy_retry
     def get_tasks_by_cadet_in_project(self, cadet_id: int, project_id: int):
         """Получение задач курсанта в конкретном проекте"""
         with self.create_connection() as conn:
@@ -879,6 +1464,7 @@ class DatabaseManager:
             """, (cadet_id, project_id))
             return [dict(row) for row in cursor.fetchall()]
 
+    @busy_retry
     def get_files_by_task_with_authors(self, task_id: int):
         """Получение файлов задачи с информацией об авторах"""
         with self.create_connection() as conn:
@@ -896,6 +1482,87 @@ class DatabaseManager:
             """, (task_id,))
             return [dict(row) for row in cursor.fetchall()]
 
+    @busy_retry
+    def load_task_page(self, task_id: int, user_id: int, user_role: str,
+                       own_files_only: bool = False, with_progress: bool = False):
+        """Все данные страницы задачи одним запросом: задача, файлы с авторами и прогресс курсанта.
+
+        Один SELECT читает согласованный снимок базы, поэтому файлы и статистика
+        всегда соответствуют показанному состоянию задачи. Права те же, что в
+        get_task_with_permissions. Возвращает задачу с ключами files и progress
+        или None, если задачи нет или нет доступа.
+        """
+        if user_role == 'курсант':
+            access = "t.cadet_id = :user_id"
+        elif user_role == 'куратор':
+            access = "p.curator_id = :user_id"
+        else:
+            return None
+
+        files_filter = " AND f.author_id = :user_id" if own_files_only else ""
+        progress = """
+                       (SELECT json_object('total_tasks', COUNT(*),
+                                           'completed_tasks', COALESCE(SUM(status_code = 4), 0),
+                                           'in_review_tasks', COALESCE(SUM(status_code = 3), 0))
+                        FROM tasks
+                        WHERE cadet_id = task.cadet_id AND project_id = task.project_id) as progress_json
+        """ if with_progress else "NULL as progress_json"
+
+        with self.create_connection() as conn:
+            conn.row_factory = sqlite3.Row
+            cursor = conn.cursor()
+            cursor.execute(f"""
+                WITH task AS (
+                    SELECT t.*,
+                           u.username as cadet_name,
+                           u.surname as cadet_surname,
+                           u.email as cadet_email,
+                           p.title as project_title,
+                           p.description as project_description,
+                           p.curator_id,
+                           p.status as project_status,
+                           p.deadline as project_deadline,
+                           ts.status_name,
+                           ts.description as status_description,
+                           cu.username as curator_name,
+                           cu.surname as curator_surname,
+                           cu.email as curator_email
+                    FROM tasks t
+                    JOIN users u ON t.cadet_id = u.id
+                    JOIN projects p ON t.project_id = p.id
+                    JOIN task_status_codes ts ON t.status_code = ts.status_code
+                    JOIN users cu ON p.curator_id = cu.id
+                    WHERE t.id = :task_id AND {access}
+                )
+                SELECT task.*,
+                       (SELECT json_group_array(json_object(
+                                   'id', id, 'filename', filename, 'file_path', file_path,
+                                   'task_id', task_id, 'author_id', author_id,
+                                   'upload_time', upload_time, 'file_size', file_size,
+                                   'mime_type', mime_type, 'author_name', author_name,
+                                   'author_surname', author_surname, 'author_email', author_email))
+                        FROM (SELECT f.*,
+                                     u.username as author_name,
+                                     u.surname as author_surname,
+                                     u.email as author_email
+                              FROM files f
+                              JOIN users u ON f.author_id = u.id
+                              WHERE f.task_id = task.id{files_filter}
+                              ORDER BY f.upload_time DESC, f.id DESC)) as files_json,
+                       {progress}
+                FROM task
+            """, {'task_id': task_id, 'user_id': user_id})
+            row = cursor.fetchone()
+
+        if not row:
+            return None
+        task = dict(row)
+        task['files'] = json.loads(task.pop('files_json') or '[]')
+        progress_json = task.pop('progress_json')
+        task['progress'] = json.loads(progress_json) if progress_json else None
+        return task
+
+    @busy_retry
     def get_task_with_permissions(self, task_id: int, user_id: int, user_role: str):
         """Получение задачи с учетом прав доступа"""
         with self.create_connection() as conn:
@@ -961,3 +1628,730 @@ class DatabaseManager:
             cursor.execute(query, params)
             row = cursor.fetchone()
             return dict(row) if row else None
+
+    # Методы для аналитики по истории статусов
+    @busy_retry
+    def get_task_status_history(self, task_id: int):
+        """История смен статусов задачи в хронологическом порядке"""
+        with self.create_connection() as conn:
+            conn.row_factory = sqlite3.Row
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT h.*, ts_from.status_name as from_status_name, ts_to.status_name as to_status_name
+                FROM task_status_history h
+                LEFT JOIN task_status_codes ts_from ON h.from_status = ts_from.status_code
+                JOIN task_status_codes ts_to ON h.to_status = ts_to.status_code
+                WHERE h.task_id = ?
+                ORDER BY h.changed_at, h.id
+            """, (task_id,))
+            return [dict(row) for row in cursor.fetchall()]
+
+    @busy_retry
+    def get_project_burndown(self, project_id: int, date_from: str = None, date_to: str = None):
+        """Дневной burndown проекта по сводной таблице: сколько задач осталось и сколько завершено"""
+        with self.create_connection() as conn:
+            conn.row_factory = sqlite3.Row
+            cursor = conn.cursor()
+            # Накопительная сумма считается по всей сводке проекта, а период отсекается снаружи,
+            # чтобы первый день периода начинался с правильного остатка
+            cursor.execute("""
+                SELECT day, remaining, completed FROM (
+                    SELECT day,
+                           SUM(SUM(CASE WHEN status_code != 4 THEN entered - exited ELSE 0 END))
+                               OVER (ORDER BY day) as remaining,
+                           SUM(SUM(CASE WHEN status_code = 4 THEN entered - exited ELSE 0 END))
+                               OVER (ORDER BY day) as completed
+                    FROM task_status_daily
+                    WHERE project_id = ?
+                    GROUP BY day
+                )
+                WHERE (? IS NULL OR day >= ?) AND (? IS NULL OR day <= ?)
+                ORDER BY day
+            """, (project_id, date_from, date_from, date_to, date_to))
+            return [dict(row) for row in cursor.fetchall()]
+
+    @busy_retry
+    def get_time_in_status_percentiles(self, project_id: int = None, curator_id: int = None,
+                                       percentiles=(50, 90, 95)) -> dict:
+        """Перцентили времени пребывания задач в каждом статусе (в секундах, по верхней границе интервала)"""
+        with self.create_connection() as conn:
+            cursor = conn.cursor()
+            query = """
+                SELECT b.status_code, b.bucket_seconds, SUM(b.transitions)
+                FROM task_status_dwell_buckets b
+            """
+            params = []
+            if curator_id is not None:
+                query += " JOIN projects p ON b.project_id = p.id WHERE p.curator_id = ?"
+                params.append(curator_id)
+                if project_id is not None:
+                    query += " AND b.project_id = ?"
+                    params.append(project_id)
+            elif project_id is not None:
+                query += " WHERE b.project_id = ?"
+                params.append(project_id)
+            query += " GROUP BY b.status_code, b.bucket_seconds ORDER BY b.status_code, b.bucket_seconds"
+
+            cursor.execute(query, params)
+            histograms = {}
+            for status_code, bucket_seconds, transitions in cursor.fetchall():
+                histograms.setdefault(status_code, []).append((bucket_seconds, transitions))
+
+        result = {}
+        for status_code, histogram in histograms.items():
+            stats = {'status_name': self.get_task_status_name(status_code),
+                     'transitions': sum(count for _, count in histogram)}
+            stats.update(self._histogram_percentiles(histogram, percentiles))
+            result[status_code] = stats
+        return result
+
+    @busy_retry
+    def get_curator_review_latency(self, curator_id: int = None, project_id: int = None, percentiles=(50, 90)):
+        """Время проверки задач кураторами (пребывание в статусе "на проверке").
+
+        project_id - только по одному проекту (строка его куратора).
+        """
+        with self.create_connection() as conn:
+            conn.row_factory = sqlite3.Row
+            cursor = conn.cursor()
+            conditions, params = "", []
+            if curator_id is not None:
+                conditions += " AND p.curator_id = ?"
+                params.append(curator_id)
+            if project_id is not None:
+                conditions += " AND p.id = ?"
+                params.append(project_id)
+
+            cursor.execute(f"""
+                SELECT p.curator_id, u.surname as curator_surname, u.username as curator_name,
+                       SUM(d.dwell_count) as reviews,
+                       SUM(d.dwell_seconds) as total_seconds
+                FROM task_status_daily d
+                JOIN projects p ON d.project_id = p.id
+                JOIN users u ON p.curator_id = u.id
+                WHERE d.status_code = 3{conditions}
+                GROUP BY p.curator_id HAVING SUM(d.dwell_count) > 0 ORDER BY p.curator_id
+            """, params)
+            curators = [dict(row) for row in cursor.fetchall()]
+
+            # Гистограммы всех кураторов - одним запросом, а не по запросу на куратора
+            cursor.execute(f"""
+                SELECT p.curator_id, b.bucket_seconds, SUM(b.transitions)
+                FROM task_status_dwell_buckets b
+                JOIN projects p ON b.project_id = p.id
+                WHERE b.status_code = 3{conditions}
+                GROUP BY p.curator_id, b.bucket_seconds
+                ORDER BY p.curator_id, b.bucket_seconds
+            """, params)
+            histograms = {}
+            for row_curator_id, bucket_seconds, transitions in cursor.fetchall():
+                histograms.setdefault(row_curator_id, []).append((bucket_seconds, transitions))
+
+        for curator in curators:
+            curator['avg_seconds'] = curator['total_seconds'] // curator['reviews']
+            curator.update(self._histogram_percentiles(histograms.get(curator['curator_id'], []), percentiles))
+        return curators
+
+    @staticmethod
+    def _histogram_percentiles(histogram, percentiles) -> dict:
+        """Оценка перцентилей по гистограмме [(верхняя граница, количество), ...]"""
+        total = sum(count for _, count in histogram)
+        result = {}
+        for percentile in percentiles:
+            key = f'p{percentile}'
+            result[key] = None
+            if not total:
+                continue
+            threshold = total * percentile / 100
+            cumulative = 0
+            for bound, count in histogram:
+                cumulative += count
+                if cumulative >= threshold:
+                    result[key] = bound
+                    break
+        return result
+
+    # Методы для очереди проверки
+    @busy_retry
+    def get_review_inbox(self, curator_id: int, cursor: str = None, limit: int = 20):
+        """Задачи куратора на проверке в порядке отправки, с последним загруженным файлом.
+
+        Возвращает (задачи, курсор следующей страницы или None).
+        """
+        after = decode_cursor(cursor, (str, int)) or ['', 0]
+        with self.create_connection() as conn:
+            conn.row_factory = sqlite3.Row
+            db_cursor = conn.cursor()
+            db_cursor.execute("""
+                SELECT t.id, t.title, t.project_id, t.cadet_id, t.updated_at as submitted_at,
+                       p.title as project_title,
+                       u.username as cadet_name,
+                       u.surname as cadet_surname,
+                       u.academic_group,
+                       f.id as file_id,
+                       f.filename,
+                       f.file_size,
+                       f.upload_time
+                FROM tasks t
+                JOIN projects p ON t.project_id = p.id
+                JOIN users u ON t.cadet_id = u.id
+                LEFT JOIN files f ON f.id = (
+                    SELECT f2.id FROM files f2
+                    WHERE f2.task_id = t.id
+                    ORDER BY f2.upload_time DESC, f2.id DESC
+                    LIMIT 1
+                )
+                WHERE t.status_code = 3
+                  AND p.curator_id = ?
+                  AND (t.updated_at, t.id) > (?, ?)
+                ORDER BY t.updated_at, t.id
+                LIMIT ?
+            """, (curator_id, after[0], after[1], limit + 1))
+            rows = [dict(row) for row in db_cursor.fetchall()]
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(rows[-1]['submitted_at'], rows[-1]['id'])
+        return rows, next_cursor
+
+    # Методы для контроля сроков
+    def sweep_deadlines(self, soon_days: int = 2) -> dict:
+        """Обход сроков: отмечает просроченные и скоро истекающие задачи и проекты.
+
+        Выборка идет диапазоном по частичным индексам idx_tasks_due_open и idx_projects_deadline,
+        а состояние записывается в deadline_alerts одной транзакцией. Возвращает число
+        новых (или сменивших состояние) предупреждений и снятых предупреждений.
+        Кэши сбрасываются только для задач и проектов, чьи предупреждения изменились.
+        """
+        changed = []
+
+        def write(cursor):
+            cursor.execute("SELECT DATE('now', 'localtime'), DATE('now', 'localtime', ?)",
+                           (f'+{int(soon_days)} days',))
+            today, soon_limit = cursor.fetchone()
+
+            # Снимаем предупреждения, которые больше не актуальны (задача завершена, срок перенесен)
+            cursor.execute("""
+                DELETE FROM deadline_alerts
+                WHERE (entity_type = 'task' AND NOT EXISTS (
+                           SELECT 1 FROM tasks t
+                           WHERE t.id = deadline_alerts.entity_id
+                             AND t.status_code != 4 AND t.due_date IS NOT NULL AND t.due_date <= ?))
+                   OR (entity_type = 'project' AND NOT EXISTS (
+                           SELECT 1 FROM projects p
+                           WHERE p.id = deadline_alerts.entity_id
+                             AND p.status != 'завершён' AND p.deadline IS NOT NULL AND p.deadline <= ?))
+                RETURNING entity_type, entity_id
+            """, (soon_limit, soon_limit))
+            cleared_alerts = cursor.fetchall()
+
+            # Новые и сменившие состояние предупреждения; неизменные строки не перезаписываются
+            cursor.execute("""
+                INSERT INTO deadline_alerts (entity_type, entity_id, state, due, curator_id, cadet_id)
+                SELECT 'task', t.id,
+                       CASE WHEN t.due_date < :today THEN 'overdue' ELSE 'soon' END,
+                       t.due_date, p.curator_id, t.cadet_id
+                FROM tasks t
+                JOIN projects p ON t.project_id = p.id
+                WHERE t.status_code != 4 AND t.due_date IS NOT NULL AND t.due_date <= :soon
+                UNION ALL
+                SELECT 'project', p.id,
+                       CASE WHEN p.deadline < :today THEN 'overdue' ELSE 'soon' END,
+                       p.deadline, p.curator_id, NULL
+                FROM projects p
+                WHERE p.deadline IS NOT NULL AND p.deadline <= :soon AND p.status != 'завершён'
+                ON CONFLICT (entity_type, entity_id) DO UPDATE SET
+                    state = excluded.state,
+                    due = excluded.due,
+                    detected_at = CURRENT_TIMESTAMP,
+                    notified = 0
+                WHERE deadline_alerts.state != excluded.state OR deadline_alerts.due != excluded.due
+                RETURNING entity_type, entity_id
+            """, {'today': today, 'soon': soon_limit})
+            detected_alerts = cursor.fetchall()
+            changed.extend(tuple(row) for row in cleared_alerts + detected_alerts)
+
+            # Курсанты получают уведомления о новых предупреждениях по своим задачам
+            cursor.execute("""
+                INSERT INTO notification_outbox (recipient_id, event_type, task_id, project_id, message)
+                SELECT da.cadet_id,
+                       CASE da.state WHEN 'overdue' THEN 'task_overdue' ELSE 'task_due_soon' END,
+                       t.id, t.project_id,
+                       CASE da.state
+                           WHEN 'overdue' THEN 'Срок задачи "' || t.title || '" истек ' || da.due
+                           ELSE 'Срок задачи "' || t.title || '" истекает ' || da.due
+                       END
+                FROM deadline_alerts da
+                JOIN tasks t ON da.entity_id = t.id
+                WHERE da.entity_type = 'task' AND da.notified = 0
+            """)
+            cursor.execute("UPDATE deadline_alerts SET notified = 1 WHERE notified = 0")
+            return {'detected': len(detected_alerts), 'cleared': len(cleared_alerts)}
+        return self._write(write, invalidates=changed)
+
+    @busy_retry
+    def get_deadline_alerts(self, curator_id: int = None, cadet_id: int = None,
+                            state: str = None, only_unnotified: bool = False):
+        """Текущие предупреждения о сроках с фильтрами по куратору, курсанту и состоянию"""
+        with self.create_connection() as conn:
+            conn.row_factory = sqlite3.Row
+            cursor = conn.cursor()
+            query = "SELECT * FROM deadline_alerts WHERE 1 = 1"
+            params = []
+            if curator_id is not None:
+                query += " AND curator_id = ?"
+                params.append(curator_id)
+            if cadet_id is not None:
+                query += " AND cadet_id = ?"
+                params.append(cadet_id)
+            if state:
+                query += " AND state = ?"
+                params.append(state)
+            if only_unnotified:
+                query += " AND notified = 0"
+            query += " ORDER BY due, entity_type, entity_id"
+            cursor.execute(query, params)
+            return [dict(row) for row in cursor.fetchall()]
+
+    # Методы для исходящих уведомлений
+    @staticmethod
+    def enqueue_notification(cursor, recipient_id: int, event_type: str, message: str,
+                             task_id: int = None, project_id: int = None):
+        """Запись уведомления в outbox через курсор вызывающей транзакции"""
+        cursor.execute("""
+            INSERT INTO notification_outbox (recipient_id, event_type, task_id, project_id, message)
+            VALUES (?, ?, ?, ?, ?)
+        """, (recipient_id, event_type, task_id, project_id, message))
+
+    @busy_retry
+    def get_pending_notifications(self, limit: int = 500, max_attempts: int = 5):
+        """Неотправленные уведомления, у которых подошло время попытки, с адресами получателей"""
+        with self.create_connection() as conn:
+            conn.row_factory = sqlite3.Row
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT n.*, u.email as recipient_email, u.username as recipient_name,
+                       u.surname as recipient_surname
+                FROM notification_outbox n
+                JOIN users u ON n.recipient_id = u.id
+                WHERE n.sent_at IS NULL
+                  AND n.next_attempt_at <= CURRENT_TIMESTAMP
+                  AND n.attempts < ?
+                ORDER BY n.next_attempt_at, n.id
+                LIMIT ?
+            """, (max_attempts, limit))
+            return [dict(row) for row in cursor.fetchall()]
+
+    def mark_notifications_sent(self, notification_ids):
+        """Пометка пачки уведомлений как доставленных"""
+        if not notification_ids:
+            return 0
+        def write(cursor):
+            cursor.executemany(
+                "UPDATE notification_outbox SET sent_at = CURRENT_TIMESTAMP, last_error = NULL WHERE id = ?",
+                [(notification_id,) for notification_id in notification_ids]
+            )
+            return len(notification_ids)
+        return self._write(write, invalidates=())
+
+    def mark_notifications_failed(self, notification_ids, error: str, base_delay_seconds: int = 60):
+        """Неудачная попытка доставки: экспоненциальная задержка до следующей попытки"""
+        if not notification_ids:
+            return 0
+        def write(cursor):
+            cursor.executemany("""
+                UPDATE notification_outbox
+                SET attempts = attempts + 1,
+                    last_error = ?,
+                    next_attempt_at = DATETIME('now', '+' || (? * (1 << MIN(attempts, 10))) || ' seconds')
+                WHERE id = ?
+            """, [(error[:500], base_delay_seconds, notification_id) for notification_id in notification_ids])
+            return len(notification_ids)
+        return self._write(write, invalidates=())
+
+    # Методы для выгрузки
+    # Колонки выгрузки задач (порядок колонок CSV)
+    EXPORT_TASK_COLUMNS = [
+        'task_id', 'task_title', 'project_id', 'project_title', 'cadet_id', 'cadet_surname', 'cadet_name',
+        'cadet_patronymic', 'academic_group', 'status_code', 'status_name', 'start_date', 'due_date',
+        'created_at', 'updated_at', 'file_count',
+    ]
+
+    def iter_task_export(self, curator_id: int, project_id: int = None, group: str = None,
+                         status_code: int = None, batch_size: int = 1000):
+        """Задачи проектов куратора для выгрузки - генератор пачек строк (fetchmany).
+
+        Соединение открыто, пока выгрузка читается: в режиме WAL читатель
+        не мешает записи, а в памяти держится только одна пачка.
+        """
+        query = """
+            SELECT t.id as task_id, t.title as task_title, p.id as project_id, p.title as project_title,
+                   u.id as cadet_id, u.surname as cadet_surname, u.username as cadet_name,
+                   u.patronymic as cadet_patronymic, u.academic_group,
+                   t.status_code, tsc.status_name, t.start_date, t.due_date, t.created_at, t.updated_at,
+                   (SELECT COUNT(*) FROM files f WHERE f.task_id = t.id) as file_count
+            FROM tasks t
+            JOIN projects p ON t.project_id = p.id
+            JOIN users u ON t.cadet_id = u.id
+            JOIN task_status_codes tsc ON t.status_code = tsc.status_code
+            WHERE p.curator_id = ?
+        """
+        params = [curator_id]
+        if project_id:
+            query += " AND p.id = ?"
+            params.append(project_id)
+        if group == 'без группы':
+            query += " AND (u.academic_group IS NULL OR u.academic_group = '')"
+        elif group:
+            query += " AND u.academic_group = ?"
+            params.append(group)
+        if status_code:
+            query += " AND t.status_code = ?"
+            params.append(status_code)
+        query += " ORDER BY p.id, u.academic_group, u.surname, t.id"
+
+        conn = self.create_connection()
+        try:
+            cursor = conn.cursor()
+            self.retry_policy.call('iter_task_export', cursor.execute, query, params)
+            columns = [column[0] for column in cursor.description]
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield [dict(zip(columns, row)) for row in rows]
+        finally:
+            conn.close()
+
+    # Методы для архива завершенных проектов
+    def archived(self):
+        """Менеджер для чтения архива (None, если архива еще нет).
+
+        Архив открывается как основная база, а рабочая база подключается к нему
+        (ATTACH ... AS live): таблицы проектов, задач и файлов находятся в архиве,
+        а пользователи и справочники - в рабочей базе, поэтому обычные методы
+        чтения (get_project_by_id, load_task_page, get_file_with_details и др.)
+        работают с архивом без изменений.
+        """
+        if not os.path.exists(self.archive_path):
+            return None
+        return DatabaseManager(self.archive_path, read_only=True, attach=self.db_path)
+
+    def _archive_attach(self) -> dict:
+        """Архив, подключаемый к соединению писателя на время переноса (см. submit_write)"""
+        return {'archive': self.archive_path}
+
+    @staticmethod
+    def _sync_archive_schema(cursor):
+        """Таблицы архива повторяют таблицы рабочей базы (включая колонки, добавленные миграциями)"""
+        for table in ['files'] + [table for table, _ in ARCHIVE_TABLES]:
+            cursor.execute("SELECT sql FROM main.sqlite_master WHERE type = 'table' AND name = ?", (table,))
+            create_sql = cursor.fetchone()[0]
+            cursor.execute("SELECT 1 FROM archive.sqlite_master WHERE type = 'table' AND name = ?", (table,))
+            if cursor.fetchone() is None:
+                cursor.execute(create_sql.replace(f'CREATE TABLE {table}', f'CREATE TABLE archive.{table}', 1))
+                continue
+            cursor.execute(f"PRAGMA archive.table_info({table})")
+            archived_columns = {row[1] for row in cursor.fetchall()}
+            cursor.execute(f"PRAGMA main.table_info({table})")
+            for row in cursor.fetchall():
+                if row[1] not in archived_columns:
+                    cursor.execute(f"ALTER TABLE archive.{table} ADD COLUMN {row[1]} {row[2]}")
+        cursor.execute("CREATE INDEX IF NOT EXISTS archive.idx_projects_curator ON projects(curator_id)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS archive.idx_tasks_project ON tasks(project_id)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS archive.idx_tasks_cadet ON tasks(cadet_id)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS archive.idx_files_task ON files(task_id)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS archive.idx_status_history_task ON task_status_history(task_id, changed_at)")
+        # Журнал архивации: восстановленный проект не переносится обратно в течение срока архивации
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS archive.archive_log (
+                project_id INTEGER PRIMARY KEY,
+                archived_at DATETIME,
+                restored_at DATETIME
+            )
+        """)
+
+    @staticmethod
+    def _copy_projects(cursor, source: str, target: str, project_ids):
+        """Копия проектов с задачами, файлами и историей из source в target (строки target заменяются)"""
+        marks = ','.join('?' * len(project_ids))
+        cursor.execute(f"""
+            DELETE FROM {target}.files
+            WHERE task_id IN (SELECT id FROM {target}.tasks WHERE project_id IN ({marks}))
+        """, project_ids)
+        for table, key in ARCHIVE_TABLES + [('files', None)]:
+            cursor.execute(f"PRAGMA {target}.table_info({table})")
+            target_columns = {row[1] for row in cursor.fetchall()}
+            cursor.execute(f"PRAGMA {source}.table_info({table})")
+            columns = [row[1] for row in cursor.fetchall() if row[1] in target_columns]
+            # Триггер основной базы не пропускает проекты с прошедшим сроком: срок ставится после вставки
+            values = ['NULL' if target == 'main' and table == 'projects' and column == 'deadline' else column
+                      for column in columns]
+            if key is None:
+                where = f"task_id IN (SELECT id FROM {source}.tasks WHERE project_id IN ({marks}))"
+            else:
+                where = f"{key} IN ({marks})"
+                # Удаляются и строки, которые триггеры target добавили при вставке предыдущих таблиц
+                cursor.execute(f"DELETE FROM {target}.{table} WHERE {key} IN ({marks})", project_ids)
+            cursor.execute(f"""
+                INSERT INTO {target}.{table} ({', '.join(columns)})
+                SELECT {', '.join(values)} FROM {source}.{table} WHERE {where}
+            """, project_ids)
+        if target == 'main':
+            cursor.execute(f"""
+                UPDATE main.projects
+                SET deadline = (SELECT s.deadline FROM {source}.projects s WHERE s.id = projects.id)
+                WHERE id IN ({marks})
+            """, project_ids)
+
+    @staticmethod
+    def _delete_projects(cursor, database: str, project_ids):
+        """Удаление проектов с задачами, файлами и историей из database"""
+        marks = ','.join('?' * len(project_ids))
+        if database == 'main':
+            cursor.execute(f"""
+                DELETE FROM main.deadline_alerts
+                WHERE (entity_type = 'project' AND entity_id IN ({marks}))
+                   OR (entity_type = 'task' AND entity_id IN (SELECT id FROM main.tasks WHERE project_id IN ({marks})))
+            """, project_ids + project_ids)
+        cursor.execute(f"""
+            DELETE FROM {database}.files
+            WHERE task_id IN (SELECT id FROM {database}.tasks WHERE project_id IN ({marks}))
+        """, project_ids)
+        # Задачи удаляются раньше сводок: триггер удаления задачи пишет в сводку
+        for table, key in ARCHIVE_TABLES[1:] + ARCHIVE_TABLES[:1]:
+            cursor.execute(f"DELETE FROM {database}.{table} WHERE {key} IN ({marks})", project_ids)
+
+    def _archive_batch(self, cursor, project_ids, older_than: str, delete_source: bool) -> int:
+        """Один шаг переноса пачки проектов в архив (изменение для потока-писателя).
+
+        Рабочая база в режиме WAL, поэтому транзакция над двумя базами не атомарна
+        целиком. Сначала проекты копируются в архив отдельной транзакцией
+        (delete_source=False), затем вторая транзакция повторяет копию (с
+        изменениями, сделанными между ними) и удаляет проекты из рабочей базы.
+        При сбое между шагами проект остается в обеих базах (чтение берет
+        рабочую), и следующий запуск повторит перенос.
+        """
+        marks = ','.join('?' * len(project_ids))
+        # Проект мог измениться: переносятся только все еще подходящие
+        cursor.execute(f"""
+            SELECT p.id FROM main.projects p
+            WHERE p.id IN ({marks}) AND p.status = 'завершён'
+              AND COALESCE((SELECT MAX(t.updated_at) FROM main.tasks t WHERE t.project_id = p.id),
+                           p.created_at) < ?
+        """, list(project_ids) + [older_than])
+        eligible = [row[0] for row in cursor.fetchall()]
+        if eligible:
+            self._copy_projects(cursor, 'main', 'archive', eligible)
+            cursor.executemany("""
+                INSERT INTO archive.archive_log (project_id, archived_at) VALUES (?, CURRENT_TIMESTAMP)
+                ON CONFLICT (project_id) DO UPDATE SET archived_at = CURRENT_TIMESTAMP, restored_at = NULL
+            """, [(project_id,) for project_id in eligible])
+            if delete_source:
+                self._delete_projects(cursor, 'main', eligible)
+        if delete_source:
+            # Копии проектов, переставших подходить после первого шага, убираются из архива
+            stale = [project_id for project_id in project_ids if project_id not in eligible]
+            if stale:
+                self._delete_projects(cursor, 'archive', stale)
+                cursor.execute(f"DELETE FROM archive.archive_log WHERE project_id IN "
+                               f"({','.join('?' * len(stale))})", stale)
+        return len(eligible)
+
+    def archive_completed_projects(self, older_than_days: int = 180, batch_size: int = 20) -> dict:
+        """Перенос завершенных проектов без активности дольше older_than_days дней в архив пачками.
+
+        Каждый шаг - отдельное изменение потока-писателя с подключенным архивом:
+        повторы при занятой базе, метрики и сброс кэшей после коммита - как у
+        остальных записей. Кэши сбрасываются только шагом, который удаляет
+        проекты из рабочей базы.
+        """
+        started = time.monotonic()
+        attach = self._archive_attach()
+
+        def select_candidates(cursor):
+            self._sync_archive_schema(cursor)
+            cursor.execute("SELECT DATETIME('now', ?)", (f'{-int(older_than_days)} days',))
+            older_than = cursor.fetchone()[0]
+            cursor.execute("""
+                SELECT p.id FROM main.projects p
+                WHERE p.status = 'завершён'
+                  AND COALESCE((SELECT MAX(t.updated_at) FROM main.tasks t WHERE t.project_id = p.id),
+                               p.created_at) < ?
+                  AND NOT EXISTS (SELECT 1 FROM archive.archive_log l
+                                  WHERE l.project_id = p.id AND l.restored_at >= ?)
+                ORDER BY p.id
+            """, (older_than, older_than))
+            return older_than, [row[0] for row in cursor.fetchall()]
+
+        older_than, candidates = self._write(select_candidates, exclusive=True, attach=attach, invalidates=())
+        archived = batches = 0
+        for offset in range(0, len(candidates), batch_size):
+            batch = candidates[offset:offset + batch_size]
+            self._write(self._archive_batch, batch, older_than, False, exclusive=True, attach=attach,
+                        invalidates=())
+            archived += self._write(self._archive_batch, batch, older_than, True, exclusive=True, attach=attach)
+            batches += 1
+        return {'archived': archived, 'batches': batches, 'seconds': round(time.monotonic() - started, 3)}
+
+    def restore_archived_project(self, project_id: int) -> bool:
+        """Возврат проекта из архива в рабочую базу.
+
+        Как и при архивации, сначала проект копируется в рабочую базу, и только
+        следующей транзакцией удаляется из архива: при сбое между ними проект
+        останется в обеих базах, а не пропадет. Обе транзакции идут через
+        поток-писатель с подключенным архивом.
+        """
+        if not os.path.exists(self.archive_path):
+            return False
+        attach = self._archive_attach()
+
+        def copy(cursor):
+            self._sync_archive_schema(cursor)
+            cursor.execute("SELECT 1 FROM archive.projects WHERE id = ?", (project_id,))
+            if cursor.fetchone() is None:
+                return False
+            self._copy_projects(cursor, 'archive', 'main', [project_id])
+            return True
+
+        def remove(cursor):
+            self._delete_projects(cursor, 'archive', [project_id])
+            cursor.execute("""
+                INSERT INTO archive.archive_log (project_id, restored_at) VALUES (?, CURRENT_TIMESTAMP)
+                ON CONFLICT (project_id) DO UPDATE SET restored_at = CURRENT_TIMESTAMP
+            """, (project_id,))
+
+        restored = self._write(copy, exclusive=True, attach=attach)
+        if restored:
+            self._write(remove, exclusive=True, attach=attach, invalidates=())
+        return restored
+
+    # Методы для JSON API (постраничная выдача по id, выбор полей)
+    @busy_retry
+    def _api_page(self, query: str, params: list, limit: int):
+        """Выполнение запроса страницы: берем limit + 1 строк, чтобы узнать о следующей странице"""
+        with self.create_connection() as conn:
+            conn.row_factory = sqlite3.Row
+            cursor = conn.cursor()
+            cursor.execute(query, params + [limit + 1])
+            rows = [dict(row) for row in cursor.fetchall()]
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(rows[-1]['id'])
+        return rows, next_cursor
+
+    @staticmethod
+    def _api_after_id(cursor: str) -> int:
+        after = decode_cursor(cursor, (int,))
+        return after[0] if after else 0
+
+    @staticmethod
+    def _api_tasks_query(fields) -> str:
+        return f"""
+            SELECT {api_select_list('tasks', fields)}
+            FROM tasks t
+            JOIN users u ON t.cadet_id = u.id
+            JOIN projects p ON t.project_id = p.id
+            JOIN task_status_codes ts ON t.status_code = ts.status_code
+            JOIN users cu ON p.curator_id = cu.id
+        """
+
+    @busy_retry
+    def api_get_task(self, task_id: int, user_id: int, user_role: str, fields=None):
+        """Одна задача с выбранными полями или None, если нет доступа"""
+        query = self._api_tasks_query(fields) + " WHERE t.id = ?"
+        if user_role == 'курсант':
+            query += " AND t.cadet_id = ?"
+        elif user_role == 'куратор':
+            query += " AND p.curator_id = ?"
+        else:
+            return None
+        with self.create_connection() as conn:
+            conn.row_factory = sqlite3.Row
+            cursor = conn.cursor()
+            cursor.execute(query, (task_id, user_id))
+            row = cursor.fetchone()
+            return dict(row) if row else None
+
+    def api_get_tasks(self, user_id: int, user_role: str, fields=None, cursor: str = None,
+                      limit: int = 50, status_code: int = None, project_id: int = None):
+        """Задачи, доступные пользователю (те же правила, что и в get_task_with_permissions)"""
+        query = self._api_tasks_query(fields) + " WHERE t.id > ?"
+        params = [self._api_after_id(cursor)]
+        if user_role == 'курсант':
+            query += " AND t.cadet_id = ?"
+        elif user_role == 'куратор':
+            query += " AND p.curator_id = ?"
+        else:
+            return [], None
+        params.append(user_id)
+        if status_code:
+            query += " AND t.status_code = ?"
+            params.append(status_code)
+        if project_id:
+            query += " AND t.project_id = ?"
+            params.append(project_id)
+        query += " ORDER BY t.id LIMIT ?"
+        return self._api_page(query, params, limit)
+
+    def api_get_projects(self, user_id: int, user_role: str, fields=None, cursor: str = None,
+                         limit: int = 50, status: str = None):
+        """Проекты куратора или проекты, в которых у курсанта есть задачи"""
+        query = f"""
+            SELECT {api_select_list('projects', fields)}
+            FROM projects p
+            JOIN users u ON p.curator_id = u.id
+            WHERE p.id > ?
+        """
+        params = [self._api_after_id(cursor)]
+        if user_role == 'курсант':
+            query += " AND EXISTS (SELECT 1 FROM tasks WHERE project_id = p.id AND cadet_id = ?)"
+        elif user_role == 'куратор':
+            query += " AND p.curator_id = ?"
+        else:
+            return [], None
+        params.append(user_id)
+        if status:
+            query += " AND p.status = ?"
+            params.append(status)
+        query += " ORDER BY p.id LIMIT ?"
+        return self._api_page(query, params, limit)
+
+    def api_get_cadets(self, fields=None, cursor: str = None, limit: int = 50, group: str = None):
+        """Курсанты (для кураторов)"""
+        query = f"""
+            SELECT {api_select_list('cadets', fields)}
+            FROM users u
+            WHERE u.role = 'курсант' AND u.id > ?
+        """
+        params = [self._api_after_id(cursor)]
+        if group:
+            query += " AND u.academic_group = ?"
+            params.append(group)
+        query += " ORDER BY u.id LIMIT ?"
+        return self._api_page(query, params, limit)
+
+    def api_get_task_files(self, task_id: int, user_id: int, user_role: str, fields=None,
+                           cursor: str = None, limit: int = 50):
+        """Файлы задачи: куратору - все файлы задач его проектов, курсанту - свои файлы по своим задачам"""
+        query = f"""
+            SELECT {api_select_list('files', fields)}
+            FROM files f
+            JOIN users u ON f.author_id = u.id
+            JOIN tasks t ON f.task_id = t.id
+            JOIN projects p ON t.project_id = p.id
+            WHERE f.task_id = ? AND f.id > ?
+        """
+        params = [task_id, self._api_after_id(cursor)]
+        if user_role == 'курсант':
+            query += " AND t.cadet_id = ? AND f.author_id = ?"
+            params.extend([user_id, user_id])
+        elif user_role == 'куратор':
+            query += " AND p.curator_id = ?"
+            params.append(user_id)
+        else:
+            return [], None
+        query += " ORDER BY f.id LIMIT ?"
+        return self._api_page(query, params, limit)
@@ -0,0 +1,42 @@
+// static/js/cadet_task_detail.js
+// Проверка файла перед отправкой работы на проверку
+document.addEventListener('DOMContentLoaded', function() {
+    const form = document.getElementById('uploadForm');
+    const fileInput = document.getElementById('file');
+
+    form.addEventListener('submit', function(e) {
+        // Проверка размера файла
+        if (fileInput.files.length > 0) {
+            const file = fileInput.files[0];
+            const maxSize = 10 * 1024 * 1024; // 10MB
+
+            if (file.size > maxSize) {
+                e.preventDefault();
+                alert('Файл слишком большой. Максимальный размер: 10MB');
+                return false;
+            }
+
+            // Проверка расширения файла
+            const allowedExtensions = ['pdf', 'doc', 'docx', 'txt', 'zip', 'rar', 'jpg', 'jpeg', 'png', 'gif'];
+            const fileName = file.name.toLowerCase();
+            const fileExtension = fileName.split('.').pop();
+
+            if (!allowedExtensions.includes(fileExtension)) {
+                e.preventDefault();
+                alert('Недопустимый тип файла. Разрешенные форматы: PDF, DOC, DOCX, TXT, ZIP, RAR, JPG, PNG, GIF');
+                return false;
+            }
+
+            // Подтверждение загрузки
+            if (!confirm('Загрузить файл и отправить задачу на проверку куратору?')) {
+                e.preventDefault();
+                return false;
+            }
+
+            // Показываем индикатор загрузки
+            const submitButton = form.querySelector('button[type="submit"]');
+            submitButton.innerHTML = '<i class="bi bi-hourglass-split"></i> Загрузка...';
+            submitButton.disabled = true;
+        }
+    });
+});
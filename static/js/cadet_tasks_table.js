@@ -0,0 +1,57 @@
+// static/js/cadet_tasks_table.js
+// Фильтрация таблицы задач курсанта
+document.addEventListener('DOMContentLoaded', function() {
+    const statusFilter = document.getElementById('statusFilter');
+    const projectFilter = document.getElementById('projectFilter');
+    const refreshButton = document.getElementById('refreshTable');
+    const taskRows = document.querySelectorAll('.task-row');
+    const visibleCount = document.getElementById('visibleCount');
+
+    function filterTable() {
+        const statusValue = statusFilter.value;
+        const projectValue = projectFilter.value;
+        let visibleRows = 0;
+
+        taskRows.forEach(row => {
+            const rowStatus = row.getAttribute('data-status');
+            const rowProject = row.getAttribute('data-project');
+
+            const statusMatch = statusValue === 'all' || rowStatus === statusValue;
+            const projectMatch = projectValue === 'all' || rowProject === projectValue;
+
+            if (statusMatch && projectMatch) {
+                row.style.display = '';
+                visibleRows++;
+            } else {
+                row.style.display = 'none';
+            }
+        });
+
+        if (visibleCount) {
+            visibleCount.textContent = visibleRows;
+        }
+    }
+
+    // Применяем фильтры при изменении
+    statusFilter.addEventListener('change', filterTable);
+    projectFilter.addEventListener('change', filterTable);
+
+    // Обновление таблицы
+    refreshButton.addEventListener('click', function() {
+        window.location.reload();
+    });
+
+    // Подсветка просроченных задач
+    taskRows.forEach(row => {
+        const dueDate = row.getAttribute('data-due-date');
+        if (dueDate) {
+            const today = new Date().toISOString().split('T')[0];
+            if (dueDate < today) {
+                row.classList.add('table-danger');
+            }
+        }
+    });
+
+    // Инициализация
+    filterTable();
+});
@@ -0,0 +1,30 @@
+// static/js/cadets_list.js
+// Поиск и фильтр по группе в списке курсантов
+document.addEventListener('DOMContentLoaded', function() {
+    // Автофокус на поле поиска при загрузке страницы
+    const searchInput = document.getElementById('search');
+    if (searchInput && searchInput.value === '') {
+        searchInput.focus();
+    }
+
+    // Автоматическая отправка формы при изменении селекта группы
+    const groupSelect = document.getElementById('group');
+    if (groupSelect) {
+        groupSelect.addEventListener('change', function() {
+            if (this.form) {
+                this.form.submit();
+            }
+        });
+    }
+
+    // Подсветка строк при наведении
+    const tableRows = document.querySelectorAll('#cadetsTable tbody tr');
+    tableRows.forEach(row => {
+        row.addEventListener('mouseenter', function() {
+            this.style.backgroundColor = 'rgba(0, 123, 255, 0.05)';
+        });
+        row.addEventListener('mouseleave', function() {
+            this.style.backgroundColor = '';
+        });
+    });
+});
@@ -0,0 +1,26 @@
+// static/js/create_task.js
+// Автоматическая подстановка сегодняшней даты в дату начала
+document.addEventListener('DOMContentLoaded', function() {
+    const today = new Date().toISOString().split('T')[0];
+    const startDateInput = document.getElementById('start_date');
+    if (startDateInput && !startDateInput.value) {
+        startDateInput.value = today;
+    }
+
+    // Автоматическая установка срока выполнения через 7 дней
+    const dueDateInput = document.getElementById('due_date');
+    if (dueDateInput && !dueDateInput.value) {
+        const nextWeek = new Date();
+        nextWeek.setDate(nextWeek.getDate() + 7);
+        dueDateInput.value = nextWeek.toISOString().split('T')[0];
+    }
+
+    // Фильтрация проектов при выборе курсанта (опционально)
+    const cadetSelect = document.getElementById('cadet_id');
+    const projectSelect = document.getElementById('project_id');
+
+    // Если нужно добавить динамическую фильтрацию
+    // cadetSelect.addEventListener('change', function() {
+    //     // Здесь можно добавить AJAX запрос для фильтрации проектов
+    // });
+});
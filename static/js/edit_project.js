@@ -0,0 +1,9 @@
+// static/js/edit_project.js
+// Установка минимальной даты для дедлайна - сегодня
+document.addEventListener('DOMContentLoaded', function() {
+    const deadlineInput = document.getElementById('deadline');
+    if (deadlineInput) {
+        const today = new Date().toISOString().split('T')[0];
+        deadlineInput.min = today;
+    }
+});
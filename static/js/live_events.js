@@ -0,0 +1,68 @@
+// static/js/live_events.js
+// Живые обновления: сервер присылает события по задачам пользователя,
+// страница правит нужные элементы на месте без перезагрузки
+(function() {
+    // Адрес потока событий - в data-events-url тега <script> (base.html)
+    const eventsUrl = document.currentScript.dataset.eventsUrl;
+    if (!window.EventSource || !eventsUrl) return;
+
+    const defaultBadges = {
+        1: ['Ожидает', 'bg-secondary'],
+        2: ['В работе', 'bg-warning'],
+        3: ['На проверке', 'bg-info'],
+        4: ['Завершена', 'bg-success']
+    };
+
+    function updateStatus(data) {
+        const badges = window.LIVE_STATUS_BADGES || defaultBadges;
+        const [label, badgeClass] = badges[data.status_code] || [data.status_name, 'bg-secondary'];
+        document.querySelectorAll(`[data-task-id="${data.task_id}"], [data-task-row="${data.task_id}"]`).forEach(el => {
+            el.dataset.status = data.status_name;
+            el.dataset.statusCode = data.status_code;
+            el.querySelectorAll('[data-role="status-badge"]').forEach(badge => {
+                badge.className = 'badge ' + badgeClass;
+                badge.textContent = label;
+            });
+        });
+    }
+
+    function updateFiles(data) {
+        document.querySelectorAll(`[data-task-id="${data.task_id}"] [data-role="file-count"]`).forEach(counter => {
+            counter.textContent = (parseInt(counter.textContent, 10) || 0) + 1;
+        });
+    }
+
+    function showNotice(text) {
+        const container = document.querySelector('.flash-messages');
+        if (!container) return;
+        const alert = document.createElement('div');
+        alert.className = 'alert alert-info alert-dismissible fade show';
+        alert.setAttribute('role', 'alert');
+        alert.textContent = text + ' ';
+        const reload = document.createElement('a');
+        reload.href = '#';
+        reload.textContent = 'Обновить';
+        reload.addEventListener('click', e => { e.preventDefault(); location.reload(); });
+        alert.appendChild(reload);
+        container.appendChild(alert);
+    }
+
+    const source = new EventSource(eventsUrl);
+    source.addEventListener('task_status', e => {
+        const data = JSON.parse(e.data);
+        updateStatus(data);
+        document.dispatchEvent(new CustomEvent('live:task_status', { detail: data }));
+    });
+    source.addEventListener('file_uploaded', e => {
+        const data = JSON.parse(e.data);
+        updateFiles(data);
+        document.dispatchEvent(new CustomEvent('live:file_uploaded', { detail: data }));
+    });
+    source.addEventListener('task_assigned', e => {
+        const data = JSON.parse(e.data);
+        showNotice(`Новая задача «${data.title}» в проекте «${data.project_title}».`);
+        document.dispatchEvent(new CustomEvent('live:task_assigned', { detail: data }));
+    });
+    source.addEventListener('resync', () => location.reload());
+    window.addEventListener('beforeunload', () => source.close());
+})();
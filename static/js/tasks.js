@@ -0,0 +1,155 @@
+// static/js/tasks.js
+// Цвета статусов на этой странице (для живых обновлений из base.html)
+window.LIVE_STATUS_BADGES = {
+    1: ['Ожидает', 'bg-warning'],
+    2: ['В работе', 'bg-info'],
+    3: ['На проверке', 'bg-primary'],
+    4: ['Завершена', 'bg-success']
+};
+
+// Живое обновление канбана: карточка переезжает в колонку нового статуса
+const STATUS_COLUMNS = {1: 'pending-tasks', 2: 'inprogress-tasks', 3: 'review-tasks', 4: 'completed-tasks'};
+document.addEventListener('live:task_status', function(e) {
+    const card = document.querySelector(`.task-card[data-task-id="${e.detail.task_id}"]`);
+    const column = document.getElementById(STATUS_COLUMNS[e.detail.status_code]);
+    if (card && column && !column.contains(card)) {
+        column.appendChild(card);
+    }
+});
+
+// Адрес пакетного API перемещений - в data-moves-url тега <script> (tasks.html)
+const TASK_MOVES_URL = document.currentScript.dataset.movesUrl;
+
+// Перетаскивание задач (drag and drop).
+// Перемещения копятся в очереди и отправляются одним пакетом;
+// если статус задачи успели изменить, карточка возвращается в актуальную колонку.
+const COLUMN_STATUSES = {};
+Object.entries(STATUS_COLUMNS).forEach(([status, id]) => { COLUMN_STATUSES[id] = parseInt(status, 10); });
+const pendingMoves = new Map();  // task_id -> {task_id, from_status, to_status}
+let flushTimer = null;
+
+function cardStatus(card) {
+    return card && card.parentElement ? COLUMN_STATUSES[card.parentElement.id] : undefined;
+}
+
+function moveCard(taskId, status) {
+    const card = document.querySelector(`.task-card[data-task-id="${taskId}"]`);
+    const column = document.getElementById(STATUS_COLUMNS[status]);
+    if (card && column && !column.contains(card)) {
+        column.appendChild(card);
+    }
+    const badges = window.LIVE_STATUS_BADGES;
+    document.querySelectorAll(`[data-task-row="${taskId}"] [data-role="status-badge"]`).forEach(badge => {
+        badge.textContent = badges[status][0];
+        badge.className = `badge ${badges[status][1]}`;
+    });
+}
+
+function queueMove(taskId, fromStatus, toStatus) {
+    const key = String(taskId);
+    const previous = pendingMoves.get(key);
+    // Несколько перемещений одной карточки до отправки схлопываются в одно
+    const origin = previous ? previous.from_status : fromStatus;
+    if (origin === toStatus) {
+        pendingMoves.delete(key);
+    } else {
+        pendingMoves.set(key, { task_id: parseInt(taskId, 10), from_status: origin, to_status: toStatus });
+    }
+    moveCard(taskId, toStatus);
+    clearTimeout(flushTimer);
+    flushTimer = setTimeout(flushMoves, 500);
+}
+
+function flushMoves(keepalive) {
+    clearTimeout(flushTimer);
+    if (!pendingMoves.size) return;
+    const moves = Array.from(pendingMoves.values());
+    pendingMoves.clear();
+
+    fetch(TASK_MOVES_URL, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ moves: moves }),
+        keepalive: keepalive === true
+    })
+    .then(response => response.json())
+    .then(data => {
+        if (!data.results) {
+            throw new Error(data.error);
+        }
+        const failed = [];
+        data.results.forEach((result, i) => {
+            if (result.result === 'conflict') {
+                moveCard(result.task_id, result.status_code);
+                failed.push(result.task_id);
+            } else if (result.result !== 'applied') {
+                moveCard(moves[i].task_id, moves[i].from_status);
+                failed.push(moves[i].task_id);
+            }
+        });
+        if (failed.length) {
+            alert('Статус некоторых задач уже был изменен, доска обновлена: ' + failed.join(', '));
+        }
+    })
+    .catch(() => {
+        moves.forEach(move => moveCard(move.task_id, move.from_status));
+        alert('Ошибка обновления статуса');
+    });
+}
+
+window.addEventListener('pagehide', () => flushMoves(true));
+
+document.addEventListener('DOMContentLoaded', function() {
+    const taskCards = document.querySelectorAll('.task-card');
+    const columns = document.querySelectorAll('.card-body[id$="-tasks"]');
+
+    taskCards.forEach(card => {
+        card.setAttribute('draggable', 'true');
+
+        card.addEventListener('dragstart', function(e) {
+            e.dataTransfer.setData('text/plain', this.dataset.taskId);
+            this.classList.add('dragging');
+        });
+
+        card.addEventListener('dragend', function() {
+            this.classList.remove('dragging');
+        });
+    });
+
+    columns.forEach(column => {
+        column.addEventListener('dragover', function(e) {
+            e.preventDefault();
+            this.classList.add('drag-over');
+        });
+
+        column.addEventListener('dragleave', function() {
+            this.classList.remove('drag-over');
+        });
+
+        column.addEventListener('drop', function(e) {
+            e.preventDefault();
+            this.classList.remove('drag-over');
+
+            const taskId = e.dataTransfer.getData('text/plain');
+            const taskCard = document.querySelector(`.task-card[data-task-id="${taskId}"]`);
+
+            if (taskCard && !this.contains(taskCard)) {
+                queueMove(taskId, cardStatus(taskCard), COLUMN_STATUSES[this.id]);
+            }
+        });
+    });
+});
+
+function updateTaskStatus(taskId, newStatus) {
+    const card = document.querySelector(`.task-card[data-task-id="${taskId}"]`);
+    const fromStatus = cardStatus(card) || newStatus - 1;
+    if (fromStatus !== newStatus) {
+        queueMove(taskId, fromStatus, newStatus);
+    }
+}
+
+function approveTask(taskId) {
+    if (confirm('Подтвердить выполнение задачи?')) {
+        updateTaskStatus(taskId, 4);
+    }
+}
@@ -0,0 +1,97 @@
+# task_openings.py
+"""Отложенный перевод задач в статус "в работе" при первом открытии курсантом.
+
+Страница задачи не пишет в базу: открытие запоминается в очереди в памяти,
+а поток-сборщик раз в interval секунд (или при накоплении max_batch записей)
+применяет все накопленные открытия одной транзакцией. Пока открытие не
+применено, страница показывает задачу уже в статусе "в работе".
+"""
+import atexit
+import threading
+
+from sql_active import DatabaseManager
+
+
+OPENED_STATUS = {
+    'status_code': 2,
+    'status_name': 'в работе',
+    'status_description': 'Задача находится в работе',
+}
+
+
+class OpenedTaskQueue:
+    """Очередь открытых задач с фоновым пакетным сбросом в базу"""
+
+    def __init__(self, db: DatabaseManager = None, interval: float = 1.0, max_batch: int = 500):
+        self.db = db or DatabaseManager()
+        self.interval = interval
+        self.max_batch = max_batch
+        self._pending = {}  # {task_id: cadet_id}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._flush_at_exit = False  # сброс при завершении процесса уже зарегистрирован
+        self.flushed = 0  # всего переведено задач
+        self.batches = 0  # всего транзакций сброса
+
+    def mark_opened(self, task_id: int, cadet_id: int) -> bool:
+        """Запомнить открытие; True, если задача попала в очередь впервые"""
+        with self._lock:
+            if task_id in self._pending:
+                return False
+            self._pending[task_id] = cadet_id
+            size = len(self._pending)
+            self._ensure_started()
+        if size >= self.max_batch:
+            self._wakeup.set()
+        return True
+
+    def is_pending(self, task_id: int) -> bool:
+        with self._lock:
+            return task_id in self._pending
+
+    def apply(self, task: dict) -> dict:
+        """Состояние задачи с учетом еще не сброшенного открытия"""
+        if task and task['status_code'] == 1 and self.is_pending(task['id']):
+            task.update(OPENED_STATUS)
+        return task
+
+    def pending_count(self) -> int:
+        with self._lock:
+            return len(self._pending)
+
+    def flush(self) -> int:
+        """Применить все накопленные открытия одной транзакцией"""
+        with self._lock:
+            openings = list(self._pending.items())
+        if not openings:
+            return 0
+        promoted = self.db.promote_opened_tasks(openings)
+        with self._lock:
+            # Из очереди убираются только записанные открытия (новые могли прийти во время сброса)
+            for task_id, cadet_id in openings:
+                if self._pending.get(task_id) == cadet_id:
+                    del self._pending[task_id]
+        self.flushed += promoted
+        self.batches += 1
+        return promoted
+
+    # Поток-сборщик
+    def _ensure_started(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name='opened_tasks_flusher', daemon=True)
+            self._thread.start()
+            # Поток может перезапускаться, а сброс при выходе нужен один
+            if not self._flush_at_exit:
+                atexit.register(self.flush)
+                self._flush_at_exit = True
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                # Открытия остаются в очереди и будут применены при следующем проходе
+                print(f"Ошибка при сохранении открытых задач: {e}")